@@ -0,0 +1,217 @@
+"""
+Headless throughput benchmarks of the real-time path using camera emulator.
+
+Usage:
+    python benchmark.py grab [--seconds 10] [--source <dir>]
+    python benchmark.py realtime [--seconds 10] [--source <dir>]
+                                 [--stage <file>]
+    python benchmark.py replay --source <recording dir> [--stage <file>]
+    python benchmark.py detect --source <recording dir> [--stage <file>]
+"""
+import argparse
+import queue
+import time
+
+# Numpy
+import numpy as np
+
+# Pylon
+from pypylon import pylon
+
+# Camera object and emulator
+from cam.cam import CamObject
+from cam.emulator import SyntheticORingSource, DirectoryFrameSource
+from cam.recorder import RecordingReader, RecordingFrameSource, is_recording
+from cam.event_handlers import FrameMeasureEventHandler
+from cam.mailbox import FrameMailbox
+
+# Parallel processing
+from processing.process import ProcessParallel
+from processing.detection import projection_detect
+from processing.stage import PreprocessStage, label_detect
+from processing.latency import LatencyMonitor
+
+
+class CountingEventHandler(pylon.ImageEventHandler):
+    def __init__(self):
+        """
+        Image event handler only counting grabbed frames
+        """
+        super().__init__()
+        self.count = 0
+
+    def OnImageGrabbed(self, cam, grabResult):
+        if grabResult.GrabSucceeded():
+            self.count += 1
+
+
+def trigger_loop(cam_obj, seconds):
+    """
+    Trigger camera as fast as it is ready for given number of seconds
+
+    :param cam_obj: opened and grabbing CamObject
+    :param seconds: benchmark duration
+    :return: elapsed time in seconds
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if cam_obj.cam.WaitForFrameTriggerReady(
+                300, pylon.TimeoutHandling_ThrowException):
+            cam_obj.cam.ExecuteSoftwareTrigger()
+    return time.perf_counter() - start
+
+
+def bench_grab(cam_obj, seconds):
+    """
+    Frames per second delivered by camera to image event handler
+    """
+    hndl = CountingEventHandler()
+    cam_obj.cam.RegisterImageEventHandler(
+        hndl, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+    cam_obj.start_grabbing()
+    elapsed = trigger_loop(cam_obj, seconds)
+    cam_obj.stop_grabbing()
+    print("\nGrabbed frames: {}".format(hndl.count))
+    print("Grab FPS: {:.2f}".format(hndl.count / elapsed))
+    print("Camera FPS: {:.2f}".format(
+        cam_obj.cam.ResultingFrameRate.GetValue()))
+
+
+def bench_realtime(cam_obj, seconds, numberProc=3, stage=None):
+    """
+    Frames per second through FrameMeasureEventHandler and preprocessing
+    workers, without measurement flowchart
+    """
+    frame_queue = FrameMailbox()
+    preproc_queue = queue.Queue()
+    procParallel = ProcessParallel(
+        None, numberProc=numberProc,
+        frameShape=(cam_obj.cam.HeightMax.GetValue(),
+                    cam_obj.cam.WidthMax.GetValue()),
+        stage=stage
+    )
+    latency = LatencyMonitor()
+    latency.syncClock(cam_obj.cam)
+    hndl = FrameMeasureEventHandler(
+        frame_queue, preproc_queue, procParallel, latency=latency)
+    cam_obj.cam.RegisterImageEventHandler(
+        hndl, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+    cam_obj.start_grabbing()
+    elapsed = trigger_loop(cam_obj, seconds)
+    cam_obj.stop_grabbing()
+    cam_obj.cam.DeregisterImageEventHandler(hndl)
+    print("\nGrabbed frames: {}".format(frame_queue.written))
+    print("Grab FPS: {:.2f}".format(frame_queue.written / elapsed))
+    print("Objects for measurement: {}".format(preproc_queue.qsize()))
+    latency.print_summary()
+    procParallel.print_queue_stats()
+
+
+def bench_replay(reader, numberProc=3, stage=None):
+    """
+    Frames per second through preprocessing workers fed directly from
+    memory-mapped recording, without camera and grab thread
+    """
+    procParallel = ProcessParallel(
+        None, numberProc=numberProc, frameShape=reader.sensorShape(),
+        stage=stage)
+    procParallel.start()
+    detections = 0
+    pending = 0
+    start = time.perf_counter()
+    for i, frame in enumerate(reader):
+        meta = reader.metadata(i)
+        # Wait for free ring slot instead of dropping frame
+        while not procParallel.addInput(
+                frame, meta['offsetX'], meta['offsetY'], meta['timestamp']):
+            detections += len(procParallel.getOutput() or [])
+            pending -= 1
+        pending += 1
+    while pending:
+        detections += len(procParallel.getOutput() or [])
+        pending -= 1
+    elapsed = time.perf_counter() - start
+    procParallel.stop()
+    print("\nReplayed frames: {}".format(len(reader)))
+    print("Preprocessing FPS: {:.2f}".format(len(reader) / elapsed))
+    print("Detected objects: {}".format(detections))
+    procParallel.print_queue_stats()
+
+
+def bench_detect(reader, stage=None, tolerance=2.):
+    """
+    Detection time per frame of labeling and projection detector on
+    recorded frames and agreement of detected objects. Objects agree if
+    both detectors find none or first object centers are within tolerance
+    (detection image px). Scale and detection parameters are taken from
+    stage definition
+    """
+    stage = PreprocessStage(stage)
+    scale = stage.scale
+    detectArgs = stage.detectArgs
+    times = {'dip': 0., 'projection': 0.}
+    fallback = 0
+    agree = 0
+    for frame in reader:
+        small = np.ascontiguousarray(frame[::scale, ::scale])
+        start = time.perf_counter()
+        labeled = label_detect(small, **detectArgs)
+        times['dip'] += time.perf_counter() - start
+        start = time.perf_counter()
+        projected = projection_detect(small, **detectArgs)
+        if projected is None:
+            fallback += 1
+            projected = label_detect(small, **detectArgs)
+        times['projection'] += time.perf_counter() - start
+        if not labeled or not projected:
+            agree += not labeled and not projected
+        else:
+            agree += np.hypot(
+                labeled[0][0][0] - projected[0][0][0],
+                labeled[0][0][1] - projected[0][0][1]) <= tolerance
+    print("\nDetected frames: {}".format(len(reader)))
+    for name, elapsed in times.items():
+        print("{} detector: {:.3f} ms/frame".format(
+            name, elapsed / len(reader) * 1e3))
+    print("Labeling fallback: {} frames".format(fallback))
+    print("Agreement: {:.2f} %".format(agree / len(reader) * 100.))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('benchmark', choices=['grab', 'realtime', 'replay', 'detect'])
+    parser.add_argument('--seconds', type=float, default=10.)
+    parser.add_argument('--source', default=None,
+                        help='Recording directory or directory with '
+                             'recorded .npy frames')
+    parser.add_argument('--frame-rate', type=float, default=50.,
+                        help='Emulated sensor frame rate at full ROI')
+    parser.add_argument('--stage', default=None,
+                        help='Preprocessing stage definition file')
+    args = parser.parse_args()
+
+    if args.benchmark in ('replay', 'detect'):
+        if args.source is None:
+            parser.error('{} requires --source recording directory'.format(
+                args.benchmark))
+        if args.benchmark == 'replay':
+            bench_replay(RecordingReader(args.source), stage=args.stage)
+        else:
+            bench_detect(RecordingReader(args.source), stage=args.stage)
+        parser.exit()
+
+    if args.source is None:
+        source = SyntheticORingSource()
+    elif is_recording(args.source):
+        source = RecordingFrameSource(RecordingReader(args.source))
+    else:
+        source = DirectoryFrameSource(args.source)
+    with CamObject(emulator_source=source,
+                   emulator_frame_rate=args.frame_rate) as cam_obj:
+        cam_obj.create()
+        cam_obj.open()
+        cam_obj.set_default_params()
+        if args.benchmark == 'grab':
+            bench_grab(cam_obj, args.seconds)
+        else:
+            bench_realtime(cam_obj, args.seconds, stage=args.stage)
@@ -0,0 +1,109 @@
+"""
+Flat-field calibration: gain and offset maps from dark and bright frames.
+
+Usage:
+    python calibrate_flat_field.py [--device <serial>] [--emulate]
+                                   [--frames 16] [--target <intensity>]
+                                   [--output flat_field.npy]
+"""
+import argparse
+import threading
+
+# Numpy
+import numpy as np
+
+# Pylon
+from pypylon import pylon
+
+# Camera object and emulator
+from cam.cam import CamObject
+from cam.emulator import SyntheticORingSource
+
+# Flat-field correction
+from processing.flatfield import FlatField
+
+
+class AveragingEventHandler(pylon.ImageEventHandler):
+    def __init__(self):
+        """
+        Image event handler summing grabbed full sensor frames
+        """
+        super().__init__()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.sum = None
+            self.count = 0
+
+    def OnImageGrabbed(self, cam, grabResult):
+        if grabResult.GrabSucceeded():
+            imgArray = grabResult.GetArray()
+            with self.lock:
+                if self.sum is None:
+                    self.sum = np.zeros(imgArray.shape, np.float64)
+                self.sum += imgArray
+                self.count += 1
+
+    def mean(self):
+        with self.lock:
+            return self.sum / self.count
+
+
+def average_frames(cam_obj, hndl, frames):
+    """
+    Mean of given number of software triggered frames
+
+    :param cam_obj: opened and grabbing CamObject
+    :param hndl: registered AveragingEventHandler
+    :param frames: number of averaged frames
+    :return: 2D np.ndarray float64
+    """
+    hndl.reset()
+    while hndl.count < frames:
+        if cam_obj.cam.WaitForFrameTriggerReady(
+                300, pylon.TimeoutHandling_ThrowException):
+            cam_obj.cam.ExecuteSoftwareTrigger()
+    return hndl.mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--device', default=None,
+                        help='Camera serial number, first found if not set')
+    parser.add_argument('--emulate', action='store_true',
+                        help='Emulated camera instead of device')
+    parser.add_argument('--frames', type=int, default=16,
+                        help='Averaged frames of each reference image')
+    parser.add_argument('--target', type=float, default=None,
+                        help='Corrected bright intensity, mean bright - dark '
+                             'if not set')
+    parser.add_argument('--output', default='flat_field.npy',
+                        help='Gain/offset maps file for stage flatField')
+    args = parser.parse_args()
+
+    with CamObject(emulator_source=SyntheticORingSource()
+                   if args.emulate else None,
+                   device=args.device) as cam_obj:
+        cam_obj.create()
+        cam_obj.open()
+        # Maps are computed at full sensor ROI
+        cam_obj.set_default_params()
+        hndl = AveragingEventHandler()
+        cam_obj.cam.RegisterImageEventHandler(
+            hndl, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+        cam_obj.start_grabbing()
+        input('\nSwitch backlight OFF and press Enter')
+        dark = average_frames(cam_obj, hndl, args.frames)
+        input('\nSwitch backlight ON, clear field of view and press Enter')
+        bright = average_frames(cam_obj, hndl, args.frames)
+        cam_obj.stop_grabbing()
+        cam_obj.cam.DeregisterImageEventHandler(hndl)
+
+    maps = FlatField.compute(dark, bright, target=args.target)
+    FlatField.save(args.output, maps)
+    print("\nDark mean: {:.2f}".format(dark.mean()))
+    print("Bright mean: {:.2f}".format(bright.mean()))
+    print("Gain range: {:.3f} - {:.3f}".format(maps[0].min(), maps[0].max()))
+    print("Flat-field maps saved to {}".format(args.output))
@@ -0,0 +1,142 @@
+# Pylon
+from pypylon import pylon
+
+# Threads and timing
+import threading
+import queue
+import time
+
+# Display frame buffer
+from cam.mailbox import FrameMailbox
+
+
+class AcquisitionThread(threading.Thread):
+    def __init__(self, cam, frame_queue, signals, preproc_queue=None,
+                 software_trigger=True, fps_display=5, fps_average=10,
+                 roi=None, trigger=None, exposure_events=None, idle=None):
+        """
+        Thread triggering camera and collecting grabbed frames independently
+        of Qt event loop. GUI is notified only through SignalChange signals
+        and reads FPS and camera FPS from thread attributes and frame from
+        display FrameMailbox. updateGraphics is emitted only when GUI took
+        previous frame, frames are overwritten while GUI is busy.
+
+        :param cam: grabbing pylon.InstantCamera or EmulatedCamera
+        :param frame_queue: FrameMailbox filled by image event handler
+        :param signals: SignalChange object
+        :param preproc_queue: queue with measurement results (or objects for
+        measurement), updateMeasurement is emitted while not empty, or None
+        :param software_trigger: False for free-run or hardware trigger
+        :param fps_display: display every fps_display grabbed frame
+        :param fps_average: number of frames for averaging FPS
+        :param roi: AdaptiveROI applied when changed or None. ROI and idle
+        mode are applied only from this thread
+        :param trigger: PredictiveTrigger scheduling software triggers or
+        None for triggering as fast as camera is ready
+        :param exposure_events: ExposureEventHandler or None. With software
+        trigger, next trigger is issued when exposure ends instead of when
+        frame arrives, so exposure of next frame overlaps transfer and
+        processing of previous frame
+        :param idle: IdleMode switching camera to low-cost presence check or
+        None
+        """
+        super().__init__(name='AcquisitionThread', daemon=True)
+        self.cam = cam
+        self.frame_queue = frame_queue
+        self.signals = signals
+        self.preproc_queue = preproc_queue
+        self.software_trigger = software_trigger
+        self.fps_display = fps_display
+        self.fps_average = fps_average
+        self.roi = roi
+        self.trigger = trigger
+        self.exposure_events = exposure_events
+        self.idle = idle
+        # Latest frame and FPS read by GUI
+        self.display = FrameMailbox()
+        # Serializes ROI changes of acquisition thread with stop
+        self.lock = threading.Lock()
+        self.fps = 0.
+        self.cam_fps = 0.
+        self.running = False
+
+    def run(self):
+        """
+        Trigger and collect frames until stopped
+        """
+        self.running = True
+        # Frames grabbed, including frames overwritten in mailbox
+        displayed = self.frame_queue.written
+        fps_count = self.frame_queue.written
+        fps_start = time.perf_counter()
+        while self.running and self.cam.IsGrabbing():
+            # ROI changes restarting grabbing never overlap stop
+            with self.lock:
+                if not self.running:
+                    break
+                if self.idle is not None:
+                    self.idle.apply(self.cam)
+                if self.roi is not None and (
+                        self.idle is None or not self.idle.idle):
+                    self.roi.apply(self.cam)
+            if self.software_trigger:
+                nextTrigger = 0.
+                if self.trigger is not None:
+                    nextTrigger = self.trigger.nextTrigger()
+                if self.idle is not None:
+                    nextTrigger = max(nextTrigger, self.idle.nextTrigger())
+                # Wait for scheduled trigger time
+                wait = nextTrigger - time.perf_counter()
+                if wait > 0:
+                    time.sleep(min(wait, 0.01))
+                    continue
+                if not self.cam.WaitForFrameTriggerReady(
+                        300, pylon.TimeoutHandling_Return):
+                    continue
+                if self.exposure_events is not None:
+                    self.exposure_events.prepare()
+                self.cam.ExecuteSoftwareTrigger()
+                if self.trigger is not None:
+                    self.trigger.triggered()
+                if self.idle is not None:
+                    self.idle.triggered()
+            if self.software_trigger and self.exposure_events is not None:
+                # Do not wait for frame transfer
+                if not self.exposure_events.waitExposureEnd(1.):
+                    continue
+                frame = self.frame_queue.poll()
+            else:
+                try:
+                    frame = self.frame_queue.get(timeout=1.)
+                except queue.Empty:
+                    continue
+            if frame is not None and \
+                    self.frame_queue.written - displayed >= self.fps_display:
+                displayed = self.frame_queue.written
+                # Emit only if GUI took previous frame
+                pending = not self.display.empty()
+                self.display.put(frame)
+                if not pending:
+                    self.signals.updateGraphics.emit()
+            if self.preproc_queue is not None and \
+                    not self.preproc_queue.empty():
+                self.signals.updateMeasurement.emit()
+            # Average FPS on number of frames
+            if self.frame_queue.written - fps_count >= self.fps_average:
+                self.fps = (self.frame_queue.written - fps_count) / (
+                    time.perf_counter() - fps_start)
+                self.cam_fps = self.cam.ResultingFrameRate.GetValue()
+                self.signals.updateFPS.emit()
+                fps_count = self.frame_queue.written
+                fps_start = time.perf_counter()
+
+    def stop(self):
+        """
+        Stop thread and wait for it to finish
+        """
+        # Waits for ROI change in progress, so grabbing is not restarted
+        # after stop returns
+        with self.lock:
+            self.running = False
+        if self.is_alive():
+            self.join()
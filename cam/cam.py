@@ -5,8 +5,76 @@ from pypylon import genicam
 from pyqtgraph import QtCore
 import pyqtgraph as pg
 
+# Camera emulator
+from cam.emulator import EmulatedCamera, EmulatedParameter
+
+
+def is_writable(node):
+    """
+    genicam.IsWritable accepting emulated camera parameters
+    """
+    if isinstance(node, EmulatedParameter):
+        return node.IsWritable()
+    return genicam.IsWritable(node)
+
+
+def is_available(node):
+    """
+    genicam.IsAvailable accepting emulated camera parameters
+    """
+    if isinstance(node, EmulatedParameter):
+        return True
+    return genicam.IsAvailable(node)
+
+
+def list_devices():
+    """
+    Serial numbers of connected cameras
+    """
+    return [info.GetSerialNumber() for info in
+            pylon.TlFactory.GetInstance().EnumerateDevices()]
+
+
+def create_device(device=None):
+    """
+    Create pylon device by serial number or index
+
+    :param device: serial number (str), index (int) or None for first device
+    :return: pylon.IPylonDevice
+    """
+    factory = pylon.TlFactory.GetInstance()
+    if device is None:
+        return factory.CreateFirstDevice()
+    devices = factory.EnumerateDevices()
+    if isinstance(device, int):
+        if device >= len(devices):
+            raise RuntimeError(
+                'Camera index {} not found, {} connected'.format(
+                    device, len(devices)))
+        return factory.CreateDevice(devices[device])
+    for info in devices:
+        if info.GetSerialNumber() == device:
+            return factory.CreateDevice(info)
+    raise RuntimeError('Camera with serial number {} not found'.format(device))
+
+
 class CamObject():
-    def __init__(self):
+    def __init__(self, emulator_source=None, emulator_frame_rate=50.,
+                 free_run=False, device=None):
+        """
+        Camera object. If emulator_source is given, frames are grabbed from
+        EmulatedCamera instead of Basler device
+
+        :param emulator_source: frame source for EmulatedCamera or None
+        :param emulator_frame_rate: emulated sensor frame rate in FPS
+        :param free_run: acquire continuously instead of software trigger
+        :param device: device serial number (str) or index (int) of
+        connected cameras, first device found if None
+        """
+        self.device = device
+        self.emulator_source = emulator_source
+        self.emulator_frame_rate = emulator_frame_rate
+        self.free_run = free_run
         # FPS counter
         self.fps = 0.
         self.fps_count = 0
@@ -22,14 +90,22 @@ class CamObject():
 
     def create(self):
         try:
-            self.cam = pylon.InstantCamera(
-                pylon.TlFactory.GetInstance().CreateFirstDevice())
-            print("\nDevice: {}".format(
-                self.cam.GetDeviceInfo().GetModelName()))
-            # Software trigger configuration registering
+            if self.emulator_source is not None:
+                self.cam = EmulatedCamera(
+                    self.emulator_source, self.emulator_frame_rate,
+                    str(self.device if self.device is not None else 0))
+            else:
+                self.cam = pylon.InstantCamera(create_device(self.device))
+            print("\nDevice: {} ({})".format(
+                self.cam.GetDeviceInfo().GetModelName(),
+                self.camera_id()))
+            # Software trigger or free-run configuration registering
+            if self.free_run:
+                configuration = pylon.AcquireContinuousConfiguration()
+            else:
+                configuration = pylon.SoftwareTriggerConfiguration()
             self.cam.RegisterConfiguration(
-                pylon.SoftwareTriggerConfiguration(),
-                # pylon.AcquireContinuousConfiguration(),
+                configuration,
                 pylon.RegistrationMode_ReplaceAll,
                 pylon.Cleanup_Delete
             )
@@ -55,7 +131,7 @@ class CamObject():
 
         # Check if camera supports events.
         try:
-            if not genicam.IsAvailable(self.cam.EventSelector):
+            if not is_available(self.cam.EventSelector):
                 raise genicam.RuntimeException(
                     "The device doesn't support events.")
         except genicam.GenericException as e:
@@ -92,6 +168,56 @@ class CamObject():
             print(e)
             raise
 
+    def enable_exposure_events(self, handler):
+        """
+        Enable ExposureEnd and FrameStart camera events and register
+        ExposureEventHandler. Camera events are grabbed only if
+        GrabCameraEvents was set before grabbing started (create)
+
+        :param handler: ExposureEventHandler
+        """
+        try:
+            self.cam.EventSelector = "ExposureEnd"
+            self.cam.EventNotification = "On"
+            self.cam.RegisterCameraEventHandler(
+                handler, "EventExposureEnd", handler.EXPOSURE_END,
+                pylon.RegistrationMode_Append, pylon.Cleanup_None)
+            print("\nExposureEnd event enabled")
+        except Exception as e:
+            print("\nExposureEnd event FAILED!")
+            print(e)
+            raise
+        # Exposure start timestamps are optional
+        try:
+            self.cam.EventSelector = "FrameStart"
+            self.cam.EventNotification = "On"
+            self.cam.RegisterCameraEventHandler(
+                handler, "EventFrameStart", handler.FRAME_START,
+                pylon.RegistrationMode_Append, pylon.Cleanup_None)
+        except Exception as e:
+            print("\nFrameStart event not available")
+            print(e)
+
+    def disable_exposure_events(self, handler):
+        """
+        Deregister ExposureEventHandler and disable camera events
+        """
+        for event in ("ExposureEnd", "FrameStart"):
+            try:
+                self.cam.DeregisterCameraEventHandler(
+                    handler, "Event{}".format(event))
+                self.cam.EventSelector = event
+                self.cam.EventNotification = "Off"
+            except Exception as e:
+                print("\nDisabling {} event FAILED!".format(event))
+                print(e)
+
+    def camera_id(self):
+        """
+        Serial number identifying camera
+        """
+        return self.cam.GetDeviceInfo().GetSerialNumber()
+
     def close(self):
         try:
             self.cam.Close()
@@ -158,16 +284,16 @@ class CamObject():
 
         # ROI Size and position
         try:
-            if genicam.IsWritable(self.cam.Width):
+            if is_writable(self.cam.Width):
                 self.cam.Width = self.cam.Width.Max
                 # self.cam.Width.SetValue(1248)
-            if genicam.IsWritable(self.cam.Height):
+            if is_writable(self.cam.Height):
                 self.cam.Height = self.cam.Height.Max
                 # self.cam.Height.SetValue(750)
-            if genicam.IsWritable(self.cam.OffsetX):
+            if is_writable(self.cam.OffsetX):
                 self.cam.OffsetX = self.cam.OffsetX.Min
                 # self.cam.OffsetX.SetValue(544)
-            if genicam.IsWritable(self.cam.OffsetY):
+            if is_writable(self.cam.OffsetY):
                 self.cam.OffsetY = self.cam.OffsetY.Min
                 # self.cam.OffsetY.SetValue(800)
             print("\nImage ROI")
@@ -209,7 +335,7 @@ class CamObject():
         Set Camera ROI Width
         """
         try:
-            if genicam.IsWritable(self.cam.Width):
+            if is_writable(self.cam.Width):
                 self.cam.Width = width
         except Exception as e:
             print("\ncam.Width FAILED!")
@@ -221,7 +347,7 @@ class CamObject():
         Set Camera ROI Height
         """
         try:
-            if genicam.IsWritable(self.cam.Height):
+            if is_writable(self.cam.Height):
                 self.cam.Height = height
         except Exception as e:
             print("\ncam.Height FAILED!")
@@ -233,7 +359,7 @@ class CamObject():
         Set Camera ROI X Axis Offset
         """
         try:
-            if genicam.IsWritable(self.cam.OffsetX):
+            if is_writable(self.cam.OffsetX):
                 self.cam.OffsetX = offsetx
         except Exception as e:
             print("\ncam.OffsetX FAILED!")
@@ -245,7 +371,7 @@ class CamObject():
         Set Camera ROI Y Axis Offset
         """
         try:
-            if genicam.IsWritable(self.cam.OffsetY):
+            if is_writable(self.cam.OffsetY):
                 self.cam.OffsetY = offsety
         except Exception as e:
             print("\ncam.OffsetY FAILED!")
@@ -0,0 +1,586 @@
+# Pylon
+from pypylon import pylon
+
+# Numpy
+import numpy as np
+
+# Threads and timing
+import threading
+import queue
+import time
+import os
+
+
+def call_handler(handler, method, *args):
+    """
+    Call event handler method if it is reimplemented in Python. Default
+    pypylon implementations accept only pylon.InstantCamera arguments
+    """
+    for cls in type(handler).__mro__:
+        if method in cls.__dict__:
+            if not cls.__module__.startswith('pypylon'):
+                getattr(handler, method)(*args)
+            return
+
+
+class EmulatedParameter:
+    def __init__(self, value, minimum=None, maximum=None, increment=1,
+                 writable=True):
+        """
+        Camera node emulating GenICam parameter interface used by CamObject
+        and CameraParams (value, Min, Max, Inc, call and GetValue/SetValue)
+
+        :param value: initial value
+        :param minimum: lower limit or None
+        :param maximum: upper limit or None
+        :param increment: value increment for integer parameters
+        :param writable: False for read-only parameters
+        """
+        self.value = value
+        self.Min = minimum
+        self.Max = maximum
+        self.Inc = increment
+        self.writable = writable
+
+    def __call__(self):
+        return self.GetValue()
+
+    def GetValue(self):
+        return self.value
+
+    def SetValue(self, value):
+        if not self.writable:
+            raise RuntimeError('Parameter is not writable')
+        if self.Min is not None and value < self.Min:
+            raise ValueError('Value {} below minimum {}'.format(
+                value, self.Min))
+        if self.Max is not None and value > self.Max:
+            raise ValueError('Value {} above maximum {}'.format(
+                value, self.Max))
+        self.value = value
+
+    def IsWritable(self):
+        return self.writable
+
+
+class EmulatedCommand:
+    def __init__(self, function):
+        """
+        Camera command node calling function on Execute
+        """
+        self.function = function
+
+    def Execute(self):
+        self.function()
+
+    def IsWritable(self):
+        return True
+
+
+class EmulatedDeviceInfo:
+    def __init__(self, model_name, serial_number):
+        """
+        Device info returned by EmulatedCamera.GetDeviceInfo
+        """
+        self.model_name = model_name
+        self.serial_number = serial_number
+
+    def GetModelName(self):
+        return self.model_name
+
+    def GetSerialNumber(self):
+        return self.serial_number
+
+
+class EmulatedGrabResult:
+    def __init__(self, array, image_number, timestamp, offset_x, offset_y):
+        """
+        Grab result with the subset of pylon.GrabResult interface used by
+        event handlers
+
+        :param array: 2D np.ndarray Mono8 frame
+        :param image_number: frame number since grabbing started
+        :param timestamp: exposure start timestamp in ns
+        :param offset_x: ROI x offset on sensor
+        :param offset_y: ROI y offset on sensor
+        """
+        self.array = array
+        self.image_number = image_number
+        self.timestamp = timestamp
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    def GrabSucceeded(self):
+        return True
+
+    def GetArray(self):
+        return self.array.copy()
+
+    def GetArrayZeroCopy(self):
+        return _ZeroCopyContext(self.array)
+
+    def GetID(self):
+        return self.image_number
+
+    def GetImageNumber(self):
+        return self.image_number
+
+    def GetTimeStamp(self):
+        return self.timestamp
+
+    def GetWidth(self):
+        return self.array.shape[1]
+
+    def GetHeight(self):
+        return self.array.shape[0]
+
+    def GetOffsetX(self):
+        return self.offset_x
+
+    def GetOffsetY(self):
+        return self.offset_y
+
+    def Release(self):
+        pass
+
+
+class _ZeroCopyContext:
+    def __init__(self, array):
+        """
+        Context manager mimicking pylon.GrabResult.GetArrayZeroCopy
+        """
+        self.array = array
+
+    def __enter__(self):
+        return self.array
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class SyntheticORingSource:
+    def __init__(self, width=2592, height=2048, outer_radius=350,
+                 inner_radius=250, speed=800., gap=1.5, background=10,
+                 intensity=150, noise=4, seed=0):
+        """
+        Frame generator with O-ring passing the sensor along the x-axis, as
+        seen on the conveyor. Object position depends only on frame timestamp
+
+        :param width: sensor width in px
+        :param height: sensor height in px
+        :param outer_radius: O-ring outer radius in px
+        :param inner_radius: O-ring inner radius in px
+        :param speed: conveyor speed in px/s
+        :param gap: time in seconds between two objects entering the sensor
+        :param background: background intensity
+        :param intensity: O-ring intensity
+        :param noise: amplitude of additive uniform noise
+        :param seed: random seed for noise pattern
+        """
+        self.width = width
+        self.height = height
+        self.outer_radius = outer_radius
+        self.speed = speed
+        self.gap = gap
+        # Background with precomputed noise pattern
+        rng = np.random.RandomState(seed)
+        self.background = np.clip(
+            background + rng.randint(-noise, noise + 1, (height, width)),
+            0, 255).astype(np.uint8)
+        # O-ring sprite pasted on background
+        size = 2 * outer_radius + 1
+        yy, xx = np.mgrid[:size, :size] - outer_radius
+        dist = np.hypot(xx, yy)
+        self.sprite_mask = (dist <= outer_radius) & (dist >= inner_radius)
+        self.intensity = intensity
+
+    def object_center_x(self, timestamp):
+        """
+        Object center x-coordinate on sensor at timestamp in seconds
+        """
+        travel = self.width + 2 * self.outer_radius
+        period = max(travel / self.speed, self.gap)
+        return (timestamp % period) * self.speed - self.outer_radius
+
+    def next_frame(self, timestamp):
+        """
+        Full sensor frame at timestamp in seconds
+
+        :param timestamp: float
+        :return: 2D np.ndarray Mono8
+        """
+        frame = self.background.copy()
+        center_x = int(round(self.object_center_x(timestamp)))
+        center_y = self.height // 2
+        r = self.outer_radius
+        # Clip sprite to frame borders
+        x0, x1 = center_x - r, center_x + r + 1
+        y0, y1 = center_y - r, center_y + r + 1
+        sx0, sy0 = max(0, -x0), max(0, -y0)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x1 > x0 and y1 > y0:
+            mask = self.sprite_mask[sy0:sy0 + y1 - y0, sx0:sx0 + x1 - x0]
+            frame[y0:y1, x0:x1][mask] = self.intensity
+        return frame
+
+
+class DirectoryFrameSource:
+    def __init__(self, path, frame_rate=10.):
+        """
+        Frame source replaying recorded frames stored as .npy files in
+        directory, sorted by file name and looped indefinitely
+
+        :param path: directory with .npy frames
+        :param frame_rate: rate in FPS at which frames were recorded
+        """
+        self.frame_rate = frame_rate
+        files = sorted(
+            fn for fn in os.listdir(path) if fn.endswith('.npy'))
+        if not files:
+            raise FileNotFoundError(
+                'No .npy frames found in {}'.format(path))
+        self.frames = [
+            np.load(os.path.join(path, fn), mmap_mode='r') for fn in files]
+        self.height, self.width = self.frames[0].shape[:2]
+
+    def next_frame(self, timestamp):
+        """
+        Recorded frame closest to timestamp in seconds
+        """
+        idx = int(timestamp * self.frame_rate) % len(self.frames)
+        return np.asarray(self.frames[idx], np.uint8)
+
+
+class EmulatedCamera:
+    def __init__(self, source=None, frame_rate=50., serial_number='0'):
+        """
+        Hardware-free replacement for pylon.InstantCamera. Frames are taken
+        from source (object with next_frame(timestamp) method) and delivered
+        to registered image event handlers from internal grab thread, same as
+        GrabLoop_ProvidedByInstantCamera.
+
+        Exposure and sensor readout are emulated with sleeps, readout time is
+        proportional to ROI height and limited by frame_rate at full sensor.
+        Exposure of next frame overlaps readout of previous frame, camera is
+        ready for trigger as soon as exposure ends, but exposure can not end
+        before readout of previous frame. FrameStart and ExposureEnd camera
+        events are delivered to camera event handlers if GrabCameraEvents is
+        set and EventNotification is 'On'.
+
+        :param source: frame source, SyntheticORingSource if None
+        :param frame_rate: maximum sensor frame rate at full ROI in FPS
+        :param serial_number: device serial number identifying camera
+        """
+        if source is None:
+            source = SyntheticORingSource()
+        self.source = source
+        self.frame_rate = frame_rate
+        self.serial_number = serial_number
+        width, height = source.width, source.height
+        self._params = {
+            'Gain': EmulatedParameter(0., 0., 23.59),
+            'GainAuto': EmulatedParameter('Off'),
+            'ExposureTime': EmulatedParameter(10000., 35., 1e7),
+            'ExposureAuto': EmulatedParameter('Off'),
+            'Width': EmulatedParameter(width, 32, width, 32),
+            'Height': EmulatedParameter(height, 2, height, 2),
+            'OffsetX': EmulatedParameter(0, 0, 0, 32),
+            'OffsetY': EmulatedParameter(0, 0, 0, 2),
+            'WidthMax': EmulatedParameter(width, writable=False),
+            'HeightMax': EmulatedParameter(height, writable=False),
+            'SensorWidth': EmulatedParameter(width, writable=False),
+            'SensorHeight': EmulatedParameter(height, writable=False),
+            'MaxNumBuffer': EmulatedParameter(10, 1, None),
+            'AcquisitionFrameRateEnable': EmulatedParameter(False),
+            'AcquisitionFrameRate': EmulatedParameter(100., 0.1, 1e6),
+            'ResultingFrameRate': EmulatedParameter(0., writable=False),
+            'PixelFormat': EmulatedParameter('Mono8'),
+            'DeviceVendorName': EmulatedParameter(
+                'Emulated', writable=False),
+            'DeviceLinkSpeed': EmulatedParameter(3.6e8, writable=False),
+            'EventSelector': EmulatedParameter('ExposureEnd'),
+            'EventNotification': EmulatedParameter('Off'),
+            'EventFrameStartTimestamp': EmulatedParameter(
+                0, writable=False),
+            'EventFrameStartFrameID': EmulatedParameter(0, writable=False),
+            'EventExposureEndTimestamp': EmulatedParameter(
+                0, writable=False),
+            'EventExposureEndFrameID': EmulatedParameter(0, writable=False),
+            'TimestampLatch': EmulatedCommand(self._latch_timestamp),
+            'TimestampLatchValue': EmulatedParameter(0, writable=False),
+        }
+        self.GrabCameraEvents = False
+        self._configuration = None
+        self._image_handlers = []
+        # (handler, node name, user provided ID)
+        self._camera_handlers = []
+        self._is_open = False
+        self._grabbing = False
+        self._trigger_ready = threading.Event()
+        self._triggers = queue.Queue()
+        self._thread = None
+        self._readout_thread = None
+        self._readouts = queue.Queue()
+        self._readout_idle = threading.Event()
+        # Camera clock origin, timestamps count from camera creation
+        self._clock_origin = time.perf_counter()
+        self._image_number = 0
+        self._missed_triggers = 0
+        self._update_roi_limits()
+
+    def __getattr__(self, name):
+        # Only called if attribute is not found, exposes camera nodes
+        params = self.__dict__.get('_params', {})
+        if name in params:
+            if name == 'ResultingFrameRate':
+                params[name].value = self._resulting_frame_rate()
+            return params[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        # Assignment to camera node sets node value, as in pypylon
+        params = self.__dict__.get('_params', {})
+        if name in params:
+            if isinstance(value, EmulatedParameter):
+                value = value.GetValue()
+            params[name].SetValue(value)
+            if name in ('Width', 'Height', 'OffsetX', 'OffsetY'):
+                self._update_roi_limits()
+        else:
+            object.__setattr__(self, name, value)
+
+    def _update_roi_limits(self):
+        """
+        Keep ROI offsets and sizes within sensor, same as camera does
+        """
+        p = self._params
+        p['OffsetX'].Max = p['SensorWidth'].value - p['Width'].value
+        p['OffsetY'].Max = p['SensorHeight'].value - p['Height'].value
+        p['Width'].Max = p['SensorWidth'].value - p['OffsetX'].value
+        p['Height'].Max = p['SensorHeight'].value - p['OffsetY'].value
+        # Width and Height are locked while grabbing
+        p['Width'].writable = not self._grabbing_flag()
+        p['Height'].writable = not self._grabbing_flag()
+
+    def _grabbing_flag(self):
+        return self.__dict__.get('_grabbing', False)
+
+    def _readout_time(self):
+        """
+        Sensor readout time in seconds for current ROI height
+        """
+        return (self._params['Height'].value /
+                self._params['SensorHeight'].value) / self.frame_rate
+
+    def _resulting_frame_rate(self):
+        """
+        Maximum frame rate for current exposure time, ROI and frame rate
+        limit
+        """
+        exposure = self._params['ExposureTime'].value * 1e-6
+        # Overlapped exposure and readout
+        rate = 1. / max(exposure, self._readout_time())
+        if self._params['AcquisitionFrameRateEnable'].value:
+            rate = min(rate, self._params['AcquisitionFrameRate'].value)
+        return rate
+
+    def _camera_time(self, host_time):
+        """
+        Camera timestamp in ns of perf_counter host time
+        """
+        return int((host_time - self._clock_origin) * 1e9)
+
+    def _latch_timestamp(self):
+        self._params['TimestampLatchValue'].value = self._camera_time(
+            time.perf_counter())
+
+    def GetDeviceInfo(self):
+        return EmulatedDeviceInfo('Emulated acA{}x{}'.format(
+            self.source.width, self.source.height), self.serial_number)
+
+    def GetMissedTriggers(self):
+        """
+        Number of software triggers ignored because camera was not ready
+        """
+        return self._missed_triggers
+
+    def RegisterConfiguration(self, configuration, mode, cleanup):
+        self._configuration = configuration
+
+    def _software_triggered(self):
+        return isinstance(
+            self._configuration, pylon.SoftwareTriggerConfiguration)
+
+    def Open(self):
+        self._is_open = True
+
+    def Close(self):
+        if self._grabbing:
+            self.StopGrabbing()
+        self._is_open = False
+
+    def IsOpen(self):
+        return self._is_open
+
+    def RegisterImageEventHandler(self, handler, mode, cleanup):
+        if mode == pylon.RegistrationMode_ReplaceAll:
+            [self.DeregisterImageEventHandler(hndl)
+             for hndl in list(self._image_handlers)]
+        self._image_handlers.append(handler)
+        call_handler(handler, 'OnImageEventHandlerRegistered', self)
+
+    def DeregisterImageEventHandler(self, handler):
+        if handler in self._image_handlers:
+            self._image_handlers.remove(handler)
+            call_handler(handler, 'OnImageEventHandlerDeregistered', self)
+
+    def RegisterCameraEventHandler(self, handler, node_name, user_id, mode,
+                                   cleanup):
+        if mode == pylon.RegistrationMode_ReplaceAll:
+            self._camera_handlers = []
+        self._camera_handlers.append((handler, node_name, user_id))
+
+    def DeregisterCameraEventHandler(self, handler, node_name):
+        self._camera_handlers = [
+            h for h in self._camera_handlers
+            if not (h[0] is handler and h[1] == node_name)]
+
+    def _camera_event(self, event, host_time, frame_id):
+        """
+        Set event data nodes and call camera event handlers registered for
+        Event<event> node
+        """
+        if not self.GrabCameraEvents or \
+                self._params['EventNotification'].value != 'On':
+            return
+        node_name = 'Event{}'.format(event)
+        self._params[node_name + 'Timestamp'].value = self._camera_time(
+            host_time)
+        self._params[node_name + 'FrameID'].value = frame_id
+        for handler, name, user_id in list(self._camera_handlers):
+            if name == node_name:
+                call_handler(handler, 'OnCameraEvent', self, user_id,
+                             node_name)
+
+    def IsGrabbing(self):
+        return self._grabbing
+
+    def StartGrabbing(self, strategy=pylon.GrabStrategy_OneByOne,
+                      grab_loop=pylon.GrabLoop_ProvidedByInstantCamera):
+        if not self._is_open:
+            raise RuntimeError('Camera is not open')
+        if self._grabbing:
+            return
+        self._grabbing = True
+        self._update_roi_limits()
+        self._image_number = 0
+        self._missed_triggers = 0
+        self._triggers = queue.Queue()
+        self._readouts = queue.Queue()
+        self._readout_idle.set()
+        self._trigger_ready.set()
+        self._thread = threading.Thread(
+            target=self._grab_loop, name='EmulatedGrabLoop', daemon=True)
+        self._readout_thread = threading.Thread(
+            target=self._readout_loop, name='EmulatedReadout', daemon=True)
+        self._thread.start()
+        self._readout_thread.start()
+
+    def StopGrabbing(self):
+        if not self._grabbing:
+            return
+        self._grabbing = False
+        # Wake up grab loop waiting for trigger
+        self._triggers.put(None)
+        self._thread.join()
+        self._thread = None
+        self._readouts.put(None)
+        self._readout_thread.join()
+        self._readout_thread = None
+        self._update_roi_limits()
+
+    def WaitForFrameTriggerReady(
+            self, timeout, handling=pylon.TimeoutHandling_ThrowException):
+        """
+        Wait until camera can accept trigger
+
+        :param timeout: timeout in ms
+        :param handling: TimeoutHandling_ThrowException or
+        TimeoutHandling_Return
+        :return: True or False
+        """
+        ready = self._trigger_ready.wait(timeout * 1e-3)
+        if not ready and handling == pylon.TimeoutHandling_ThrowException:
+            raise TimeoutError(
+                'Frame trigger not ready in {} ms'.format(timeout))
+        return ready
+
+    def ExecuteSoftwareTrigger(self):
+        """
+        Start exposure of new frame. Trigger is ignored if camera is not
+        ready, same as on real camera
+        """
+        if not self._trigger_ready.is_set():
+            self._missed_triggers += 1
+            return
+        self._trigger_ready.clear()
+        self._triggers.put(time.perf_counter())
+
+    def _grab_loop(self):
+        """
+        Internal exposure thread: wait for trigger (or free-run), expose and
+        pass frame to readout thread
+        """
+        next_start = time.perf_counter()
+        while self._grabbing:
+            if self._software_triggered():
+                trigger_time = self._triggers.get()
+                if trigger_time is None:
+                    break
+            else:
+                # Free-run limited by resulting frame rate
+                now = time.perf_counter()
+                if next_start > now:
+                    time.sleep(next_start - now)
+                trigger_time = time.perf_counter()
+                next_start = trigger_time + 1. / self._resulting_frame_rate()
+            frame_id = self._image_number
+            self._image_number += 1
+            self._camera_event('FrameStart', trigger_time, frame_id)
+            # Exposure
+            time.sleep(self._params['ExposureTime'].value * 1e-6)
+            # Exposure can not end before readout of previous frame
+            self._readout_idle.wait()
+            self._readout_idle.clear()
+            p = self._params
+            ox, oy = p['OffsetX'].value, p['OffsetY'].value
+            w, h = p['Width'].value, p['Height'].value
+            # Scene time continues when grabbing is restarted
+            frame = self.source.next_frame(trigger_time - self._clock_origin)
+            frame = np.ascontiguousarray(frame[oy:oy + h, ox:ox + w])
+            self._readouts.put(EmulatedGrabResult(
+                frame, frame_id, self._camera_time(trigger_time), ox, oy))
+            self._camera_event(
+                'ExposureEnd', time.perf_counter(), frame_id)
+            self._trigger_ready.set()
+
+    def _readout_loop(self):
+        """
+        Internal readout thread: read out exposed frames and call image event
+        handlers
+        """
+        while True:
+            grab_result = self._readouts.get()
+            if grab_result is None:
+                break
+            time.sleep(self._readout_time())
+            self._readout_idle.set()
+            self._deliver(grab_result)
+
+    def _deliver(self, grab_result):
+        """
+        Pass grab result to image event handlers
+        """
+        for handler in list(self._image_handlers):
+            call_handler(handler, 'OnImageGrabbed', self, grab_result)
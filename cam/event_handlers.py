@@ -4,20 +4,26 @@ from pypylon import pylon
 # Numpy
 import numpy as np
 
-# Time
+# Time and threads
 import time
+import threading
+import collections
 
 # Pyqtgraph
 import pyqtgraph as pg
 from pyqtgraph import QtCore
 
 from gui.visualize import SignalChange
+from processing.tracking import ObjectTracker
+from processing.latency import LatencyTrace
 
 
 class FrameGrabEventHandler(pylon.ImageEventHandler):
     def __init__(self, frame_queue):
         """
         Image event handler for showing grabbed frame and FPS in FramePlotter
+
+        :param frame_queue: FrameMailbox for displaying frames
         """
         super().__init__()
         self.frame_queue = frame_queue
@@ -29,74 +35,116 @@ class FrameGrabEventHandler(pylon.ImageEventHandler):
 
 
 class FrameMeasureEventHandler(pylon.ImageEventHandler):
-    def __init__(self, frame_queue, preproc_queue, procParallel):
+    def __init__(self, frame_queue, preproc_queue, procParallel, roi=None,
+                 trigger=None, tracker=None, recorder=None, latency=None,
+                 idle=None):
         """
         Image event handler for Real-Time measurement window
 
-        :param frame_queue: Queue for displaying frames in window
+        :param frame_queue: FrameMailbox for displaying frames in window
+
+        :param preproc_queue: Queue for centered Detections with object crop
+        if procParallel has no measurement workers. Otherwise centered
+        objects are measured by procParallel workers and results are
+        retrieved with procParallel.getMeasurementOutput
 
         :param procParallel: Object for parallel processing
+
+        :param roi: AdaptiveROI updated with detected objects or None
+
+        :param trigger: PredictiveTrigger updated with detected objects or
+        None
+
+        :param tracker: ObjectTracker selecting best frame of each object for
+        measurement, ObjectTracker with multi-frame fusion of preprocessing
+        stage if None
+
+        :param recorder: FrameRecorder receiving every grabbed frame or None
+
+        :param latency: LatencyMonitor collecting per-frame latency traces or
+        None. Traces of measured objects are recorded by measurement stage
+
+        :param idle: IdleMode or None. Idle frames are only checked for
+        object presence, without preprocessing
         """
         super().__init__()
         self.frame_queue = frame_queue
         self.preproc_queue = preproc_queue
         self.procParallel = procParallel
+        self.roi = roi
+        self.trigger = trigger
         self.numProc = procParallel.getNumProc()
         self.frame_num = 0
-        # Time delay in seconds between measurement
-        self.timeDelay = 10
-
-    def checkTimeDelay(self):
-        """
-        Convenience function for measuring time between frames for measuring
-
-        :return: True of False
-        """
-        if self.startTime:
-            if (pg.ptime.time() - self.timeDelay) > self.startTime:
-                # self.startTime = pg.ptime.time()
-                return True
-            else:
-                return False
-        return True
+        # Tracker assigning detections to physical objects
+        if tracker is None:
+            tracker = ObjectTracker(
+                fuseFrames=procParallel.stage.definition['fuseFrames'],
+                fusion=procParallel.stage.definition['fusion'])
+        self.tracker = tracker
+        self.recorder = recorder
+        self.latency = latency
+        self.idle = idle
 
     def OnImageEventHandlerRegistered(self, cam):
         """
         Start parallel processing when event handler is registered
         """
         self.procParallel.start()
-        # self.startTime = pg.ptime.time()
-        self.startTime = None
 
     def OnImageGrabbed(self, cam, grabResult):
         """
         Called in internal thread on every image grabbed from camera
         """
         if grabResult.GrabSucceeded():
+            # Owned copy for recorder and display, which keep frame after
+            # grab result buffer is returned to camera
             imgArray = grabResult.GetArray()
+            if self.trigger is not None:
+                self.trigger.observeFrame(grabResult.GetTimeStamp())
+            if self.recorder is not None:
+                self.recorder.record(
+                    imgArray, grabResult.GetTimeStamp(),
+                    grabResult.GetOffsetX(), grabResult.GetOffsetY())
             # Put frame in queue for displaying
             self.frame_queue.put(imgArray)
-            # print('Put {} frame for display'.format(self.frame_num))
-            # self.frame_num += 1
-            if not self.procParallel.ifInputQueueFull():
+            if self.idle is not None and self.idle.idle:
+                # Cheap presence check instead of preprocessing
+                self.idle.observe(imgArray)
+            elif not self.procParallel.ifInputQueueFull():
                 # Add frame to preprocessing if queue not full
-                self.procParallel.addInput(imgArray)
-                # print('Parallel addInput')
+                if self.latency is not None:
+                    trace = self.latency.newTrace(
+                        grabResult.GetID(), grabResult.GetTimeStamp())
+                else:
+                    trace = None
+                if self.procParallel.frameRing is None:
+                    # Input queue pickles frame later in feeder thread
+                    self.procParallel.addInput(
+                        imgArray, grabResult.GetOffsetX(),
+                        grabResult.GetOffsetY(), grabResult.GetTimeStamp(),
+                        trace)
+                else:
+                    # FrameRing copies grab buffer to slot, only copy of
+                    # frame on its way to workers
+                    with grabResult.GetArrayZeroCopy() as zeroCopyArray:
+                        self.procParallel.addInput(
+                            zeroCopyArray, grabResult.GetOffsetX(),
+                            grabResult.GetOffsetY(),
+                            grabResult.GetTimeStamp(), trace)
+            else:
+                # Frame skipped, counted in queue statistics
+                self.procParallel.dropInput()
             # Grab all results
             while not self.procParallel.ifOutputQueueEmpty():
-                # print('Acquiring Parallel Output')
                 res = self.procParallel.getOutput()
-                # Preprocessing outputs None if object is not centered
-                if res is not None:
-                    # Preprocessing outputs np.ndarray if object is centered
-                    if isinstance(res, np.ndarray):
-                        # print('Parallel Output is frame')
-                        # Do not put frames for preprocessing if the same object
-                        if self.checkTimeDelay():
-                            # Put centered object in queue for measurement
-                            self.preproc_queue.put(res)
-                            self.startTime = pg.ptime.time()
-                # print('Parallel Output None')
+                # Preprocessing outputs list of Detection, LatencyTrace (or
+                # None) if no object is found
+                if isinstance(res, list):
+                    self.collect(res)
+                else:
+                    self.recordTrace(res)
+            # Measure objects whose tracks expired, also on empty conveyor
+            self.expireTracks(grabResult.GetTimeStamp())
 
             # self.frame_num += 1
             # if self.frame_num >= self.numProc:
@@ -110,9 +158,126 @@ class FrameMeasureEventHandler(pylon.ImageEventHandler):
             #      for preprocImgArray in preprocImgArrays]
             #     self.frame_num = 0
 
+    def collect(self, detections):
+        """
+        Update ROI, trigger and idle mode with all objects detected in frame
+        and put best centered frames of objects in queue for measurement
+
+        :param detections: list of Detection of one frame
+        """
+        for res in detections:
+            if self.roi is not None:
+                self.roi.update(res)
+            if self.idle is not None:
+                self.idle.update(res)
+            # Detection contains image if object is centered, measure only
+            # best centered frame of each object
+            measure, discard = self.tracker.select(res)
+            for detection in measure:
+                self.measure(detection)
+            for detection in discard:
+                self.recordTrace(detection.trace)
+        if self.trigger is not None and detections:
+            # Predictive trigger follows single object
+            self.trigger.update(detections[0])
+
+    def expireTracks(self, timestamp):
+        """
+        Measure best candidates of objects not seen for tracker maxAge
+
+        :param timestamp: camera timestamp of grabbed frame in ticks
+        """
+        measure, discard = self.tracker.expire(timestamp)
+        for detection in measure:
+            self.measure(detection)
+        for detection in discard:
+            self.recordTrace(detection.trace)
+
+    def measure(self, detection):
+        """
+        Put centered object in measurement queue of workers or in
+        preproc_queue if workers don't measure
+        """
+        if detection.trace is not None:
+            detection.trace.mark('collected')
+        if self.procParallel.ifMeasuring():
+            self.procParallel.addMeasurementInput(detection)
+        else:
+            self.preproc_queue.put(detection)
+
+    def recordTrace(self, trace):
+        """
+        Record latency trace of frame which is not measured
+        """
+        if self.latency is not None and isinstance(trace, LatencyTrace):
+            trace.mark('collected')
+            self.latency.record(trace)
+
     def OnImageEventHandlerDeregistered(self, cam):
         """
-        Stop parallel processing when event handler is deregistered
+        Measure best candidates of objects still in center window and stop
+        parallel processing when event handler is deregistered. Pending
+        measurement outputs are retrieved after deregistration
         """
+        for detection in self.tracker.flush():
+            self.measure(detection)
         self.procParallel.stop()
         self.procParallel.join()
+
+
+class ExposureEventHandler(pylon.CameraEventHandler):
+    # User provided IDs of registered camera events
+    FRAME_START = 100
+    EXPOSURE_END = 200
+
+    def __init__(self, history=100):
+        """
+        Camera event handler for FrameStart and ExposureEnd events. Signals
+        end of exposure, so next trigger can be issued while frame is still
+        transferred and processed, and records (frame ID, camera timestamp)
+        of recent exposures
+
+        :param history: number of recorded exposure timestamps
+        """
+        super().__init__()
+        self.exposureEnd = threading.Event()
+        self.frameStarts = collections.deque(maxlen=history)
+        self.exposureEnds = collections.deque(maxlen=history)
+
+    def OnCameraEvent(self, cam, userProvidedId, node):
+        if userProvidedId == self.EXPOSURE_END:
+            self.exposureEnds.append((
+                cam.EventExposureEndFrameID.GetValue(),
+                cam.EventExposureEndTimestamp.GetValue()))
+            self.exposureEnd.set()
+        elif userProvidedId == self.FRAME_START:
+            self.frameStarts.append((
+                cam.EventFrameStartFrameID.GetValue(),
+                cam.EventFrameStartTimestamp.GetValue()))
+
+    def prepare(self):
+        """
+        Reset exposure end signal before trigger
+        """
+        self.exposureEnd.clear()
+
+    def waitExposureEnd(self, timeout=None):
+        """
+        Wait for end of exposure of triggered frame
+
+        :param timeout: timeout in s
+        :return: True if exposure ended
+        """
+        return self.exposureEnd.wait(timeout)
+
+    def exposureTime(self):
+        """
+        Mean measured exposure duration in camera ticks from matched
+        FrameStart and ExposureEnd events, None if not available
+        """
+        starts = dict(self.frameStarts)
+        durations = [ts - starts[frameId]
+                     for frameId, ts in self.exposureEnds if frameId in starts]
+        if not durations:
+            return None
+        return sum(durations) / len(durations)
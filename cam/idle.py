@@ -0,0 +1,141 @@
+# Pylon
+from pypylon import pylon
+
+# Numpy
+import numpy as np
+
+# Threads and timing
+import threading
+import time
+
+# Camera ROI
+from cam.roi import align_down, align_up, update_roi, get_roi
+
+
+class IdleMode:
+    def __init__(self, sensorWidth, sensorHeight, centerY=None,
+                 bandHeight=64, idleTimeout=2., idleInterval=0.05,
+                 lowerBound=30, upperBound=240, minFraction=0.02, step=4,
+                 incY=2, measureRoi=None):
+        """
+        Low-cost idle mode for empty conveyor. When no object was detected
+        for idleTimeout seconds, camera ROI is reduced to full-width band of
+        bandHeight lines around centerY (short readout, little bus load) and
+        frames are checked for object presence in grab thread on subsampled
+        pixels, without preprocessing workers. As soon as object enters band,
+        measurement ROI is restored.
+
+        Objects move along x, so band spanning full sensor width sees object
+        as soon as it enters field of view.
+
+        :param sensorWidth: sensor width in px
+        :param sensorHeight: sensor height in px
+        :param centerY: band center on sensor, sensor center if None
+        :param bandHeight: idle ROI height in px
+        :param idleTimeout: time without detection before idle mode in s
+        :param idleInterval: minimal time between triggers in idle mode in s
+        :param lowerBound: lower object intensity (preprocessing threshold)
+        :param upperBound: upper object intensity
+        :param minFraction: fraction of object pixels in band for presence
+        :param step: pixel subsampling step of presence check
+        :param incY: camera OffsetY and Height increment
+        :param measureRoi: AdaptiveROI programmed when leaving idle mode, ROI
+        before idle mode is restored if None
+        """
+        self.sensorWidth = sensorWidth
+        self.idleTimeout = idleTimeout
+        self.idleInterval = idleInterval
+        self.lowerBound = lowerBound
+        self.upperBound = upperBound
+        self.minFraction = minFraction
+        self.step = step
+        self.measureRoi = measureRoi
+        self.lock = threading.Lock()
+        if centerY is None:
+            centerY = sensorHeight // 2
+        offsetY = max(0, align_down(centerY - bandHeight // 2, incY))
+        height = min(align_up(bandHeight, incY),
+                     align_down(sensorHeight - offsetY, incY))
+        self.band = (0, sensorWidth, offsetY, height)
+        self.idle = False
+        self.present = False
+        self.lastObject = time.perf_counter()
+        self.lastTrigger = 0.
+        self._savedRoi = None
+
+    def observe(self, frame):
+        """
+        Cheap presence check of idle frame, called from grab thread
+
+        :param frame: 2D np.ndarray Mono8 band
+        :return: True if object is present
+        """
+        sub = frame[::self.step, ::self.step]
+        fraction = np.count_nonzero(
+            (sub >= self.lowerBound) & (sub <= self.upperBound)) / sub.size
+        if fraction >= self.minFraction:
+            with self.lock:
+                self.present = True
+                self.lastObject = time.perf_counter()
+            return True
+        return False
+
+    def update(self, detection):
+        """
+        Object detected in measurement mode, postpone idle mode
+        """
+        with self.lock:
+            self.lastObject = time.perf_counter()
+
+    def nextTrigger(self):
+        """
+        Host time of next trigger, limited in idle mode only
+        """
+        with self.lock:
+            if self.idle:
+                return self.lastTrigger + self.idleInterval
+            return 0.
+
+    def triggered(self, hostTime=None):
+        """
+        Record trigger execution
+        """
+        with self.lock:
+            self.lastTrigger = time.perf_counter() if hostTime is None \
+                else hostTime
+
+    def apply(self, cam, strategy=pylon.GrabStrategy_LatestImageOnly):
+        """
+        Switch between idle and measurement mode if required, see
+        update_roi. Called from acquisition thread, holding its lock
+
+        :param cam: pylon.InstantCamera or EmulatedCamera
+        :return: True if mode was changed
+        """
+        with self.lock:
+            if not self.idle and \
+                    time.perf_counter() - self.lastObject > self.idleTimeout:
+                self.idle = True
+            elif self.idle and self.present:
+                self.idle = False
+            else:
+                return False
+            self.present = False
+            idle = self.idle
+        if idle:
+            self._savedRoi = get_roi(cam)
+            update_roi(cam, *self.band, strategy=strategy)
+            print("\nIdle mode: OffsetY {} Height {}".format(
+                self.band[2], self.band[3]))
+        else:
+            if self.measureRoi is not None:
+                # Current adaptive ROI, possibly changed while idle
+                with self.measureRoi.lock:
+                    roi = (self.measureRoi.offsetX, self.measureRoi.width,
+                           self.measureRoi.offsetY, self.measureRoi.height)
+                    self.measureRoi.changed = False
+                update_roi(cam, *roi, strategy=strategy)
+            else:
+                update_roi(cam, *self._savedRoi, strategy=strategy)
+            print("\nMeasurement mode")
+        return True
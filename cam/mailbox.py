@@ -0,0 +1,68 @@
+# Threads
+import threading
+import queue
+
+
+class FrameMailbox:
+    def __init__(self):
+        """
+        Single-slot, overwrite-on-write frame buffer for display. Writer (grab
+        callback) never blocks and replaces unread frame, reader always gets
+        latest frame and every frame is read at most once, so memory is
+        bounded to one frame and no stale frame is shown.
+
+        get and empty follow queue.Queue interface, so mailbox replaces
+        display frame queue. Counters: written frames, read frames and
+        dropped frames (overwritten before read).
+        """
+        self._cond = threading.Condition()
+        self._frame = None
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        """
+        Replace unread frame with new frame and wake up reader
+        """
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.written += 1
+            self._cond.notify_all()
+
+    def get(self, block=True, timeout=None):
+        """
+        Take latest unread frame
+
+        :param block: wait for new frame if True
+        :param timeout: maximum wait in s, None waits indefinitely
+        :return: frame
+        :raises queue.Empty: no new frame
+        """
+        with self._cond:
+            if block and not self._cond.wait_for(
+                    lambda: self._frame is not None, timeout):
+                raise queue.Empty
+            if self._frame is None:
+                raise queue.Empty
+            frame = self._frame
+            self._frame = None
+            self.read += 1
+            return frame
+
+    def poll(self):
+        """
+        Latest unread frame or None, without waiting
+        """
+        try:
+            return self.get(block=False)
+        except queue.Empty:
+            return None
+
+    def empty(self):
+        return self._frame is None
+
+    def qsize(self):
+        return 0 if self._frame is None else 1
@@ -0,0 +1,344 @@
+# Numpy
+import numpy as np
+
+# Threads
+import threading
+import queue
+
+# Files
+import os
+import json
+
+
+# Recording directory content
+FRAMES_FILE = 'frames.raw'
+INDEX_FILE = 'index.bin'
+PARAMS_FILE = 'params.json'
+
+# Index record of one frame in FRAMES_FILE
+INDEX_DTYPE = np.dtype([
+    ('sequence', '<i8'), ('timestamp', '<i8'), ('position', '<i8'),
+    ('height', '<i4'), ('width', '<i4'),
+    ('offsetX', '<i4'), ('offsetY', '<i4'),
+])
+
+# Camera parameters stored with recording
+RECORDED_PARAMS = (
+    'ExposureTime', 'Gain', 'Width', 'Height', 'OffsetX', 'OffsetY',
+    'SensorWidth', 'SensorHeight', 'ResultingFrameRate', 'PixelFormat',
+)
+
+# Parameters which must match in all segments of one recording
+SEGMENT_INVARIANT_PARAMS = ('SensorWidth', 'SensorHeight', 'PixelFormat')
+
+
+def is_recording(path):
+    """
+    True if path is directory with recording
+    """
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+def read_segments(path):
+    """
+    Camera parameters of recording segments. Every recording session
+    appending to recording starts new segment. PARAMS_FILE holds
+    {'segments': [{'start': index record, 'params': dict}, ...]}, or
+    parameters dict of single segment in recordings made before segments
+
+    :param path: recording directory
+    :return: list of (start, params) sorted by start, start is index record
+    of first frame of segment
+    """
+    try:
+        with open(os.path.join(path, PARAMS_FILE)) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return [(0, {})]
+    if 'segments' not in stored:
+        return [(0, stored)]
+    return [(segment['start'], segment['params'])
+            for segment in stored['segments']]
+
+
+def write_segments(path, segments):
+    """
+    Write camera parameters of recording segments, see read_segments
+
+    :param path: recording directory
+    :param segments: list of (start, params)
+    """
+    with open(os.path.join(path, PARAMS_FILE), 'w') as f:
+        json.dump({'segments': [{'start': start, 'params': params}
+                                for start, params in segments]},
+                  f, indent=2)
+
+
+def camera_params(cam):
+    """
+    Values of RECORDED_PARAMS available on camera
+
+    :param cam: pylon.InstantCamera or EmulatedCamera
+    :return: dict
+    """
+    params = {}
+    for name in RECORDED_PARAMS:
+        try:
+            params[name] = getattr(cam, name).GetValue()
+        except Exception:
+            pass
+    return params
+
+
+class FrameRecorder:
+    def __init__(self, path, params=None, maxQueue=64):
+        """
+        Recorder streaming raw Mono8 frames to append-only FRAMES_FILE on
+        background thread, with INDEX_DTYPE record of every written frame
+        in INDEX_FILE and camera parameters in PARAMS_FILE. Appending to
+        existing recording adds parameter segment starting at first appended
+        frame, parameters of earlier segments are kept.
+
+        record is non-blocking and is called from OnImageGrabbed, frames are
+        dropped when writer does not keep up. Sequence number is incremented
+        for dropped frames too, so drops are visible as gaps in index.
+
+        :param path: recording directory, created if missing, appended to if
+        recording exists with same sensor size and pixel format
+        :param params: dict with camera parameters, see camera_params
+        :param maxQueue: maximum number of frames waiting for writer
+        """
+        self.path = path
+        self.params = params if params is not None else {}
+        self._queue = queue.Queue(maxsize=maxQueue)
+        self._thread = None
+        self.sequence = 0
+        self.written = 0
+        self.dropped = 0
+        # Parameter segments of existing recording and index record of
+        # first frame of this session
+        self.segments = []
+        self.firstRecord = 0
+        if is_recording(path):
+            reader = RecordingReader(path)
+            for name in SEGMENT_INVARIANT_PARAMS:
+                previous = reader.segments[-1][1].get(name)
+                if previous is not None and name in self.params and \
+                        self.params[name] != previous:
+                    print('\nCan not append to recording {}, {} {} differs '
+                          'from recorded {}'.format(
+                              path, name, self.params[name], previous))
+                    raise ValueError(name)
+            self.segments = [(start, params) for start, params
+                             in reader.segments if start < len(reader)]
+            self.firstRecord = len(reader)
+            # Continue sequence of existing recording
+            if len(reader):
+                self.sequence = int(reader.index['sequence'][-1]) + 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Write camera parameters of new segment and start writer thread
+        """
+        os.makedirs(self.path, exist_ok=True)
+        write_segments(
+            self.path, self.segments + [(self.firstRecord, self.params)])
+        self._thread = threading.Thread(
+            target=self._write_loop, name='FrameRecorder', daemon=True)
+        self._thread.start()
+        print('\nRecording frames to {}'.format(self.path))
+
+    def record(self, frame, timestamp=0, offsetX=0, offsetY=0):
+        """
+        Queue frame for writing without blocking. Frame is not copied and
+        must not be modified afterwards (grabResult.GetArray returns copy)
+
+        :param frame: 2D np.ndarray Mono8
+        :param timestamp: camera frame timestamp in ticks
+        :param offsetX: frame ROI x offset on sensor
+        :param offsetY: frame ROI y offset on sensor
+        :return: True if frame was queued
+        """
+        sequence = self.sequence
+        self.sequence += 1
+        try:
+            self._queue.put_nowait(
+                (sequence, timestamp, offsetX, offsetY, frame))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write_loop(self):
+        """
+        Append queued frames and index records until None is received
+        """
+        with open(os.path.join(self.path, FRAMES_FILE), 'ab') as frames, \
+                open(os.path.join(self.path, INDEX_FILE), 'ab') as index:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                sequence, timestamp, offsetX, offsetY, frame = item
+                height, width = frame.shape
+                record = np.array(
+                    (sequence, timestamp, frames.tell(), height, width,
+                     offsetX, offsetY), INDEX_DTYPE)
+                frames.write(np.ascontiguousarray(frame, np.uint8).data)
+                index.write(record.tobytes())
+                self.written += 1
+                if self._queue.empty():
+                    # Make frames visible to reader while recording
+                    frames.flush()
+                    index.flush()
+
+    def stop(self):
+        """
+        Write remaining queued frames and stop writer thread
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            print('\nRecorded frames: {}, dropped: {}'.format(
+                self.written, self.dropped))
+
+
+class RecordingReader:
+    def __init__(self, path):
+        """
+        Random access to recorded frames. FRAMES_FILE is memory-mapped and
+        frames are returned as read-only views, without copying. params are
+        camera parameters of first segment, frameParams of frame's segment
+
+        :param path: recording directory
+        """
+        self.path = path
+        if not is_recording(path):
+            raise FileNotFoundError('No recording found in {}'.format(path))
+        # Ignore incomplete last record of recording in progress
+        indexFn = os.path.join(path, INDEX_FILE)
+        count = os.path.getsize(indexFn) // INDEX_DTYPE.itemsize
+        self.index = np.fromfile(indexFn, INDEX_DTYPE, count=count)
+        framesFn = os.path.join(path, FRAMES_FILE)
+        if count and os.path.getsize(framesFn):
+            self._frames = np.memmap(framesFn, np.uint8, mode='r')
+        else:
+            self._frames = np.zeros(0, np.uint8)
+        self.segments = read_segments(path)
+        self.params = self.segments[0][1]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """
+        Zero-copy view of i-th recorded frame
+        """
+        record = self.index[i]
+        position = int(record['position'])
+        height, width = int(record['height']), int(record['width'])
+        return self._frames[position:position + height * width].reshape(
+            height, width)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def metadata(self, i):
+        """
+        Sequence number, camera timestamp and ROI offsets of i-th frame
+
+        :return: dict with sequence, timestamp, offsetX and offsetY
+        """
+        record = self.index[i]
+        return {'sequence': int(record['sequence']),
+                'timestamp': int(record['timestamp']),
+                'offsetX': int(record['offsetX']),
+                'offsetY': int(record['offsetY'])}
+
+    def frameParams(self, i):
+        """
+        Camera parameters of segment i-th frame was recorded in
+
+        :return: dict with camera parameters
+        """
+        params = self.segments[0][1]
+        for start, segmentParams in self.segments:
+            if start > i:
+                break
+            params = segmentParams
+        return params
+
+    def segmentRanges(self):
+        """
+        Index ranges of recorded frames in segments
+
+        :return: list of (start, stop)
+        """
+        starts = [min(start, len(self)) for start, _ in self.segments]
+        return list(zip(starts, starts[1:] + [len(self)]))
+
+    def sensorShape(self):
+        """
+        Sensor (height, width) from recorded parameters or frame extents
+        """
+        if 'SensorHeight' in self.params and 'SensorWidth' in self.params:
+            return self.params['SensorHeight'], self.params['SensorWidth']
+        return (int((self.index['offsetY'] + self.index['height']).max()),
+                int((self.index['offsetX'] + self.index['width']).max()))
+
+    def frameRate(self):
+        """
+        Mean recorded frame rate in FPS from camera timestamps, pauses
+        between segments are not included
+        """
+        frames = 0
+        duration = 0.
+        for start, stop in self.segmentRanges():
+            if stop - start < 2:
+                continue
+            frames += stop - start - 1
+            duration += (int(self.index['timestamp'][stop - 1]) -
+                         int(self.index['timestamp'][start])) / 1e9
+        if not frames or duration <= 0:
+            return self.params.get('ResultingFrameRate', 10.)
+        return frames / duration
+
+
+class RecordingFrameSource:
+    def __init__(self, reader, frame_rate=None):
+        """
+        Frame source for EmulatedCamera replaying recording in loop. Frames
+        recorded with reduced ROI are placed at recorded offsets on sensor
+
+        :param reader: RecordingReader
+        :param frame_rate: replay rate in FPS, recorded rate if None
+        """
+        if not len(reader):
+            raise ValueError('Recording {} is empty'.format(reader.path))
+        self.reader = reader
+        self.frame_rate = frame_rate if frame_rate else reader.frameRate()
+        self.height, self.width = reader.sensorShape()
+        self._sensor = np.zeros((self.height, self.width), np.uint8)
+
+    def next_frame(self, timestamp):
+        """
+        Recorded frame closest to timestamp in seconds
+        """
+        idx = int(timestamp * self.frame_rate) % len(self.reader)
+        frame = self.reader[idx]
+        if frame.shape == (self.height, self.width):
+            return frame
+        meta = self.reader.metadata(idx)
+        self._sensor[...] = 0
+        oy, ox = meta['offsetY'], meta['offsetX']
+        self._sensor[oy:oy + frame.shape[0], ox:ox + frame.shape[1]] = frame
+        return self._sensor
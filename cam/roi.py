@@ -0,0 +1,201 @@
+# Pylon
+from pypylon import pylon
+
+# Threads
+import threading
+
+
+def align_down(value, increment):
+    return (value // increment) * increment
+
+
+def align_up(value, increment):
+    return -(-value // increment) * increment
+
+
+def set_roi(cam, offsetX, width, offsetY, height):
+    """
+    Program camera ROI. Offsets are reset first so new size always fits
+    sensor. Camera must not be grabbing
+
+    :param cam: pylon.InstantCamera or EmulatedCamera
+    """
+    cam.OffsetX = cam.OffsetX.Min
+    cam.OffsetY = cam.OffsetY.Min
+    cam.Width = width
+    cam.Height = height
+    cam.OffsetX = offsetX
+    cam.OffsetY = offsetY
+
+
+def get_roi(cam):
+    """
+    Current camera ROI as (offsetX, width, offsetY, height)
+    """
+    return (cam.OffsetX.GetValue(), cam.Width.GetValue(),
+            cam.OffsetY.GetValue(), cam.Height.GetValue())
+
+
+def update_roi(cam, offsetX, width, offsetY, height,
+               strategy=pylon.GrabStrategy_LatestImageOnly):
+    """
+    Program camera ROI while camera may be grabbing. Offsets are changed
+    without stopping acquisition, grabbing is restarted only if Width or
+    Height changes. Called only from acquisition thread, holding its lock
+
+    :param cam: pylon.InstantCamera or EmulatedCamera
+    :param strategy: grab strategy of restarted grabbing
+    :return: True if grabbing was restarted
+    """
+    if (width, height) == (cam.Width.GetValue(), cam.Height.GetValue()):
+        # Same size, new offsets always fit sensor
+        cam.OffsetX = offsetX
+        cam.OffsetY = offsetY
+        return False
+    grabbing = cam.IsGrabbing()
+    if grabbing:
+        cam.StopGrabbing()
+    set_roi(cam, offsetX, width, offsetY, height)
+    if grabbing:
+        cam.StartGrabbing(
+            strategy, pylon.GrabLoop_ProvidedByInstantCamera)
+    return grabbing
+
+
+class AdaptiveROI:
+    def __init__(self, sensorWidth, sensorHeight, objectSize=800,
+                 centerTolerance=150, margin=50, incX=32, incY=2,
+                 settleCount=5, stage=None):
+        """
+        Sensor ROI limited to band where objects can be measured.
+
+        X band is fixed: objects are measured only when center is within
+        centerTolerance of sensor x-center, plus half object size and crop
+        margin. Y band starts at full sensor height, shrinks to observed
+        object positions after settleCount detections and widens only when
+        detected object touches ROI top or bottom edge.
+
+        update is called with detections from grab thread, apply from
+        acquisition thread while reading fewer lines raises frame rate.
+        Shifted band is applied while grabbing, only changed band size
+        restarts grabbing.
+
+        :param sensorWidth: sensor width in px
+        :param sensorHeight: sensor height in px
+        :param objectSize: maximum expected object size in px, replaced by
+        maxSize of stage
+        :param centerTolerance: allowed object distance from x-center in px
+        :param margin: crop margin around object in px
+        :param incX: camera OffsetX and Width increment
+        :param incY: camera OffsetY and Height increment
+        :param settleCount: number of detections before shrinking y band
+        :param stage: PreprocessStage whose maxSize, centerTolerance and crop
+        margin replace objectSize, centerTolerance and margin, so band covers
+        every crop of object stage measures, or None
+        """
+        self.sensorWidth = sensorWidth
+        self.sensorHeight = sensorHeight
+        self.objectSize = objectSize
+        self.incX = incX
+        self.incY = incY
+        self.settleCount = settleCount
+        self.lock = threading.Lock()
+        self.margin = None
+        self.offsetX = None
+        self.width = None
+        if stage is not None:
+            self.fitStage(stage)
+        else:
+            self._setBandX(centerTolerance, margin)
+        # Y band starts at full sensor height
+        self.offsetY = 0
+        self.height = sensorHeight
+        # Observed object extent in y
+        self.observedMinY = None
+        self.observedMaxY = None
+        self.detectionCount = 0
+        self.changed = True
+
+    def _setBandX(self, centerTolerance, margin):
+        """
+        Set x band around sensor x-center aligned to camera increments
+        """
+        self.margin = margin
+        half = centerTolerance + self.objectSize // 2 + margin
+        offsetX = max(0, align_down(self.sensorWidth // 2 - half, self.incX))
+        width = min(
+            align_up(self.sensorWidth // 2 + half - offsetX, self.incX),
+            align_down(self.sensorWidth - offsetX, self.incX)
+        )
+        if (offsetX, width) != (self.offsetX, self.width):
+            self.offsetX, self.width = offsetX, width
+            self.changed = True
+
+    def fitStage(self, stage):
+        """
+        Fit x band to maximal object size, centerTolerance and crop margin
+        of preprocessing stage (called again when stage definition is
+        reloaded)
+
+        :param stage: PreprocessStage
+        """
+        margin = stage.cropPadding(stage.binning(stage.maxSize))
+        with self.lock:
+            self.objectSize = stage.maxSize
+            self._setBandX(stage.centerTolerance, margin)
+
+    def _setBandY(self, minY, maxY):
+        """
+        Set y band to cover [minY, maxY] aligned to camera increments
+        """
+        offsetY = max(0, align_down(int(minY), self.incY))
+        height = min(
+            align_up(int(maxY) - offsetY, self.incY),
+            align_down(self.sensorHeight - offsetY, self.incY)
+        )
+        if (offsetY, height) != (self.offsetY, self.height):
+            self.offsetY, self.height = offsetY, height
+            self.changed = True
+
+    def update(self, detection):
+        """
+        Track object position in y and widen or shrink ROI if required
+
+        :param detection: Detection with sensor coordinates
+        """
+        with self.lock:
+            minY, maxY = detection.minimum[1], detection.maximum[1]
+            self.detectionCount += 1
+            if self.observedMinY is None:
+                self.observedMinY, self.observedMaxY = minY, maxY
+            self.observedMinY = min(self.observedMinY, minY)
+            self.observedMaxY = max(self.observedMaxY, maxY)
+            roiMaxY = self.offsetY + self.height
+            # Object cut by ROI edge, widen by half object size
+            if self.offsetY > 0 and minY <= self.offsetY + 1:
+                self._setBandY(
+                    minY - self.objectSize // 2, roiMaxY)
+            elif roiMaxY < self.sensorHeight and maxY >= roiMaxY - 2:
+                self._setBandY(
+                    self.offsetY, maxY + self.objectSize // 2)
+            elif self.detectionCount == self.settleCount:
+                # Shrink once to observed objects
+                self._setBandY(self.observedMinY - self.margin,
+                               self.observedMaxY + self.margin)
+
+    def apply(self, cam, strategy=pylon.GrabStrategy_LatestImageOnly):
+        """
+        Program changed ROI, see update_roi
+
+        :param cam: pylon.InstantCamera or EmulatedCamera
+        :return: True if ROI was changed
+        """
+        with self.lock:
+            if not self.changed:
+                return False
+            roi = (self.offsetX, self.width, self.offsetY, self.height)
+            self.changed = False
+        update_roi(cam, *roi, strategy=strategy)
+        print("\nAdaptive ROI: OffsetX {} Width {} OffsetY {} "
+              "Height {}".format(*roi))
+        return True
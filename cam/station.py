@@ -0,0 +1,254 @@
+# Pylon
+from pypylon import pylon
+
+# Threads and queues
+import threading
+import queue
+
+# Named tuples
+from collections import namedtuple
+
+# Camera object, acquisition and event handlers
+from cam.cam import CamObject
+from cam.acquisition import AcquisitionThread
+from cam.event_handlers import FrameMeasureEventHandler, \
+    ExposureEventHandler
+from cam.mailbox import FrameMailbox
+from gui.visualize import SignalChange
+
+# Parallel processing
+from processing.process import ProcessParallel
+from processing.scheduler import CoreScheduler
+from processing.latency import LatencyMonitor
+from processing.tracking import ObjectTracker
+
+
+# Measurement result of one object, tagged by camera
+StationResult = namedtuple(
+    'StationResult', ['cameraId', 'objectId', 'timestamp', 'measurement'])
+
+
+class CameraStation(CamObject):
+    def __init__(self, device=None, mmPxRatio=1., measureFlowchart=None,
+                 results=None, overlap_exposure=False, stage=None,
+                 policy='separate', measureProc=1, queueDepth=1,
+                 measureQueueDepth=4, **kwargs):
+        """
+        Measurement pipeline of one camera: acquisition thread, event handler
+        with object tracker, preprocessing and measurement worker processes
+        and result thread. Camera is selected by device serial number or
+        index.
+
+        :param device: device serial number (str) or index (int)
+        :param mmPxRatio: calibration mm/px ratio of camera
+        :param measureFlowchart: CompiledFlowchart measuring centered object
+        with SegmentationPrior of crop in measurement workers, only
+        detections are reported if None. Frames fused by measurements are
+        measured separately (FusedMeasurement result)
+        :param results: queue for StationResult, shared between stations
+        :param overlap_exposure: trigger next frame on ExposureEnd event
+        :param stage: preprocessing stage definition dict or file, defaults
+        if None
+        :param policy: 'separate' or 'priority' scheduling of detection and
+        measurement tasks, see ProcessParallel
+        :param measureProc: number of measurement workers with 'separate'
+        policy
+        :param queueDepth: maximal number of queued frames
+        :param measureQueueDepth: maximal number of queued measurements
+        :param kwargs: passed to CamObject
+        """
+        CamObject.__init__(self, device=device, **kwargs)
+        self.mmPxRatio = mmPxRatio
+        self.measureFlowchart = measureFlowchart
+        self.results = results if results is not None else queue.Queue()
+        self.stage = stage
+        self.scheduling = {
+            'policy': policy, 'measureProc': measureProc,
+            'queueDepth': queueDepth, 'measureQueueDepth': measureQueueDepth
+        }
+        self.procParallel = None
+        self.latency = LatencyMonitor()
+        self.acquisition = None
+        self.fm_hndl = None
+        self.exposure_events = None
+        if overlap_exposure and not self.free_run:
+            self.exposure_events = ExposureEventHandler()
+        self._result_thread = None
+        self._measuring = False
+
+    def weight(self):
+        """
+        Camera frame rate used for distributing cores between stations
+        """
+        return self.cam.ResultingFrameRate.GetValue()
+
+    def start(self, numberProc=1, cpus=None,
+              strategy=pylon.GrabStrategy_LatestImageOnly):
+        """
+        Start preprocessing workers, grabbing, acquisition and measurement
+
+        :param numberProc: number of preprocessing (or shared 'priority')
+        worker processes
+        :param cpus: CPU cores workers are pinned to or None
+        :param strategy: pylon grab strategy
+        """
+        self.procParallel = ProcessParallel(
+            self.measureFlowchart, numberProc=numberProc,
+            frameShape=(self.cam.HeightMax.GetValue(),
+                        self.cam.WidthMax.GetValue()),
+            cpus=cpus, stage=self.stage, mmPxRatio=self.mmPxRatio,
+            **self.scheduling
+        )
+        self.frame_queue = FrameMailbox()
+        self.preproc_queue = queue.Queue()
+        self.latency.syncClock(self.cam)
+        tracker = ObjectTracker(
+            tickFrequency=self.latency.tickFrequency,
+            fuseFrames=self.procParallel.stage.definition['fuseFrames'],
+            fusion=self.procParallel.stage.definition['fusion'])
+        self.fm_hndl = FrameMeasureEventHandler(
+            self.frame_queue, self.preproc_queue, self.procParallel,
+            tracker=tracker, latency=self.latency)
+        self.cam.RegisterImageEventHandler(
+            self.fm_hndl, pylon.RegistrationMode_ReplaceAll,
+            pylon.Cleanup_None)
+        self._measuring = True
+        self._result_thread = threading.Thread(
+            target=self._result_loop, daemon=True,
+            name='Results {}'.format(self.camera_id()))
+        self._result_thread.start()
+        if self.exposure_events is not None:
+            self.enable_exposure_events(self.exposure_events)
+        self.start_grabbing(strategy)
+        self.acquisition = AcquisitionThread(
+            self.cam, self.frame_queue, SignalChange(),
+            software_trigger=not self.free_run,
+            exposure_events=self.exposure_events)
+        self.acquisition.start()
+
+    def _result_loop(self):
+        """
+        Put tagged results of measurement workers (or detections if objects
+        are not measured) in shared queue. After stop, measurements still
+        pending in workers are retrieved
+        """
+        cameraId = self.camera_id()
+        procParallel = self.procParallel
+        while self._measuring or procParallel.pendingMeasurements() or \
+                not self.preproc_queue.empty():
+            measurement = None
+            if procParallel.ifMeasuring():
+                output = procParallel.getMeasurementOutput(timeout=0.1)
+                if output is None:
+                    continue
+                detection = output.detection
+                if output.error is not None:
+                    print('\nMeasurement on camera {} FAILED!'.format(
+                        cameraId))
+                    print(output.error)
+                    continue
+                measurement = output.measurement
+            else:
+                try:
+                    detection = self.preproc_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            if detection.trace is not None:
+                self.latency.record(detection.trace)
+            self.results.put(StationResult(
+                cameraId, detection.objectId, detection.timestamp,
+                measurement))
+
+    def stop(self):
+        """
+        Stop acquisition, grabbing, workers and measurement
+        """
+        if self.acquisition is not None:
+            self.acquisition.stop()
+            self.acquisition = None
+        if self.cam.IsGrabbing():
+            self.stop_grabbing()
+        if self.fm_hndl is not None:
+            # Stops workers after queued measurements
+            self.cam.DeregisterImageEventHandler(self.fm_hndl)
+            self.fm_hndl = None
+            if self.exposure_events is not None:
+                self.disable_exposure_events(self.exposure_events)
+        self._measuring = False
+        if self._result_thread is not None:
+            self._result_thread.join()
+            self._result_thread = None
+
+
+class StationGroup:
+    def __init__(self, stations, scheduler=None):
+        """
+        Several camera stations on one workstation, e.g. one per conveyor
+        lane. Worker processes of all stations are distributed over CPU cores
+        by shared CoreScheduler and results of all stations are merged into
+        one queue of StationResult tagged by camera.
+
+        :param stations: list of CameraStation
+        :param scheduler: CoreScheduler, all available cores if None
+        """
+        self.stations = stations
+        self.scheduler = scheduler if scheduler is not None \
+            else CoreScheduler()
+        self.results = queue.Queue()
+        for station in self.stations:
+            station.results = self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        self.close()
+
+    def open(self):
+        """
+        Create, open and set default parameters of all cameras
+        """
+        for station in self.stations:
+            station.create()
+            station.open()
+            station.set_default_params()
+
+    def start(self):
+        """
+        Allocate cores and start all stations
+        """
+        allocation = self.scheduler.allocate(
+            [station.weight() for station in self.stations])
+        for station, (numberProc, cpus) in zip(self.stations, allocation):
+            print('\nCamera {}: {} workers on cores {}'.format(
+                station.camera_id(), numberProc, cpus))
+            station.start(numberProc, cpus)
+
+    def stop(self):
+        for station in self.stations:
+            station.stop()
+
+    def close(self):
+        for station in self.stations:
+            station.close()
+
+    def reloadStage(self):
+        """
+        Reload modified preprocessing stage definitions of running stations
+        """
+        for station in self.stations:
+            if station.procParallel is not None:
+                station.procParallel.reloadStage()
+
+    def getResult(self, timeout=None):
+        """
+        Next result of any station
+
+        :param timeout: timeout in s, None blocks
+        :return: StationResult or None on timeout
+        """
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
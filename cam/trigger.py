@@ -0,0 +1,139 @@
+# Numpy
+import numpy as np
+
+# Threads and timing
+import threading
+import collections
+import time
+
+
+class PredictiveTrigger:
+    def __init__(self, centerX, searchInterval=0.25, history=5,
+                 gate=400., captureLatency=0., tickFrequency=1e9):
+        """
+        Software trigger scheduling from conveyor speed estimation.
+
+        Without tracked object camera is triggered every searchInterval
+        seconds. Object velocity along x is estimated from successive
+        detections (least squares on camera timestamps) and next trigger is
+        scheduled for the moment object crosses centerX, so only one or two
+        frames per part contain centered object.
+
+        Camera timestamps are converted to host time (time.perf_counter) with
+        minimal observed delivery delay of recent frames, corrected by
+        captureLatency (exposure and readout time).
+
+        :param centerX: sensor x-coordinate of measurement center line
+        :param searchInterval: trigger interval without tracked object in s
+        :param history: number of detections used for velocity estimation
+        :param gate: maximum distance in px between predicted and detected
+        position for detection to belong to tracked object
+        :param captureLatency: time from trigger to frame delivery in s
+        :param tickFrequency: camera timestamp tick frequency in Hz
+        """
+        self.centerX = centerX
+        self.searchInterval = searchInterval
+        self.gate = gate
+        self.captureLatency = captureLatency
+        self.tickFrequency = tickFrequency
+        self.lock = threading.Lock()
+        # Tracked object detections (camera time in s, x)
+        self.track = collections.deque(maxlen=history)
+        self.trackDone = False
+        # Camera to host clock offsets of recent frames
+        self.clockOffsets = collections.deque(maxlen=50)
+        self.lastTrigger = 0.
+        self.scheduled = None
+        self.velocity = 0.
+
+    def observeFrame(self, timestamp, hostTime=None):
+        """
+        Record camera timestamp and host time of frame delivery. Called from
+        grab thread for every grabbed frame
+
+        :param timestamp: camera frame timestamp in ticks
+        :param hostTime: time.perf_counter() at delivery
+        """
+        if hostTime is None:
+            hostTime = time.perf_counter()
+        with self.lock:
+            self.clockOffsets.append(
+                hostTime - timestamp / self.tickFrequency)
+
+    def _toHostTime(self, cameraTime):
+        """
+        Host trigger time producing frame at cameraTime in s
+        """
+        return cameraTime + min(self.clockOffsets) - self.captureLatency
+
+    def _velocity(self):
+        """
+        Least squares estimate of object velocity in px/s
+        """
+        t, x = np.asarray(self.track).T
+        t = t - t.mean()
+        denominator = (t * t).sum()
+        if denominator <= 0:
+            return 0.
+        return float((t * (x - x.mean())).sum() / denominator)
+
+    def update(self, detection):
+        """
+        Update tracked object with detection and schedule trigger for
+        center line crossing
+
+        :param detection: Detection with sensor coordinates and timestamp
+        """
+        if detection.timestamp is None:
+            return
+        cameraTime = detection.timestamp / self.tickFrequency
+        x = detection.center[0]
+        with self.lock:
+            if len(self.track) >= 2:
+                # Gate detection with known velocity
+                lastTime, lastX = self.track[-1]
+                predictedX = lastX + self.velocity * (cameraTime - lastTime)
+                if abs(x - predictedX) > self.gate:
+                    # New object
+                    self.track.clear()
+                    self.trackDone = False
+                    self.velocity = 0.
+            self.track.append((cameraTime, x))
+            if detection.crop is not None:
+                # Centered frame of tracked object already acquired
+                self.trackDone = True
+                self.scheduled = None
+                return
+            if self.trackDone or len(self.track) < 2:
+                return
+            self.velocity = self._velocity()
+            if self.velocity == 0. or not self.clockOffsets:
+                return
+            crossing = cameraTime + (self.centerX - x) / self.velocity
+            if crossing <= cameraTime:
+                # Object already passed center line
+                self.scheduled = None
+                return
+            self.scheduled = self._toHostTime(crossing)
+
+    def nextTrigger(self):
+        """
+        Host time of next trigger: scheduled center line crossing or next
+        search trigger, whichever comes first
+        """
+        with self.lock:
+            searchTrigger = self.lastTrigger + self.searchInterval
+            if self.scheduled is not None:
+                return min(self.scheduled, searchTrigger)
+            return searchTrigger
+
+    def triggered(self, hostTime=None):
+        """
+        Record trigger execution
+        """
+        if hostTime is None:
+            hostTime = time.perf_counter()
+        with self.lock:
+            self.lastTrigger = hostTime
+            if self.scheduled is not None and self.scheduled <= hostTime:
+                self.scheduled = None
@@ -8,6 +8,9 @@ from pyqtgraph.dockarea import DockArea, Dock
 # Itertools
 import itertools
 
+# Flowchart compiled for measurement workers
+from processing.compiler import compile_state
+
 # Plot Widget
 from gui.visualize import FlowchartPlotWidget
 
@@ -24,7 +27,7 @@ from processing.nodes import (
     KuwaharaNode, BilateralFilterNode, BinaryAreaClosingNode,
     BinaryAreaOpeningNode, BinaryClosingNode, BinaryOpeningNode,
     BinaryDilationNode, BinaryErosionNode, OperatorPlusNode,
-    CombineMeasurementNode
+    CombineMeasurementNode, PriorSeedsNode, PriorMaskNode
 )
 
 
@@ -228,6 +231,7 @@ class FlowchartMeasureWindow:
             terminals={
                 'dipImgIn': {'io': 'in'},
                 'mmPxRatio': {'io': 'in'},
+                'priorIn': {'io': 'in'},
                 'dipMeasurementOut': {'io': 'out'},
             }
         )
@@ -276,7 +280,8 @@ class FlowchartMeasureWindow:
         [self.fc_library.addNodeType(
             nd, [('dipImage', 'Segmentation')]) for nd in (
             ThresholdNode, RangeThresholdNode, MinimaNode, MaximaNode,
-            WatershedNode, SeededWatershedNode, CannyNode, SegmentORingNode
+            WatershedNode, SeededWatershedNode, CannyNode, SegmentORingNode,
+            PriorSeedsNode, PriorMaskNode
         )]
         # Morphological nodes
         [self.fc_library.addNodeType(
@@ -344,19 +349,34 @@ class FlowchartMeasureWindow:
             if isinstance(node, ORingMeasurementDisplayNode):
                 node.setDisplayWidgetList(self.disp_widg)
 
-    def setInput(self, dip_img, mmPxRatio):
+    def priorArgs(self, prior):
+        """
+        Prior input for flowcharts with priorIn terminal (flowcharts stored
+        before priorIn was added don't have it)
+        """
+        if 'priorIn' in self.fc.inputs():
+            return {'priorIn': prior}
+        return {}
+
+    def setInput(self, dip_img, mmPxRatio, prior=None):
         """
         Set Flowchart input
         """
         self.mmPxRatio = mmPxRatio
-        self.fc.setInput(dipImgIn=dip_img, mmPxRatio=mmPxRatio)
+        self.fc.setInput(dipImgIn=dip_img, mmPxRatio=mmPxRatio,
+                         **self.priorArgs(prior))
 
-    def fc_process(self, dip_img):
+    def fc_process(self, dip_img, mmPxRatio=None, prior=None):
         """
-        Process data with display=False (speed increase) and return output
+        Process data with display=False (speed increase) and return output.
+        mmPxRatio overrides ratio set with setInput (per camera calibration),
+        prior is SegmentationPrior of crop from preprocessing or None
         """
+        if mmPxRatio is None:
+            mmPxRatio = self.mmPxRatio
         return self.fc.process(
-            dipImgIn=dip_img, mmPxRatio=self.mmPxRatio)['dipMeasurementOut']
+            dipImgIn=dip_img, mmPxRatio=mmPxRatio,
+            **self.priorArgs(prior))['dipMeasurementOut']
 
     def output(self):
         """
@@ -364,6 +384,15 @@ class FlowchartMeasureWindow:
         """
         return self.fc.output()['dipMeasurementOut']
 
+    def compile(self):
+        """
+        Flowchart with current nodes and control values compiled for
+        measurement workers, later changes in window are not applied
+
+        :return: CompiledFlowchart
+        """
+        return compile_state(self.fc.saveState())
+
     def show(self):
         self.win.show()
 
@@ -23,19 +23,60 @@ import PyDIP as dip
 
 # Camera object
 from cam.cam import CamObject
-from cam.event_handlers import FrameGrabEventHandler, FrameMeasureEventHandler
+from cam.acquisition import AcquisitionThread
+from cam.roi import AdaptiveROI, get_roi, set_roi
+from cam.idle import IdleMode
+from cam.trigger import PredictiveTrigger
+from cam.recorder import FrameRecorder, camera_params
+from cam.mailbox import FrameMailbox
+from cam.event_handlers import FrameGrabEventHandler, \
+    FrameMeasureEventHandler, ExposureEventHandler
 from pypylon import pylon
 
 # Parallel processing
 from processing.process import ProcessParallel
+from processing.latency import LatencyMonitor
+from processing.tracking import ObjectTracker
+from processing.fusion import FusedMeasurement
 
 # Queue module
 import queue
 
 
 class MeasuringApp(CamObject, QtGui.QMainWindow):
-    def __init__(self, *args, **kwargs):
-        CamObject.__init__(self)
+    def __init__(self, *args, acquisition_thread=True, adaptive_roi=False,
+                 predictive_trigger=False, record_path=None,
+                 overlap_exposure=False, idle_mode=False,
+                 preprocess_stage=None, policy='separate', measure_proc=1,
+                 queue_depth=1, measure_queue_depth=4, **kwargs):
+        """
+        Application main window
+
+        :param acquisition_thread: trigger and collect frames in
+        AcquisitionThread instead of QTimer scheduled frame_burst
+        :param adaptive_roi: limit camera ROI to band where objects are
+        measured during real-time measurement (requires acquisition_thread)
+        :param predictive_trigger: trigger camera when object crosses
+        center line during real-time measurement (requires
+        acquisition_thread and software trigger)
+        :param record_path: directory for recording frames grabbed during
+        real-time measurement or None
+        :param overlap_exposure: trigger next frame on ExposureEnd camera
+        event instead of frame arrival (requires acquisition_thread and
+        software trigger)
+        :param idle_mode: switch to low-cost presence check ROI when no
+        object is detected (requires acquisition_thread)
+        :param preprocess_stage: preprocessing stage definition file,
+        reloaded on change during real-time measurement, defaults if None
+        :param policy: 'separate' or 'priority' scheduling of detection and
+        measurement tasks, see ProcessParallel
+        :param measure_proc: number of measurement workers with 'separate'
+        policy
+        :param queue_depth: maximal number of queued frames
+        :param measure_queue_depth: maximal number of queued measurements
+        :param kwargs: passed to CamObject
+        """
+        CamObject.__init__(self, **kwargs)
         QtGui.QMainWindow.__init__(self)
         self.resize(700, 150)
         self.setWindowTitle('Workpiece Dimensional Control')
@@ -97,6 +138,50 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
         # FPS display count
         self.fps_display_count = 0
 
+        # Acquisition thread and signals for GUI update
+        self.acquisition_thread = acquisition_thread
+        self.acquisition = None
+        self.signals = None
+
+        # Adaptive ROI and ROI restored after real-time measurement
+        self.adaptive_roi = adaptive_roi and acquisition_thread
+        self.roi = None
+        self._saved_roi = None
+
+        # Predictive software triggering
+        self.predictive_trigger = (
+            predictive_trigger and acquisition_thread and not self.free_run)
+        self.trigger = None
+
+        # Idle mode for empty conveyor
+        self.idle_mode = idle_mode and acquisition_thread
+        self.idle = None
+
+        # ExposureEnd events for overlapping exposure with frame transfer
+        self.overlap_exposure = (
+            overlap_exposure and acquisition_thread and not self.free_run)
+        self.exposure_events = None
+
+        # Preprocessing stage definition, checked for changes every second
+        self.preprocess_stage = preprocess_stage
+        self.procParallel = None
+
+        # Scheduling of detection and measurement workers
+        self.scheduling = {
+            'policy': policy, 'measureProc': measure_proc,
+            'queueDepth': queue_depth,
+            'measureQueueDepth': measure_queue_depth
+        }
+        self._stage_timer = QtCore.QTimer()
+        self._stage_timer.timeout.connect(self.reload_stage)
+
+        # Per-frame latency tracing of real-time measurement
+        self.latency = None
+
+        # Recording of real-time measurement frames
+        self.record_path = record_path
+        self.recorder = None
+
     def cam_buttons(self):
         """
         Menu buttons as list
@@ -192,7 +277,7 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
         """
         if not self.cam.IsGrabbing():
             self._orig_frame.show()
-            self.frame_queue = queue.Queue()
+            self.frame_queue = FrameMailbox()
             fg_hndl = FrameGrabEventHandler(self.frame_queue)
             # Frame grab event registering
             self.cam.RegisterImageEventHandler(
@@ -201,13 +286,17 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
                 pylon.Cleanup_Delete
             )
             super().start_grabbing(strategy)
-            self.frame_burst(graphicsObject=self._orig_frame)
+            if self.acquisition_thread:
+                self.start_acquisition(graphicsObject=self._orig_frame)
+            else:
+                self.frame_burst(graphicsObject=self._orig_frame)
 
     def stop_grabbing(self):
         """
         Reimplementation of stop_grabbing to close new window
         """
         if self.cam.IsGrabbing():
+            self.stop_acquisition()
             super().stop_grabbing()
             self._orig_frame.close()
 
@@ -233,6 +322,8 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
             self.fps_start = pg.ptime.time()
         if self.cam.IsGrabbing():
             for _ in range(numProc):
+                if self.free_run:
+                    break
                 if self.cam.WaitForFrameTriggerReady(
                         300, pylon.TimeoutHandling_ThrowException):
                     self.cam.ExecuteSoftwareTrigger()
@@ -245,11 +336,7 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
                 [graphicsObject.update_frame(frame) for frame in frames]
                 self.fps_count += numProc
             if updateMeasurementResult:
-                while not self.preproc_queue.empty():
-                    graphicsObject.update_measurement_result(
-                        self._measure_prep_window.fc_process(
-                            dip.Image(self.preproc_queue.get())
-                        ))
+                self.update_measurement_result(graphicsObject)
             # Average FPS on number of frames
             if self.fps_count >= 10:
                 fps_time = pg.ptime.time() - self.fps_start
@@ -257,6 +344,8 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
                 print("Camera FPS: {:.2f}".format(
                     self.cam.ResultingFrameRate.GetValue()))
                 print("FPS: {:.2f}".format(self.fps))
+                print("Display dropped frames: {}".format(
+                    self.frame_queue.dropped))
                 self.fps_count = 0
             QtCore.QTimer.singleShot(
                 1, lambda : self.frame_burst(graphicsObject,
@@ -265,6 +354,113 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
                                              numProc,
                                              ))
 
+    def update_measurement_result(self, graphicsObject, wait=False):
+        """
+        Update graphicsObject table with all measurements finished by
+        measurement workers
+
+        :param graphicsObject: object which methods are called
+        :param wait: wait for all queued measurements (after workers were
+        stopped)
+        """
+        procParallel = self.procParallel
+        if procParallel is None:
+            return
+        while procParallel.pendingMeasurements():
+            output = procParallel.getMeasurementOutput(
+                timeout=1. if wait else 0.)
+            if output is None:
+                break
+            if output.error is not None:
+                print('\nMeasurement FAILED!')
+                print(output.error)
+                continue
+            trace = output.detection.trace
+            result = output.measurement
+            if isinstance(result, FusedMeasurement):
+                # Table shows fused mean and standard deviation, first
+                # fused frame gives only table layout. Object without
+                # measured frame is not shown
+                if result.count:
+                    graphicsObject.update_measurement_result(
+                        result.measurements[0], fused=result)
+            else:
+                graphicsObject.update_measurement_result(result)
+            if trace is not None and self.latency is not None:
+                trace.mark('displayed')
+                self.latency.record(trace)
+
+    def start_acquisition(self, graphicsObject, updateFrame=True,
+                          updateFPS=True, updateMeasurementResult=False,
+                          fps_display=5, roi=None, trigger=None, idle=None):
+        """
+        Start AcquisitionThread and connect its signals with graphicsObject
+        update functions. Camera must be grabbing.
+
+        :param graphicsObject: object which methods are called and graphics updated
+        :param updateFrame: bool
+        :param updateFPS: bool
+        :param updateMeasurementResult: bool
+        :param fps_display: int
+        :param roi: AdaptiveROI or None
+        :param trigger: PredictiveTrigger or None
+        :param idle: IdleMode or None
+        """
+        self.signals = SignalChange()
+        if updateFrame:
+            self.signals.updateGraphics.connect(
+                lambda: self.update_frame(graphicsObject))
+        if updateFPS:
+            self.signals.updateFPS.connect(
+                lambda: graphicsObject.update_fps(self.acquisition.fps))
+        if updateMeasurementResult:
+            self.signals.updateMeasurement.connect(
+                lambda: self.update_measurement_result(graphicsObject))
+        self.signals.updateFPS.connect(self.print_fps)
+        if self.overlap_exposure:
+            self.exposure_events = ExposureEventHandler()
+            self.enable_exposure_events(self.exposure_events)
+        self.acquisition = AcquisitionThread(
+            self.cam, self.frame_queue, self.signals,
+            preproc_queue=self.procParallel.measure_output_queue
+            if updateMeasurementResult else None,
+            software_trigger=not self.free_run, fps_display=fps_display,
+            roi=roi, trigger=trigger, exposure_events=self.exposure_events,
+            idle=idle
+        )
+        self.acquisition.start()
+
+    def update_frame(self, graphicsObject):
+        """
+        Show latest frame from AcquisitionThread display mailbox
+        """
+        if self.acquisition is not None:
+            frame = self.acquisition.display.poll()
+            if frame is not None:
+                graphicsObject.update_frame(frame)
+
+    def stop_acquisition(self):
+        """
+        Stop AcquisitionThread if running
+        """
+        if self.acquisition is not None:
+            self.acquisition.stop()
+            self.acquisition = None
+            self.signals = None
+        if self.exposure_events is not None:
+            self.disable_exposure_events(self.exposure_events)
+            self.exposure_events = None
+
+    def print_fps(self):
+        """
+        Print FPS measured by AcquisitionThread
+        """
+        self.fps = self.acquisition.fps
+        print("Camera FPS: {:.2f}".format(self.acquisition.cam_fps))
+        print("FPS: {:.2f}".format(self.fps))
+        print("Display dropped frames: {}".format(
+            self.frame_queue.dropped + self.acquisition.display.dropped))
+
     def grab_single_frame(self):
         self._prep_flow.set_frame(self._orig_frame.grab_single_frame())
         self._prep_flow.show()
@@ -306,15 +502,79 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
         """
         if not self.cam.IsGrabbing():
             self._realtime_measure_window.show()
+            if self.adaptive_roi:
+                # Object centering relative to sensor, not ROI
+                sensorCenterX = self.cam.SensorWidth.GetValue() // 2
+            else:
+                sensorCenterX = None
+            # Flowchart of preparation window measured in workers
             procParallel = ProcessParallel(
-                self._measure_prep_window, numberProc=3
+                self._measure_prep_window.compile(), numberProc=3,
+                frameShape=(self.cam.HeightMax.GetValue(),
+                            self.cam.WidthMax.GetValue()),
+                sensorCenterX=sensorCenterX, stage=self.preprocess_stage,
+                mmPxRatio=self._measure_prep_window.mmPxRatio,
+                **self.scheduling
             )
-            # Queue for storing frames
-            self.frame_queue = queue.Queue()
+            self.procParallel = procParallel
+            if self.adaptive_roi:
+                self._saved_roi = get_roi(self.cam)
+                # X band from centering and crop margin of stage
+                self.roi = AdaptiveROI(
+                    self.cam.SensorWidth.GetValue(),
+                    self.cam.SensorHeight.GetValue(),
+                    incX=self.cam.Width.Inc, incY=self.cam.Height.Inc,
+                    stage=procParallel.stage
+                )
+            else:
+                self.roi = None
+            # Camera clock and timestamp tick frequency of trigger, tracker
+            # and latency traces
+            self.latency = LatencyMonitor()
+            self.latency.syncClock(self.cam)
+            if self.predictive_trigger:
+                if sensorCenterX is not None:
+                    centerX = sensorCenterX
+                else:
+                    centerX = (self.cam.OffsetX.GetValue() +
+                               self.cam.Width.GetValue() // 2)
+                # Frame delivery delay approximated by frame period
+                self.trigger = PredictiveTrigger(
+                    centerX, captureLatency=1. / (
+                        self.cam.ResultingFrameRate.GetValue()),
+                    tickFrequency=self.latency.tickFrequency
+                )
+            else:
+                self.trigger = None
+            if self.idle_mode:
+                if self._saved_roi is None:
+                    self._saved_roi = get_roi(self.cam)
+                self.idle = IdleMode(
+                    self.cam.SensorWidth.GetValue(),
+                    self.cam.SensorHeight.GetValue(),
+                    incY=self.cam.Height.Inc, measureRoi=self.roi
+                )
+            else:
+                self.idle = None
+            if self.preprocess_stage is not None:
+                self._stage_timer.start(1000)
+            if self.record_path is not None:
+                self.recorder = FrameRecorder(
+                    self.record_path, camera_params(self.cam))
+                self.recorder.start()
+            # Latest frame for display
+            self.frame_queue = FrameMailbox()
             # Queue for storing measurement result list
             self.preproc_queue = queue.Queue()
+            tracker = ObjectTracker(
+                tickFrequency=self.latency.tickFrequency,
+                fuseFrames=procParallel.stage.definition['fuseFrames'],
+                fusion=procParallel.stage.definition['fusion']
+            )
             self.fm_hndl = FrameMeasureEventHandler(
-                self.frame_queue, self.preproc_queue, procParallel
+                self.frame_queue, self.preproc_queue, procParallel,
+                roi=self.roi, trigger=self.trigger, tracker=tracker,
+                recorder=self.recorder, latency=self.latency, idle=self.idle
             )
             # Frame grab event registering
             self.cam.RegisterImageEventHandler(
@@ -323,18 +583,52 @@ class MeasuringApp(CamObject, QtGui.QMainWindow):
                 pylon.Cleanup_Delete
             )
             super().start_grabbing(strategy)
-            self.frame_burst(
-                graphicsObject=self._realtime_measure_window,
-                updateFPS=False, updateMeasurementResult=True,
-                fps_display=10,
-                # numProc=procParallel.getNumProc()
-            )
+            if self.acquisition_thread:
+                self.start_acquisition(
+                    graphicsObject=self._realtime_measure_window,
+                    updateFPS=False, updateMeasurementResult=True,
+                    fps_display=10, roi=self.roi, trigger=self.trigger,
+                    idle=self.idle
+                )
+            else:
+                self.frame_burst(
+                    graphicsObject=self._realtime_measure_window,
+                    updateFPS=False, updateMeasurementResult=True,
+                    fps_display=10,
+                    # numProc=procParallel.getNumProc()
+                )
+
+    def reload_stage(self):
+        """
+        Reload modified preprocessing stage definition in running workers
+        and fit adaptive ROI to reloaded stage
+        """
+        if self.procParallel is not None and \
+                self.procParallel.reloadStage() and self.roi is not None:
+            self.roi.fitStage(self.procParallel.stage)
 
     def stop_realtime_measurement(self):
         """
         Close window for realtime measurement and stop grabbing frames from cam
         """
         if self.cam.IsGrabbing():
+            self._stage_timer.stop()
+            self.stop_acquisition()
             super().stop_grabbing()
-            self._realtime_measure_window.close()
+            # Measures objects left in tracker and stops workers
             self.cam.DeregisterImageEventHandler(self.fm_hndl)
+            self.update_measurement_result(
+                self._realtime_measure_window, wait=True)
+            self.procParallel.print_queue_stats()
+            self.procParallel = None
+            self._realtime_measure_window.close()
+            if self.recorder is not None:
+                self.recorder.stop()
+                self.recorder = None
+            self.latency.print_summary()
+            if self._saved_roi is not None:
+                # Restore ROI set before measurement
+                set_roi(self.cam, *self._saved_roi)
+                self._saved_roi = None
+            self.roi = None
+            self.idle = None
@@ -207,9 +207,14 @@ class FlowchartPlotWidget(pg.GraphicsLayoutWidget):
 
     def setImage(self, dip_img):
         """
-        Convenience function for displaying dip.Image inside plot
+        Convenience function for displaying dip.Image inside plot. Image
+        buffer is displayed in native data type without copy, binary images
+        are viewed as uint8
         """
-        self.img.setImage(np.asarray(dip_img, dtype=np.uint32))
+        img = np.asarray(dip_img)
+        if img.dtype == np.bool_:
+            img = img.view(np.uint8)
+        self.img.setImage(img)
 
     def setTitle(self, title):
         """
@@ -308,12 +313,15 @@ w.appendRow([11, 11])
             self.vLine.setValue(xAxisCenter)
             self.xAxisCenter = xAxisCenter
 
-    def update_measurement_result(self, resultList):
+    def update_measurement_result(self, resultList, fused=None):
         """
         Update table with measurement results. Column labels are set only on
         first call
 
         :param resultList: list of dip.Measurement objects
+        :param fused: FusedMeasurement of several frames or None. Table
+        layout is taken from resultList (first fused frame), rows show fused
+        mean and are followed by rows with standard deviation
         """
         # Number of measured objects
         self.numMeasured += 1
@@ -339,6 +347,8 @@ w.appendRow([11, 11])
             ]
             # self.resultTable.setHorizontalHeaderLabels(self.columnLabels)
 
+        # Position in fused values, same order as table rows
+        offset = 0
         # Append rows at the end of table
         for dipMsr, i in zip(resultList, range(len(resultList))):
             # For every dip.Measurement object
@@ -349,11 +359,17 @@ w.appendRow([11, 11])
                 combinedList = [
                     comb for sublist in combinedList for comb in sublist
                 ]
+                rowLabel = '_'.join((str(self.numMeasured), whichDiam[i]))
+                if fused is not None:
+                    end = offset + len(combinedList)
+                    combinedList = list(fused.mean[offset:end])
                 self.resultTable.appendRow(combinedList)
                 # Append row Labels
-                self.rowLabels.append(
-                    '_'.join((str(self.numMeasured), whichDiam[i]))
-                )
+                self.rowLabels.append(rowLabel)
+                if fused is not None:
+                    self.resultTable.appendRow(list(fused.std[offset:end]))
+                    self.rowLabels.append('_'.join((rowLabel, 'std')))
+                    offset = end
 
         # Set Row labels in table
         self.resultTable.setVerticalHeaderLabels(self.rowLabels)
@@ -395,4 +411,5 @@ class SignalChange(QtCore.QObject):
     """
     updateGraphics = QtCore.pyqtSignal()
     updateFPS = QtCore.pyqtSignal()
+    updateMeasurement = QtCore.pyqtSignal()
 
@@ -17,6 +17,10 @@ import pyforms
 from gui.mainwindow import MeasuringApp
 from pyqtgraph import QtGui
 
+# Camera emulator
+from cam.emulator import SyntheticORingSource, DirectoryFrameSource
+from cam.recorder import RecordingReader, RecordingFrameSource, is_recording
+
 
 def save_cam_params(cam, fn):
     """
@@ -47,11 +51,96 @@ def grab_one_pic(cam, cs=pylon.PixelType_RGB8packed):
     return img.GetArray()
 
 
+def emulator_source(argv):
+    """
+    Frame source for camera emulator from command line arguments:
+    --emulate for synthetic O-rings or --emulate <dir> for recording made
+    with --record or directory with .npy frames
+
+    :param argv: list of command line arguments
+    :return: frame source or None
+    """
+    if '--emulate' not in argv:
+        return None
+    idx = argv.index('--emulate')
+    if idx + 1 < len(argv) and not argv[idx + 1].startswith('-'):
+        path = argv[idx + 1]
+        if is_recording(path):
+            return RecordingFrameSource(RecordingReader(path))
+        return DirectoryFrameSource(path)
+    return SyntheticORingSource()
+
+
+def record_path(argv):
+    """
+    Recording directory from --record <dir> command line argument
+
+    :param argv: list of command line arguments
+    :return: directory or None
+    """
+    if '--record' not in argv:
+        return None
+    idx = argv.index('--record')
+    if idx + 1 >= len(argv) or argv[idx + 1].startswith('-'):
+        raise ValueError('--record requires recording directory')
+    return argv[idx + 1]
+
+
+def preprocess_stage(argv):
+    """
+    Preprocessing stage definition file from --stage <file> command line
+    argument
+
+    :param argv: list of command line arguments
+    :return: file name or None
+    """
+    if '--stage' not in argv:
+        return None
+    idx = argv.index('--stage')
+    if idx + 1 >= len(argv) or argv[idx + 1].startswith('-'):
+        raise ValueError('--stage requires stage definition file')
+    return argv[idx + 1]
+
+
+def scheduling(argv):
+    """
+    Scheduling of detection and measurement workers from --policy <name>,
+    --measure-proc <n>, --queue-depth <n> and --measure-queue-depth <n>
+    command line arguments
+
+    :param argv: list of command line arguments
+    :return: dict of MeasuringApp keyword arguments
+    """
+    options = {'--policy': ('policy', str),
+               '--measure-proc': ('measure_proc', int),
+               '--queue-depth': ('queue_depth', int),
+               '--measure-queue-depth': ('measure_queue_depth', int)}
+    kwargs = {}
+    for option, (name, convert) in options.items():
+        if option not in argv:
+            continue
+        idx = argv.index(option)
+        if idx + 1 >= len(argv) or argv[idx + 1].startswith('-'):
+            raise ValueError('{} requires value'.format(option))
+        kwargs[name] = convert(argv[idx + 1])
+    return kwargs
+
+
 if __name__ == "__main__":
         # save_cam_params(cam, "Features.pfs")
         # pyforms.start_app(MeasuringApp)
         app = QtGui.QApplication(sys.argv)
-        GUI = MeasuringApp()
+        GUI = MeasuringApp(
+            emulator_source=emulator_source(sys.argv),
+            free_run='--free-run' in sys.argv,
+            adaptive_roi='--adaptive-roi' in sys.argv,
+            predictive_trigger='--predictive-trigger' in sys.argv,
+            record_path=record_path(sys.argv),
+            overlap_exposure='--overlap-exposure' in sys.argv,
+            idle_mode='--idle-mode' in sys.argv,
+            preprocess_stage=preprocess_stage(sys.argv),
+            **scheduling(sys.argv)
+        )
         sys.exit(app.exec_())
         """
         # Korekcijski faktor debljine etalona
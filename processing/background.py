@@ -0,0 +1,72 @@
+# Numpy
+import numpy as np
+
+
+class BackgroundModel:
+    def __init__(self, rate=0.05, threshold=20, minArea=100, warmup=10,
+                 absorbFrames=100, step=2):
+        """
+        Running mean background of decimated detection image for cheap
+        object presence test. Only pixels close to background are updated,
+        so passing objects are not absorbed while slow illumination drift
+        is followed. Pixels differing from background for absorbFrames
+        consecutive frames are absorbed into background (object present
+        while model was built, lasting illumination change). Model is reset
+        when frame ROI changes
+
+        :param rate: running mean update rate of background pixels
+        :param threshold: absolute difference from background of object
+        pixels
+        :param minArea: minimal number of object pixels of detection image
+        for presence
+        :param warmup: number of frames used for building model, presence
+        is reported during warmup
+        :param absorbFrames: number of consecutive object frames after which
+        pixel is absorbed into background
+        :param step: pixel subsampling step of detection image
+        """
+        self.rate = rate
+        self.threshold = threshold
+        self.minArea = minArea / step**2
+        self.warmup = warmup
+        self.absorbFrames = absorbFrames
+        self.step = step
+        self.reset()
+
+    def reset(self):
+        self.mean = None
+        self.still = None
+        self.roi = None
+        self.frames = 0
+
+    def present(self, img, offsetX=0, offsetY=0):
+        """
+        Test frame for object presence and update background
+
+        :param img: 2D np.ndarray decimated detection image
+        :param offsetX: frame ROI x offset on sensor
+        :param offsetY: frame ROI y offset on sensor
+        :return: True if object may be present
+        """
+        img = img[::self.step, ::self.step]
+        roi = (img.shape, offsetX, offsetY)
+        if roi != self.roi:
+            self.reset()
+            self.roi = roi
+            self.mean = img.astype(np.float32)
+            self.still = np.zeros(img.shape, np.uint16)
+        diff = img - self.mean
+        if self.frames < self.warmup:
+            self.frames += 1
+            self.mean += self.rate * diff
+            return True
+        background = np.abs(diff) <= self.threshold
+        # Selective update, object pixels keep background value
+        self.mean += self.rate * diff * background
+        # Consecutive object frames of every pixel
+        self.still += 1
+        self.still[background] = 0
+        absorb = self.still >= self.absorbFrames
+        np.copyto(self.mean, img, where=absorb)
+        self.still[absorb] = 0
+        return background.size - np.count_nonzero(background) >= self.minArea
@@ -0,0 +1,162 @@
+# DIPlib
+import PyDIP as dip
+
+# Named tuples
+from collections import namedtuple
+
+# Stored flowcharts and node operations without Qt
+from processing.flowchart_file import read_flowchart
+from processing.operations import OPERATIONS
+
+
+# Node of compiled flowchart: operation of node class with frozen control
+# values, inputs by terminal name as (source node, source terminal) where
+# source node 'Input' are flowchart inputs, and values released after step
+Step = namedtuple('Step', ['name', 'operation', 'ctrl', 'inputs', 'release'])
+
+
+class CompiledFlowchart:
+    def __init__(self, steps, inputs, outputs, fn=None):
+        """
+        Flowchart compiled into plain execution plan: node operations in
+        topological order with control values frozen at compile time. Plan
+        has no Qt dependency and no mutable state, it is picklable (sent to
+        worker processes) and can be shared between threads
+
+        :param steps: list of Step in execution order
+        :param inputs: list of flowchart input terminal names
+        :param outputs: dict of flowchart output terminal name and
+        (source node, source terminal)
+        :param fn: compiled flowchart file
+        """
+        self.steps = steps
+        self.inputs = inputs
+        self.outputs = outputs
+        self.fn = fn
+
+    def __call__(self, **inputs):
+        """
+        Process inputs through flowchart. Inputs without flowchart terminal
+        (e.g. priorIn of flowchart stored before it was added) are ignored
+
+        :param inputs: flowchart inputs by terminal name
+        :return: dict of flowchart outputs by terminal name
+        """
+        values = {('Input', name): value for name, value in inputs.items()}
+        for step in self.steps:
+            args = {terminal: values.get(source)
+                    for terminal, source in step.inputs.items()}
+            for terminal, value in step.operation(step.ctrl, **args).items():
+                values[(step.name, terminal)] = value
+            # Intermediate images are freed after last use
+            for source in step.release:
+                values.pop(source, None)
+        return {name: values.get(source)
+                for name, source in self.outputs.items()}
+
+    def fc_process(self, dip_img, mmPxRatio=1., prior=None):
+        """
+        Process image like FlowchartMeasureWindow.fc_process, so plan can
+        replace flowchart window (e.g. in ProcessParallel)
+
+        :param dip_img: dip.Image
+        :param mmPxRatio: calibration mm/px ratio
+        :param prior: SegmentationPrior of crop or None
+        :return: value of single flowchart output
+        """
+        outputs = self(dipImgIn=dip_img, mmPxRatio=mmPxRatio, priorIn=prior)
+        if len(outputs) != 1:
+            print('\nFlowchart {} has {} outputs'.format(
+                self.fn, len(outputs)))
+            raise ValueError(len(outputs))
+        return list(outputs.values())[0]
+
+    def measure(self, crop, mmPxRatio, prior=None):
+        """
+        Measure np.ndarray crop, measureFunc of measure_detection. Bound
+        method is picklable, so it is called in measurement workers
+
+        :param crop: 2D np.ndarray
+        :param mmPxRatio: calibration mm/px ratio of crop pixels
+        :param prior: SegmentationPrior of crop or None
+        :return: value of single flowchart output
+        """
+        return self.fc_process(dip.Image(crop), mmPxRatio, prior)
+
+    def __repr__(self):
+        return 'CompiledFlowchart({}: {})'.format(
+            self.fn, ' -> '.join(step.name for step in self.steps))
+
+
+def compile_flowchart(fn):
+    """
+    Compile stored flowchart (.fc file) into CompiledFlowchart
+
+    :param fn: flowchart file
+    :return: CompiledFlowchart
+    """
+    return compile_state(read_flowchart(fn), fn)
+
+
+def compile_state(flowchart, fn=None):
+    """
+    Compile flowchart state (Flowchart.saveState() of running flowchart or
+    read_flowchart of stored one) into CompiledFlowchart. Only nodes
+    flowchart outputs depend on are kept (display nodes are dropped).
+    Bypassed nodes output None, as in pyqtgraph Flowchart
+
+    :param flowchart: dict with flowchart state ('nodes', 'connects', ...)
+    :param fn: flowchart file for messages or None
+    :return: CompiledFlowchart
+    """
+    nodes = {node['name']: node for node in flowchart['nodes']}
+    inputs = {name: {} for name in nodes}
+    outputs = {}
+    for source, sourceTerminal, target, targetTerminal in \
+            flowchart['connects']:
+        if target == 'Output':
+            outputs[targetTerminal] = (source, sourceTerminal)
+        elif target in inputs:
+            inputs[target][targetTerminal] = (source, sourceTerminal)
+
+    # Depth-first topological order of nodes outputs depend on
+    order = []
+    visited = set()
+
+    def visit(name, path=()):
+        if name == 'Input' or name in visited:
+            return
+        if name in path:
+            print('\nFlowchart {} has cycle at node {}'.format(fn, name))
+            raise ValueError(name)
+        node = nodes[name]
+        if node['state'].get('bypass'):
+            visited.add(name)
+            return
+        for source, _ in inputs[name].values():
+            visit(source, path + (name,))
+        if node['class'] not in OPERATIONS:
+            print('\nFlowchart node {} of class {} can not be '
+                  'compiled'.format(name, node['class']))
+            raise ValueError(node['class'])
+        visited.add(name)
+        order.append(name)
+
+    for source, _ in outputs.values():
+        visit(source)
+
+    # Step after which every value is not needed any more
+    lastUse = {}
+    for i, name in enumerate(order):
+        for source in inputs[name].values():
+            lastUse[source] = i
+    for source in outputs.values():
+        lastUse.pop(source, None)
+    steps = [
+        Step(name, OPERATIONS[nodes[name]['class']],
+             dict(nodes[name]['state'].get('ctrl', {})), inputs[name],
+             [source for source, i in lastUse.items() if i == index])
+        for index, name in enumerate(order)
+    ]
+    terminals = flowchart.get('inputNode', {}).get('terminals', {})
+    return CompiledFlowchart(steps, list(terminals), outputs, fn)
@@ -0,0 +1,174 @@
+# Numpy
+import numpy as np
+
+# Named tuples
+from collections import namedtuple
+
+
+# Object location in crop coordinates known from preprocessing, used as
+# segmentation prior in measurement flowchart: center (x, y), ellipse radii
+# (rx, ry) of filled object, both in crop px of binned crops, and estimated
+# inner/outer radius ratio of ring
+SegmentationPrior = namedtuple(
+    'SegmentationPrior', ['center', 'radii', 'innerFraction'])
+
+
+class Detection:
+    def __init__(self, center, minimum, maximum, crop=None, timestamp=None):
+        """
+        Object detected in frame during preprocessing. Coordinates are in
+        sensor pixels, ROI offsets are already added
+
+        :param center: (x, y) object center
+        :param minimum: (x, y) bounding box minimum
+        :param maximum: (x, y) bounding box maximum
+        :param crop: np.ndarray with object for measurement in frame data
+        type (Mono8 uint8) if object is centered, else None
+        :param timestamp: camera timestamp of frame in ticks
+        """
+        self.center = center
+        self.minimum = minimum
+        self.maximum = maximum
+        self.crop = crop
+        self.timestamp = timestamp
+        # Focus metric of crop and object distance from x-center in px,
+        # scored by ObjectTracker to select best frame of object
+        self.sharpness = None
+        self.centerDistance = None
+        # SegmentationPrior of crop
+        self.prior = None
+        # Crop px per sensor px, below 1 if crop was binned
+        self.cropScale = 1.
+        # Number of frames fused into measurement and Detection list of
+        # frames measured separately (see processing.fusion)
+        self.fusedFrames = 1
+        self.frames = None
+        # Assigned by ObjectTracker
+        self.objectId = None
+        # LatencyTrace of frame or None
+        self.trace = None
+
+    def size(self):
+        """
+        Bounding box size (width, height) in px
+        """
+        return (self.maximum[0] - self.minimum[0],
+                self.maximum[1] - self.minimum[1])
+
+    def cropPixelSize(self, mmPxRatio):
+        """
+        Calibration mm/px ratio of crop pixels
+
+        :param mmPxRatio: calibration mm/px ratio of sensor pixels
+        """
+        return mmPxRatio / self.cropScale
+
+
+def gradient_energy(img, step=2):
+    """
+    Cheap focus metric, mean squared difference of neighbouring pixels in
+    x and y. Motion blur lowers gradient energy of the same object
+
+    :param img: 2D np.ndarray
+    :param step: pixel subsampling step
+    :return: float
+    """
+    sub = img[::step, ::step].astype(np.float32)
+    return float(np.square(np.diff(sub, axis=1)).mean() +
+                 np.square(np.diff(sub, axis=0)).mean())
+
+
+def _runs(profile):
+    """
+    Start and end (exclusive) indices of nonzero runs in 1D profile
+    """
+    edges = np.flatnonzero(np.diff(
+        np.concatenate(([0], profile > 0, [0])).astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+def _significant_run(mask, axis, minSize):
+    """
+    Single projection run along axis containing object or None if it is
+    ambiguous. Runs with bounding box smaller than minSize are noise, runs
+    with fewer object pixels than minSize but larger bounding box are
+    ambiguous (filled object could still exceed minSize)
+
+    :return: (start, end) or () if there is no object
+    """
+    profile = mask.sum(axis=axis)
+    found = ()
+    for start, end in zip(*_runs(profile)):
+        count = profile[start:end].sum()
+        if count >= minSize:
+            if found:
+                # Several objects
+                return None
+            found = (start, end)
+        else:
+            extent = np.flatnonzero(np.take(
+                mask, np.arange(start, end), axis=1 - axis).any(axis=1 - axis))
+            if (end - start) * (extent[-1] - extent[0] + 1) >= minSize:
+                return None
+    return found
+
+
+def projection_detect(frame, lowerBound=30, upperBound=240, minSize=10000,
+                      ellipseRange=(0.98, 1.02), tolerance=0.03):
+    """
+    Vectorized detector of single bright object from row and column
+    projections of thresholded frame. Object extent is found from column and
+    row projections, filled area and center from first and last object pixel
+    of every row (holes are filled for convex objects) and ellipse fit is
+    approximated by filled area / area of ellipse inscribed in bounding box.
+
+    Result is ambiguous (None) for several objects, noise that could be an
+    object or ellipse fit within tolerance of ellipseRange limits. Then
+    labeling and measurement has to be used.
+
+    :param frame: 2D np.ndarray
+    :param lowerBound: lower object intensity
+    :param upperBound: upper object intensity
+    :param minSize: minimal filled object area in px
+    :param ellipseRange: (min, max) ellipse fit of accepted object
+    :param tolerance: ellipse fit margin around ellipseRange limits
+    :return: list with (center, minimum, maximum) of accepted object in
+    frame coordinates, empty list if there is no object or None if
+    ambiguous
+    """
+    mask = (frame >= lowerBound) & (frame <= upperBound)
+    columns = _significant_run(mask, 0, minSize)
+    if columns is None:
+        return None
+    if not columns:
+        return []
+    band = mask[:, columns[0]:columns[1]]
+    rows = _significant_run(band, 1, minSize)
+    if rows is None:
+        return None
+    if not rows:
+        return []
+    obj = band[rows[0]:rows[1]]
+    first = np.argmax(obj, axis=1)
+    last = obj.shape[1] - 1 - np.argmax(obj[:, ::-1], axis=1)
+    if not obj.any(axis=0).all():
+        # Separated parts in one projection run
+        return None
+    chord = (last - first + 1).astype(np.float64)
+    area = chord.sum()
+    if area < minSize:
+        return []
+    width = int(last.max() - first.min() + 1)
+    height = obj.shape[0]
+    fit = area / (np.pi / 4. * width * height)
+    if not ellipseRange[0] - tolerance <= fit <= ellipseRange[1] + tolerance:
+        return []
+    if not ellipseRange[0] <= fit <= ellipseRange[1]:
+        return None
+    x0 = int(columns[0] + first.min())
+    y0 = int(rows[0])
+    center = (
+        float(columns[0] + (chord * (first + last) / 2.).sum() / area),
+        y0 + float((chord * np.arange(height)).sum() / area)
+    )
+    return [(center, (x0, y0), (x0 + width - 1, y0 + height - 1))]
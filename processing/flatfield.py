@@ -0,0 +1,74 @@
+# Numpy
+import numpy as np
+
+
+class FlatField:
+    def __init__(self, path):
+        """
+        Flat-field correction with gain and offset maps at sensor resolution,
+        corrected = (frame - dark) * gain. Maps are stored in one .npy file
+        (gain, -dark * gain) and memory-mapped on first use, so worker
+        processes share one copy in page cache
+
+        :param path: .npy file written by FlatField.save
+        """
+        self.path = path
+        self._maps = None
+
+    def __getstate__(self):
+        """
+        Maps are not pickled, each process maps file itself
+        """
+        state = self.__dict__.copy()
+        state['_maps'] = None
+        return state
+
+    @staticmethod
+    def compute(dark, bright, target=None, minRange=4.):
+        """
+        Gain and offset maps from mean dark (backlight off) and bright
+        (backlight on, no object) full sensor reference frames
+
+        :param dark: 2D np.ndarray
+        :param bright: 2D np.ndarray
+        :param target: corrected bright intensity, mean bright - dark if None
+        :param minRange: minimal bright - dark of pixel (dead pixels)
+        :return: np.ndarray (2, height, width) float32
+        """
+        dark = np.asarray(dark, np.float32)
+        brightRange = np.asarray(bright, np.float32) - dark
+        if target is None:
+            target = float(brightRange.mean())
+        gain = target / np.maximum(brightRange, minRange)
+        return np.stack((gain, -dark * gain)).astype(np.float32)
+
+    @staticmethod
+    def save(path, maps):
+        np.save(path, maps)
+
+    def maps(self):
+        if self._maps is None:
+            self._maps = np.load(self.path, mmap_mode='r')
+        return self._maps
+
+    def apply(self, img, offsetX=0, offsetY=0, step=1):
+        """
+        Correct frame, frame region or subsampled frame in one fused
+        multiply-add
+
+        :param img: 2D np.ndarray uint8, img[i, j] is sensor pixel
+        (offsetY + i * step, offsetX + j * step)
+        :param offsetX: sensor x of img[0, 0]
+        :param offsetY: sensor y of img[0, 0]
+        :param step: subsampling step of img
+        :return: corrected 2D np.ndarray uint8
+        """
+        maps = self.maps()
+        height, width = img.shape
+        gain, bias = maps[
+            :, offsetY:offsetY + height * step:step,
+            offsetX:offsetX + width * step:step]
+        corrected = img * gain
+        corrected += bias
+        np.clip(corrected, 0, 255, out=corrected)
+        return corrected.astype(np.uint8)
@@ -0,0 +1,107 @@
+import ast
+import math
+
+
+def read_flowchart(fn):
+    """
+    Read stored flowchart (.fc file written by pyqtgraph Flowchart.saveFile)
+    without pyqtgraph and Qt. File has indented 'name: value' lines, name
+    without value starts nested block
+
+    :param fn: flowchart file
+    :return: dict with flowchart state ('nodes', 'connects', ...)
+    """
+    root = {}
+    # Stack of (indent, block)
+    blocks = [(-1, root)]
+    with open(fn) as f:
+        for lineNumber, line in enumerate(f, 1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip(' '))
+            name, _, value = line.strip().partition(':')
+            while indent <= blocks[-1][0]:
+                blocks.pop()
+            block = blocks[-1][1]
+            value = value.strip()
+            if not value:
+                block[name] = {}
+                blocks.append((indent, block[name]))
+                continue
+            try:
+                block[name] = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                print('\nInvalid flowchart value {} in {}:{}'.format(
+                    name, fn, lineNumber))
+                raise
+    return root
+
+
+def _sigma_radius(ctrl, truncation=3.):
+    return truncation * ctrl.get('sigmas', 1.)
+
+
+# Neighbourhood radius in px of node output pixel, by node class. Nodes
+# not listed (thresholds, labeling, measurement, ...) are pointwise or
+# operate on whole objects
+KERNEL_RADIUS = {
+    'GaussianConvolution': _sigma_radius,
+    'Gradient': _sigma_radius,
+    'GradientMagnitude': _sigma_radius,
+    'GradientDirection': _sigma_radius,
+    'Canny': _sigma_radius,
+    'Kuwahara': lambda ctrl: ctrl.get('size', 11) / 2.,
+    'BilateralFilter': lambda ctrl: ctrl.get('spatialSigmas', 2.) *
+    ctrl.get('truncation', 2.),
+    'Dilation': lambda ctrl: ctrl.get('size', 11) / 2.,
+    'Erosion': lambda ctrl: ctrl.get('size', 11) / 2.,
+    # Dilation followed by erosion or vice versa
+    'Opening': lambda ctrl: ctrl.get('size', 11),
+    'Closing': lambda ctrl: ctrl.get('size', 11),
+    'BinaryOpening': lambda ctrl: 2 * ctrl.get('iterations', 3),
+    'BinaryClosing': lambda ctrl: 2 * ctrl.get('iterations', 3),
+}
+
+
+def node_footprint(node):
+    """
+    Kernel radius of stored node in px, 0 for bypassed and pointwise nodes
+
+    :param node: node state dict from flowchart 'nodes' list
+    """
+    state = node.get('state', {})
+    if state.get('bypass') or node['class'] not in KERNEL_RADIUS:
+        return 0
+    return KERNEL_RADIUS[node['class']](state.get('ctrl', {}))
+
+
+def flowchart_footprint(fn):
+    """
+    Crop margin in px required by measurement flowchart, largest sum of
+    kernel radii along any path from flowchart input. Pixels further than
+    footprint from object do not influence measurement
+
+    :param fn: flowchart file
+    :return: int footprint in px
+    """
+    flowchart = read_flowchart(fn)
+    radius = {node['name']: node_footprint(node)
+              for node in flowchart['nodes']}
+    inputs = {name: [] for name in radius}
+    for source, _, target, _ in flowchart['connects']:
+        if target in inputs and source in radius:
+            inputs[target].append(source)
+    # Longest path, memoized depth-first
+    footprint = {}
+
+    def visit(name, path=()):
+        if name in path:
+            print('\nFlowchart {} has cycle at node {}'.format(fn, name))
+            raise ValueError(name)
+        if name not in footprint:
+            footprint[name] = radius[name] + max(
+                [visit(source, path + (name,)) for source in inputs[name]],
+                default=0)
+        return footprint[name]
+
+    return int(math.ceil(max([visit(name) for name in radius], default=0)))
@@ -0,0 +1,122 @@
+# Numpy
+import numpy as np
+
+# Named tuples and shallow copies of detections
+from collections import namedtuple
+import copy
+
+
+# Per-value mean and standard deviation of measurements of several frames
+# of one object, measurements holds per-frame results included in fusion
+FusedMeasurement = namedtuple(
+    'FusedMeasurement', ['mean', 'std', 'count', 'measurements'])
+
+
+def average_crops(detections):
+    """
+    Register crops of one object by detected center (integer shift) and
+    average them. Averaging N short exposure frames reduces noise by
+    sqrt(N) without motion blur of one long exposure
+
+    :param detections: centered Detection list of one object, best first
+    :return: copy of first Detection with averaged crop, fusedFrames set
+    to number of averaged crops
+    """
+    reference = detections[0]
+    # Crops binned by different factor are not averaged
+    same = [d for d in detections if d.cropScale == reference.cropScale]
+    centers = [(int(round(d.prior.center[0])), int(round(d.prior.center[1])))
+               for d in same]
+    # Largest region around center present in all crops
+    left = min(cx for cx, _ in centers)
+    top = min(cy for _, cy in centers)
+    right = min(d.crop.shape[1] - cx for d, (cx, _) in zip(same, centers))
+    bottom = min(d.crop.shape[0] - cy for d, (_, cy) in zip(same, centers))
+    total = np.full((top + bottom, left + right), len(same) // 2, np.uint32)
+    for d, (cx, cy) in zip(same, centers):
+        total += d.crop[cy - top:cy + bottom, cx - left:cx + right]
+    # Rounded mean
+    total //= len(same)
+    fused = copy.copy(reference)
+    fused.crop = total.astype(reference.crop.dtype)
+    fused.prior = reference.prior._replace(center=(
+        reference.prior.center[0] - centers[0][0] + left,
+        reference.prior.center[1] - centers[0][1] + top))
+    fused.fusedFrames = len(same)
+    return fused
+
+
+def group_frames(detections):
+    """
+    Group centered detections of one object for separate measurement and
+    fusion of measurements (see measure_detection)
+
+    :param detections: centered Detection list of one object, best first
+    :return: copy of first Detection with frames set to detections
+    """
+    fused = copy.copy(detections[0])
+    fused.frames = list(detections)
+    fused.fusedFrames = len(detections)
+    return fused
+
+
+def measurement_values(measurement):
+    """
+    Measured values as flat vector. Flowchart output (list of
+    dip.Measurement) is flattened in result table order: measurement,
+    object, feature, feature value
+
+    :param measurement: list of dip.Measurement or sequence of numbers
+    :return: 1D np.ndarray float64, empty if nothing was measured
+    """
+    if not isinstance(measurement, list) or not measurement or \
+            not hasattr(measurement[0], 'Objects'):
+        return np.asarray(measurement, np.float64).ravel()
+    values = []
+    for dipMsr in measurement:
+        features = [feat.name for feat in dipMsr.Features()]
+        for obj in dipMsr.Objects():
+            for feat in features:
+                values.extend(dipMsr[feat][obj])
+    return np.asarray(values, np.float64)
+
+
+def fuse_measurements(measurements):
+    """
+    Mean and standard deviation of measurements of several frames. Frames
+    without values (segmentation failed) and frames with different number
+    of values (extra object) than first measured frame are left out
+
+    :param measurements: list of per-frame measurements, best frame first
+    :return: FusedMeasurement, with empty mean and std if no frame was
+    measured
+    """
+    vectors = [measurement_values(m) for m in measurements]
+    measured = [(m, v) for m, v in zip(measurements, vectors) if v.size]
+    if not measured:
+        return FusedMeasurement(np.zeros(0), np.zeros(0), 0, [])
+    used = [(m, v) for m, v in measured if v.shape == measured[0][1].shape]
+    stack = np.stack([v for _, v in used])
+    std = stack.std(axis=0, ddof=1) if len(used) > 1 \
+        else np.zeros(stack.shape[1])
+    return FusedMeasurement(
+        stack.mean(axis=0), std, len(used), [m for m, _ in used])
+
+
+def measure_detection(detection, measureFunc, mmPxRatio):
+    """
+    Measure detection, frames grouped with group_frames are measured
+    separately and fused
+
+    :param detection: Detection with crop
+    :param measureFunc: callable(crop, mmPxRatio, prior)
+    :param mmPxRatio: calibration mm/px ratio of sensor pixels
+    :return: measureFunc output or FusedMeasurement
+    """
+    if detection.frames is None:
+        return measureFunc(detection.crop,
+                           detection.cropPixelSize(mmPxRatio),
+                           detection.prior)
+    return fuse_measurements([
+        measureFunc(d.crop, d.cropPixelSize(mmPxRatio), d.prior)
+        for d in detection.frames])
@@ -0,0 +1,210 @@
+# Numpy
+import numpy as np
+
+# Threads and timing
+import threading
+import collections
+import time
+
+
+# Frame processing stages in order. Times are time.perf_counter() values,
+# which are system-wide monotonic and comparable between worker processes
+STAGES = (
+    'exposure', 'grabbed', 'queued', 'preprocess_start', 'preprocess_end',
+    'collected', 'measure_start', 'measure_end', 'displayed',
+)
+
+
+def tick_frequency(cam, default=1e9):
+    """
+    Camera timestamp tick frequency in Hz. GigE cameras report it in
+    GevTimestampTickFrequency, USB3 camera timestamps are in ns
+
+    :param cam: opened pylon.InstantCamera or EmulatedCamera
+    :param default: frequency if camera has no tick frequency node
+    """
+    try:
+        return float(cam.GevTimestampTickFrequency.GetValue())
+    except Exception:
+        return default
+
+
+class LatencyTrace:
+    def __init__(self, frameId=None, timestamp=None):
+        """
+        Host times at which frame passed processing stages. Created in grab
+        callback and carried with frame through ProcessParallel workers and
+        measurement (as Detection.trace)
+
+        :param frameId: grab result frame ID
+        :param timestamp: camera frame timestamp in ticks
+        """
+        self.frameId = frameId
+        self.timestamp = timestamp
+        self.stamps = {}
+
+    def mark(self, stage, t=None):
+        """
+        Record time at which frame reached stage
+
+        :param stage: one of STAGES
+        :param t: time.perf_counter() value, now if None
+        """
+        self.stamps[stage] = time.perf_counter() if t is None else t
+
+    def copy(self):
+        """
+        Trace of same frame with own stages, e.g. for every object in frame
+        """
+        trace = LatencyTrace(self.frameId, self.timestamp)
+        trace.stamps = dict(self.stamps)
+        return trace
+
+    def intervals(self):
+        """
+        Durations in s between consecutive recorded stages and total
+
+        :return: dict with 'stage->stage' keys and 'total'
+        """
+        stages = [st for st in STAGES if st in self.stamps]
+        result = {
+            '{}->{}'.format(a, b): self.stamps[b] - self.stamps[a]
+            for a, b in zip(stages[:-1], stages[1:])
+        }
+        if len(stages) > 1:
+            result['total'] = self.stamps[stages[-1]] - self.stamps[stages[0]]
+        return result
+
+
+class LatencyMonitor:
+    def __init__(self, minLatency=1e-5, maxLatency=10., bins=60,
+                 tickFrequency=1e9):
+        """
+        Stage-by-stage latency histograms of finished LatencyTraces.
+        Histogram bins are logarithmic between minLatency and maxLatency,
+        shorter and longer latencies are counted in first and last bin.
+
+        Exposure time of frame is known only after camera clock is
+        synchronized with host clock (syncClock).
+
+        :param minLatency: lower histogram limit in s
+        :param maxLatency: upper histogram limit in s
+        :param bins: number of histogram bins
+        :param tickFrequency: camera timestamp tick frequency in Hz
+        """
+        self.edges = np.logspace(
+            np.log10(minLatency), np.log10(maxLatency), bins + 1)
+        self.tickFrequency = tickFrequency
+        self.lock = threading.Lock()
+        self.counts = collections.OrderedDict()
+        self.sums = collections.defaultdict(float)
+        self.frames = 0
+        # Host time minus camera time in s
+        self.clockOffset = None
+
+    def syncClock(self, cam):
+        """
+        Estimate camera to host clock offset by latching camera timestamp.
+        Tick frequency is read from camera, so tickFrequency can be passed
+        to other users of camera timestamps after synchronization
+
+        :param cam: opened pylon.InstantCamera or EmulatedCamera
+        :return: True if clock is synchronized
+        """
+        self.tickFrequency = tick_frequency(cam, self.tickFrequency)
+        for latch, value in (('TimestampLatch', 'TimestampLatchValue'),
+                             ('GevTimestampControlLatch',
+                              'GevTimestampValue')):
+            try:
+                before = time.perf_counter()
+                getattr(cam, latch).Execute()
+                after = time.perf_counter()
+                cameraTime = getattr(cam, value).GetValue() / \
+                    self.tickFrequency
+            except Exception:
+                continue
+            self.clockOffset = (before + after) / 2. - cameraTime
+            return True
+        print('\nCamera timestamp latch not available, exposure latency '
+              'not traced')
+        return False
+
+    def newTrace(self, frameId, timestamp):
+        """
+        Trace for grabbed frame with exposure and grab times marked
+        """
+        trace = LatencyTrace(frameId, timestamp)
+        if self.clockOffset is not None:
+            trace.mark('exposure',
+                       timestamp / self.tickFrequency + self.clockOffset)
+        trace.mark('grabbed')
+        return trace
+
+    def record(self, trace):
+        """
+        Add finished trace to histograms
+        """
+        intervals = trace.intervals()
+        bins = np.clip(
+            np.searchsorted(self.edges, list(intervals.values())) - 1,
+            0, len(self.edges) - 2)
+        with self.lock:
+            self.frames += 1
+            for (name, latency), b in zip(intervals.items(), bins):
+                if name not in self.counts:
+                    self.counts[name] = np.zeros(
+                        len(self.edges) - 1, np.int64)
+                self.counts[name][b] += 1
+                self.sums[name] += latency
+
+    def histograms(self):
+        """
+        Copy of latency histograms
+
+        :return: dict interval name -> (counts, edges in s)
+        """
+        with self.lock:
+            return {name: (counts.copy(), self.edges)
+                    for name, counts in self.counts.items()}
+
+    def percentile(self, name, q):
+        """
+        Approximate latency percentile in s (upper edge of histogram bin)
+        """
+        counts, edges = self.histograms()[name]
+        cumulative = np.cumsum(counts)
+        b = np.searchsorted(cumulative, q / 100. * cumulative[-1])
+        return edges[min(b, len(counts) - 1) + 1]
+
+    def summary(self):
+        """
+        Latency statistics of every interval
+
+        :return: dict interval name -> dict with count, mean, p50, p95 and
+        p99 in s
+        """
+        with self.lock:
+            names = list(self.counts)
+        result = collections.OrderedDict()
+        for name in names:
+            count = int(self.counts[name].sum())
+            result[name] = {
+                'count': count,
+                'mean': self.sums[name] / count,
+                'p50': self.percentile(name, 50),
+                'p95': self.percentile(name, 95),
+                'p99': self.percentile(name, 99),
+            }
+        return result
+
+    def print_summary(self):
+        """
+        Print latency statistics in ms
+        """
+        print("\n\t\t~~~~ Latency ({} frames) ~~~~".format(self.frames))
+        for name, stats in self.summary().items():
+            print("{:<36} n={:<6} mean={:8.2f} p50<{:8.2f} p95<{:8.2f} "
+                  "p99<{:8.2f} ms".format(
+                      name, stats['count'], stats['mean'] * 1e3,
+                      stats['p50'] * 1e3, stats['p95'] * 1e3,
+                      stats['p99'] * 1e3))
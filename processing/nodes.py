@@ -7,11 +7,32 @@ from pyqtgraph.Qt import QtCore, QtGui
 # Numpy
 import numpy as np
 
-# PyDIP
-import PyDIP as dip
+# Node operations without Qt
+from processing.operations import OPERATIONS
 
-# Operators
-import operator
+
+class OperationNode(Node):
+    """
+    Node without controls processed by operation of its nodeName in
+    processing.operations
+    """
+    def process(self, display=True, **inputs):
+        """
+        Node process function. If display=False, no effect
+        """
+        return OPERATIONS[self.nodeName]({}, **inputs)
+
+
+class OperationCtrlNode(CtrlNode):
+    """
+    Node with control widget processed by operation of its nodeName in
+    processing.operations with current control values
+    """
+    def process(self, display=True, **inputs):
+        """
+        Node process function. If display=False, no effect
+        """
+        return OPERATIONS[self.nodeName](self.stateGroup.state(), **inputs)
 
 
 class FlowchartPlotNode(Node):
@@ -44,7 +65,7 @@ class FlowchartPlotNode(Node):
                 self.fc_plot_widget.setTitle(title)
 
 
-class GaussianConvolutionNode(CtrlNode):
+class GaussianConvolutionNode(OperationCtrlNode):
     """
     Node with control widget for convolution with Gaussian kernel
     """
@@ -59,15 +80,8 @@ class GaussianConvolutionNode(CtrlNode):
             'smoothOut': {'io': 'out'}
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        sigmas = self.ctrls['sigmas'].value()
-        return {'smoothOut': dip.Gauss(dipImgIn, [sigmas])}
-
 
-class ThresholdNode(CtrlNode):
+class ThresholdNode(OperationCtrlNode):
     """
     Node with control widget for thresholding with different methods
     """
@@ -88,17 +102,8 @@ class ThresholdNode(CtrlNode):
             'thrValOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        method = self.stateGroup.state()['method']
-        parameter = self.ctrls['parameter'].value()
-        thr = dip.Threshold(dipImgIn, method=method, parameter=parameter)
-        return {'thrImgOut': thr[0], 'thrValOut': thr[1]}
-
 
-class RangeThresholdNode(CtrlNode):
+class RangeThresholdNode(OperationCtrlNode):
     """
     Node with control widget for range thresholding
     """
@@ -124,22 +129,8 @@ class RangeThresholdNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        lowerBound = self.ctrls['lowerBound'].value()
-        upperBound = self.ctrls['upperBound'].value()
-        foreground = self.ctrls['foreground'].value()
-        background = self.ctrls['background'].value()
-        thr = dip.RangeThreshold(
-            dipImgIn, lowerBound=lowerBound, upperBound=upperBound,
-            foreground=foreground, background=background
-        )
-        return {'dipImgOut': thr}
-
 
-class OpeningNode(CtrlNode):
+class OpeningNode(OperationCtrlNode):
     """
     Node with control widget for opening with different shape and size
     """
@@ -158,18 +149,8 @@ class OpeningNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        shape = self.stateGroup.state()['shape']
-        size = self.ctrls['size'].value()
-        struct_element = dip.SE(size, shape)
-        img = dip.Opening(dipImgIn, se=struct_element)
-        return {'dipImgOut': img}
-
 
-class ClosingNode(CtrlNode):
+class ClosingNode(OperationCtrlNode):
     """
     Node with control widget for Closing with different shape and size
     """
@@ -188,18 +169,8 @@ class ClosingNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        shape = self.stateGroup.state()['shape']
-        size = self.ctrls['size'].value()
-        struct_element = dip.SE(size, shape)
-        img = dip.Closing(dipImgIn, se=struct_element)
-        return {'dipImgOut': img}
-
 
-class DilationNode(CtrlNode):
+class DilationNode(OperationCtrlNode):
     """
     Node with control widget for Dilation with different shape and size
     """
@@ -219,18 +190,8 @@ class DilationNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        shape = self.stateGroup.state()['shape']
-        size = self.ctrls['size'].value()
-        struct_element = dip.SE(size, shape)
-        img = dip.Dilation(dipImgIn, se=struct_element)
-        return {'dipImgOut': img}
-
 
-class ErosionNode(CtrlNode):
+class ErosionNode(OperationCtrlNode):
     """
     Node with control widget for Erosion with different shape and size
     """
@@ -250,18 +211,8 @@ class ErosionNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        shape = self.stateGroup.state()['shape']
-        size = self.ctrls['size'].value()
-        struct_element = dip.SE(size, shape)
-        img = dip.Erosion(dipImgIn, se=struct_element)
-        return {'dipImgOut': img}
-
 
-class EdgeObjectsRemoveNode(CtrlNode):
+class EdgeObjectsRemoveNode(OperationCtrlNode):
     """
     Node with control widget for removing edge objects from binary image with
     different connectivity
@@ -279,19 +230,8 @@ class EdgeObjectsRemoveNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        img = dip.EdgeObjectsRemove(dipImgIn, connectivity=connectivity)
-        return {'dipImgOut': img}
-
 
-class ConvertNode(CtrlNode):
+class ConvertNode(OperationCtrlNode):
     """
     Node with control widget for converting image data type
     """
@@ -309,16 +249,8 @@ class ConvertNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        dtype = self.stateGroup.state()['DataType']
-        img = dip.Convert(dipImgIn, dtype)
-        return {'dipImgOut': img}
 
-
-class InvertNode(Node):
+class InvertNode(OperationNode):
     """
     Node for inverting pixel intensities
     """
@@ -330,15 +262,8 @@ class InvertNode(Node):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        img = dip.Invert(dipImgIn)
-        return {'dipImgOut': img}
-
 
-class CannyNode(CtrlNode):
+class CannyNode(OperationCtrlNode):
     """
     Node with control widget for Canny edge detector
     """
@@ -355,18 +280,8 @@ class CannyNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        sigmas = [self.ctrls['sigmas'].value()]
-        lower = self.ctrls['lower'].value()
-        upper = self.ctrls['upper'].value()
-        img = dip.Canny(dipImgIn, sigmas, lower, upper)
-        return {'dipImgOut': img}
-
 
-class GradientNode(CtrlNode):
+class GradientNode(OperationCtrlNode):
     """
     Node with control widget for calculating image Gradient
     """
@@ -381,16 +296,8 @@ class GradientNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        sigmas = [self.ctrls['sigmas'].value()]
-        img = dip.Gradient(dipImgIn, sigmas)
-        return {'dipImgOut': img}
-
 
-class GradientMagnitudeNode(CtrlNode):
+class GradientMagnitudeNode(OperationCtrlNode):
     """
     Node with control widget for computing Gradient Magnitude
     """
@@ -405,16 +312,8 @@ class GradientMagnitudeNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        sigmas = [self.ctrls['sigmas'].value()]
-        img = dip.GradientMagnitude(dipImgIn, sigmas)
-        return {'dipImgOut': img}
-
 
-class GradientDirectionNode(CtrlNode):
+class GradientDirectionNode(OperationCtrlNode):
     """
     Node with control widget for computing Gradient Direction
     """
@@ -429,16 +328,8 @@ class GradientDirectionNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        sigmas = [self.ctrls['sigmas'].value()]
-        img = dip.GradientDirection(dipImgIn, sigmas)
-        return {'dipImgOut': img}
-
 
-class WatershedNode(CtrlNode):
+class WatershedNode(OperationCtrlNode):
     """
     Node with control widget for Watershed
     """
@@ -471,35 +362,8 @@ class WatershedNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, dipMaskIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        maxDepth = self.ctrls['maxDepth'].value()
-        maxSize = int(self.ctrls['maxSize'].value())
-        flags = {
-            self.stateGroup.state()['outType'],
-            self.stateGroup.state()['sortOrder'],
-            self.stateGroup.state()['algorithm']
-        }
-        if dipMaskIn is None:
-            img = dip.Watershed(
-                dipImgIn, connectivity=connectivity,
-                maxDepth=maxDepth, maxSize=maxSize, flags=flags
-            )
-        else:
-            img = dip.Watershed(
-                dipImgIn, mask=dipMaskIn, connectivity=connectivity,
-                maxDepth=maxDepth, maxSize=maxSize, flags=flags
-            )
-        return {'dipImgOut': img}
-
-
-class SeededWatershedNode(CtrlNode):
+
+class SeededWatershedNode(OperationCtrlNode):
     """
     Node with control widget for Watershed starting at seeds
     """
@@ -532,39 +396,8 @@ class SeededWatershedNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, dipSeedsIn, dipMaskIn=None, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        maxDepth = self.ctrls['maxDepth'].value()
-        maxSize = int(self.ctrls['maxSize'].value())
-        flags = {
-            self.stateGroup.state()['outType'],
-            self.stateGroup.state()['sortOrder'],
-        }
-        if self.ctrls['no gaps'].isChecked():
-            flags.add('no gaps')
-        if self.ctrls['uphill only'].isChecked():
-            flags.add('uphill only')
-        if dipMaskIn is None:
-            img = dip.SeededWatershed(
-                dipImgIn, seeds=dipSeedsIn, connectivity=connectivity,
-                maxDepth=maxDepth, maxSize=maxSize, flags=flags
-            )
-        else:
-            img = dip.SeededWatershed(
-                dipImgIn, seeds=dipSeedsIn, mask=dipMaskIn,
-                connectivity=connectivity, maxDepth=maxDepth, maxSize=maxSize,
-                flags=flags
-            )
-        return {'dipImgOut': img}
-
-
-class MinimaNode(CtrlNode):
+
+class MinimaNode(OperationCtrlNode):
     """
     Node with control widget for local minima
     """
@@ -584,20 +417,8 @@ class MinimaNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        output = self.stateGroup.state()['outType']
-        img = dip.Minima(dipImgIn, connectivity=connectivity, output=output)
-        return {'dipImgOut': img}
-
 
-class MaximaNode(CtrlNode):
+class MaximaNode(OperationCtrlNode):
     """
     Node with control widget for local minima
     """
@@ -617,20 +438,8 @@ class MaximaNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        output = self.stateGroup.state()['outType']
-        img = dip.Minima(dipImgIn, connectivity=connectivity, output=output)
-        return {'dipImgOut': img}
 
-
-class CreateMaskNode(CtrlNode):
+class CreateMaskNode(OperationCtrlNode):
     """
     Node with control widget for creating mask
     """
@@ -648,22 +457,52 @@ class CreateMaskNode(CtrlNode):
             'dipImgIn': {'io': 'in'},
             'dipImgOut': {'io': 'out'},
         })
-        self.op = {
-            '<=': operator.le, '>=': operator.ge, '<': operator.lt,
-            '>': operator.gt, '==': operator.eq, '!=': operator.ne
-        }
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        rel = self.stateGroup.state()['relation']
-        intensity = self.ctrls['intensity'].value()
-        img = self.op[rel](dipImgIn, intensity)
-        return {'dipImgOut': img}
+
+class PriorSeedsNode(OperationCtrlNode):
+    """
+    Node with control widget for watershed seeds placed from segmentation
+    prior of preprocessing: hole, ring and background seeds separated by
+    gaps around expected edges. Local minima are used without prior
+    """
+    nodeName = 'PriorSeeds'
+    uiTemplate = [
+        ('connectivity', 'combo', {'values': [
+            '8-Connectivity', '4-Connectivity'
+        ]}),
+        ('gap', 'spin', {
+            'value': 0.15, 'step': 0.01, 'bounds': [0., 1.]}),
+    ]
+
+    def __init__(self, name):
+        super().__init__(name=name, terminals={
+            'dipImgIn': {'io': 'in'},
+            'priorIn': {'io': 'in', 'optional': True},
+            'dipSeedsOut': {'io': 'out'},
+        })
+
+
+class PriorMaskNode(OperationCtrlNode):
+    """
+    Node with control widget for mask of filled object from segmentation
+    prior enlarged by margin, restricting processing to object. Mask is None
+    (whole image) without prior
+    """
+    nodeName = 'PriorMask'
+    uiTemplate = [
+        ('margin', 'spin', {
+            'value': 0.1, 'step': 0.01, 'bounds': [0., 1.]}),
+    ]
+
+    def __init__(self, name):
+        super().__init__(name=name, terminals={
+            'dipImgIn': {'io': 'in'},
+            'priorIn': {'io': 'in', 'optional': True},
+            'dipMaskOut': {'io': 'out'},
+        })
 
 
-class ApplyMaskNode(Node):
+class ApplyMaskNode(OperationNode):
     """
     Node for applying mask
     """
@@ -676,15 +515,8 @@ class ApplyMaskNode(Node):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, dipMaskIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        img = dipImgIn * dipMaskIn
-        return {'dipImgOut': img}
-
 
-class FillNode(CtrlNode):
+class FillNode(OperationCtrlNode):
     """
     Node for filling pixels under mask (optional) with intensity
     """
@@ -701,20 +533,8 @@ class FillNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, dipMaskIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        intensity = self.ctrls['intensity'].value()
-        if dipMaskIn is None:
-            img = dipImgIn.Copy().Fill(intensity)
-        else:
-            img = dipImgIn.Copy()
-            img[dipMaskIn] = intensity
-        return {'dipImgOut': img}
-
 
-class BinaryPropagationNode(CtrlNode):
+class BinaryPropagationNode(OperationCtrlNode):
     """
     Node with control widget for BinaryPropagation
     """
@@ -738,30 +558,8 @@ class BinaryPropagationNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, dipMaskIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        iterations = int(self.ctrls['iterations'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        if dipMaskIn is None:
-            img = dip.BinaryPropagation(
-                dipImgIn, connectivity=connectivity,
-                iterations=iterations, edgeCondition=edgeCondition
-            )
-        else:
-            img = dip.BinaryPropagation(
-                dipImgIn, dipMaskIn, connectivity=connectivity,
-                iterations=iterations, edgeCondition=edgeCondition
-            )
-        return {'dipImgOut': img}
-
-
-class FillHolesNode(CtrlNode):
+
+class FillHolesNode(OperationCtrlNode):
     """
     Node with control widget for FillHoles
     """
@@ -778,19 +576,8 @@ class FillHolesNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        img = dip.FillHoles(dipImgIn, connectivity=connectivity)
-        return {'dipImgOut': img}
-
 
-class LabelNode(CtrlNode):
+class LabelNode(OperationCtrlNode):
     """
     Node with control widget for Labeling connected regions in binary image
     """
@@ -813,24 +600,8 @@ class LabelNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        minSize = int(self.ctrls['minSize'].value())
-        maxSize = int(self.ctrls['maxSize'].value())
-        img = dip.Label(
-            dipImgIn, connectivity=connectivity,
-            minSize=minSize, maxSize=maxSize
-        )
-        return {'dipImgOut': img}
-
 
-class MeasureNode(CtrlNode):
+class MeasureNode(OperationCtrlNode):
     """
     Node with control widget for Measuring one or more features
     """
@@ -867,24 +638,6 @@ class MeasureNode(CtrlNode):
             'dipMsrOut': {'io': 'out'},
         })
 
-    def process(self, dipLblIn, dipGreyIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        features = []
-        for name, val in self.ctrls.items():
-            if name != 'connectivity' and val.isChecked():
-                features.append(name)
-        msr = dip.MeasurementTool.Measure(
-            dipLblIn, grey=dipGreyIn, features=features,
-            connectivity=connectivity
-        )
-        return {'dipMsrOut': msr}
-
 
 class MeasurementDisplayNode(Node):
     """
@@ -918,7 +671,7 @@ class MeasurementDisplayNode(Node):
                 self.fc_display_widget.setText(disp_text)
 
 
-class WorkingDistanceCorrectionNode(CtrlNode):
+class WorkingDistanceCorrectionNode(OperationCtrlNode):
     """
     Node with control widget for correcting object distance from lens using
     thin lens equation
@@ -952,38 +705,6 @@ class WorkingDistanceCorrectionNode(CtrlNode):
             'CalibConstOut': {'io': 'out'},
         })
 
-    def process(self, dipMsrIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['feature'] == 'Feret Min':
-            # Measured image size
-            img_size_1, img_size_2 = (dipMsrIn['Feret'][1][1],
-                                      dipMsrIn['Feret'][2][1])
-        else:
-            # Measured image size
-            img_size_1, img_size_2 = (dipMsrIn['Feret'][1][0],
-                                      dipMsrIn['Feret'][2][0])
-        # print("Image sizes: {} - {}".format(img_size_1, img_size_2))
-        # Standard height difference
-        height_1 = self.ctrls['standard 1 height'].value()
-        height_2 = self.ctrls['standard 2 height'].value()
-        height_diff_12 = height_1 - height_2
-        # print("Height difference: {}".format(height_diff_12))
-        obj_size_1 = self.ctrls['standard 1 measure'].value()
-        obj_size_2 = self.ctrls['standard 2 measure'].value()
-        # print("Object sizes: {} - {}".format(obj_size_1, obj_size_2))
-        # mm/px ratio
-        mm_px_1 = obj_size_1 / img_size_1
-        mm_px_2 = obj_size_2 / img_size_2
-        # print("mm/px ratios: {} - {}".format(mm_px_1, mm_px_2))
-        # Working distance
-        work_dist_1 = height_diff_12 / (mm_px_2 / mm_px_1 - 1.)
-        # print("Working distance 1: {}".format(work_dist_1))
-        return {'CalibConstOut': {'std_height': height_1,
-                                  'std_work_dist': work_dist_1,
-                                  'std_mm_px': mm_px_1}}
-
 
 class CalibDisplayNode(Node):
     """
@@ -1023,7 +744,7 @@ class CalibDisplayNode(Node):
                 self.fc_display_widget.setText(disp_text)
 
 
-class SegmentORingNode(CtrlNode):
+class SegmentORingNode(OperationCtrlNode):
     """
     Node with control widget for Segmenting O-ring outer and inner diameter
     """
@@ -1041,20 +762,6 @@ class SegmentORingNode(CtrlNode):
             'dipInnerOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        outer = dip.FillHoles(dipImgIn, connectivity=connectivity)
-        inner = dip.EdgeObjectsRemove(
-            dip.Invert(dipImgIn), connectivity=connectivity)
-        return {'dipOuterOut': outer,
-                'dipInnerOut': inner}
-
 
 class ORingMeasurementDisplayNode(Node):
     """
@@ -1120,7 +827,7 @@ class ORingMeasurementDisplayNode(Node):
                 self.fc_display_widget_list[1].setText(inner_disp)
 
 
-class SetPixelSizeNode(CtrlNode):
+class SetPixelSizeNode(OperationCtrlNode):
     """
     Node with control widget for assigning physical quantity to pixels
     """
@@ -1138,18 +845,8 @@ class SetPixelSizeNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, mmPxRatioIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        units = self.stateGroup.state()['units']
-        img = dipImgIn.Copy()
-        img.SetPixelSize(
-            dip.PixelSize(dip.PhysicalQuantity(mmPxRatioIn, units)))
-        return {'dipImgOut': img}
-
 
-class KuwaharaNode(CtrlNode):
+class KuwaharaNode(OperationCtrlNode):
     """
     Node with control widget for Kuwahara-Nagao non-linear, edge-preserving
     smoothing filter
@@ -1171,19 +868,8 @@ class KuwaharaNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        shape = self.stateGroup.state()['shape']
-        size = self.ctrls['size'].value()
-        threshold = self.ctrls['threshold'].value()
-        kernel = dip.Kernel(size, shape)
-        img = dip.Kuwahara(dipImgIn, kernel=kernel, threshold=threshold)
-        return {'dipImgOut': img}
 
-
-class BilateralFilterNode(CtrlNode):
+class BilateralFilterNode(OperationCtrlNode):
     """
     Node with control widget for Bilateral filtering (non-linear,
     edge-preserving smoothing)
@@ -1207,22 +893,8 @@ class BilateralFilterNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        method = self.stateGroup.state()['method']
-        spatialSigmas = [self.ctrls['spatialSigmas'].value()]
-        tonalSigma = self.ctrls['tonalSigma'].value()
-        truncation = self.ctrls['truncation'].value()
-        img = dip.BilateralFilter(
-            dipImgIn, method=method, spatialSigmas=spatialSigmas,
-            tonalSigma=tonalSigma, truncation=truncation,
-        )
-        return {'dipImgOut': img}
-
 
-class BinaryAreaClosingNode(CtrlNode):
+class BinaryAreaClosingNode(OperationCtrlNode):
     """
     Node with control widget for BinaryAreaClosing of areas smaller than
     filterSize
@@ -1246,24 +918,8 @@ class BinaryAreaClosingNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        filterSize = int(self.ctrls['filterSize'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryAreaClosing(
-            dipImgIn, connectivity=connectivity,
-            filterSize=filterSize, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
-
 
-class BinaryAreaOpeningNode(CtrlNode):
+class BinaryAreaOpeningNode(OperationCtrlNode):
     """
     Node with control widget for BinaryAreaOpening of areas smaller than
     filterSize
@@ -1287,24 +943,8 @@ class BinaryAreaOpeningNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        else:
-            connectivity = 1
-        filterSize = int(self.ctrls['filterSize'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryAreaOpening(
-            dipImgIn, connectivity=connectivity,
-            filterSize=filterSize, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
 
-
-class BinaryClosingNode(CtrlNode):
+class BinaryClosingNode(OperationCtrlNode):
     """
     Node with control widget for BinaryClosing with iterations
     """
@@ -1328,28 +968,8 @@ class BinaryClosingNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        elif self.stateGroup.state()['connectivity'] == '4-Connectivity':
-            connectivity = 1
-        elif self.stateGroup.state()['connectivity'] == '4-8 Connectivity':
-            connectivity = -1
-        elif self.stateGroup.state()['connectivity'] == '8-4 Connectivity':
-            connectivity = -2
-        iterations = int(self.ctrls['iterations'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryClosing(
-            dipImgIn, connectivity=connectivity,
-            iterations=iterations, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
-
-
-class BinaryOpeningNode(CtrlNode):
+
+class BinaryOpeningNode(OperationCtrlNode):
     """
     Node with control widget for BinaryOpening with iterations
     """
@@ -1373,28 +993,8 @@ class BinaryOpeningNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        elif self.stateGroup.state()['connectivity'] == '4-Connectivity':
-            connectivity = 1
-        elif self.stateGroup.state()['connectivity'] == '4-8 Connectivity':
-            connectivity = -1
-        elif self.stateGroup.state()['connectivity'] == '8-4 Connectivity':
-            connectivity = -2
-        iterations = int(self.ctrls['iterations'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryOpening(
-            dipImgIn, connectivity=connectivity,
-            iterations=iterations, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
-
-
-class BinaryDilationNode(CtrlNode):
+
+class BinaryDilationNode(OperationCtrlNode):
     """
     Node with control widget for BinaryDilation with iterations
     """
@@ -1418,28 +1018,8 @@ class BinaryDilationNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        elif self.stateGroup.state()['connectivity'] == '4-Connectivity':
-            connectivity = 1
-        elif self.stateGroup.state()['connectivity'] == '4-8 Connectivity':
-            connectivity = -1
-        elif self.stateGroup.state()['connectivity'] == '8-4 Connectivity':
-            connectivity = -2
-        iterations = int(self.ctrls['iterations'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryDilation(
-            dipImgIn, connectivity=connectivity,
-            iterations=iterations, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
-
-
-class BinaryErosionNode(CtrlNode):
+
+class BinaryErosionNode(OperationCtrlNode):
     """
     Node with control widget for BinaryErosion with iterations
     """
@@ -1463,28 +1043,8 @@ class BinaryErosionNode(CtrlNode):
             'dipImgOut': {'io': 'out'},
         })
 
-    def process(self, dipImgIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        if self.stateGroup.state()['connectivity'] == '8-Connectivity':
-            connectivity = 2
-        elif self.stateGroup.state()['connectivity'] == '4-Connectivity':
-            connectivity = 1
-        elif self.stateGroup.state()['connectivity'] == '4-8 Connectivity':
-            connectivity = -1
-        elif self.stateGroup.state()['connectivity'] == '8-4 Connectivity':
-            connectivity = -2
-        iterations = int(self.ctrls['iterations'].value())
-        edgeCondition = self.stateGroup.state()['edgeCondition']
-        img = dip.BinaryErosion(
-            dipImgIn, connectivity=connectivity,
-            iterations=iterations, edgeCondition=edgeCondition
-        )
-        return {'dipImgOut': img}
-
-
-class OperatorPlusNode(Node):
+
+class OperatorPlusNode(OperationNode):
     """
     Node for operator plus
     """
@@ -1497,15 +1057,8 @@ class OperatorPlusNode(Node):
             'dipImgPlusOut': {'io': 'out'},
         })
 
-    def process(self, dipImgOneIn, dipImgTwoIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        img = dipImgOneIn + dipImgTwoIn
-        return {'dipImgPlusOut': img}
-
 
-class CombineMeasurementNode(Node):
+class CombineMeasurementNode(OperationNode):
     """
     Node for making list of input dip.Measurement objects
     """
@@ -1517,10 +1070,3 @@ class CombineMeasurementNode(Node):
             'dipMsrInIn': {'io': 'in'},
             'listMsrOut': {'io': 'out'},
         })
-
-    def process(self, dipMsrOutIn, dipMsrInIn, display=True):
-        """
-        Node process function. If display=False, no effect
-        """
-        lst = [dipMsrOutIn, dipMsrInIn]
-        return {'listMsrOut': lst}
@@ -0,0 +1,401 @@
+# Numpy
+import numpy as np
+
+# PyDIP
+import PyDIP as dip
+
+# Operators
+import operator
+
+
+# Connectivity combo values of nodes
+CONNECTIVITY = {
+    '8-Connectivity': 2, '4-Connectivity': 1,
+    '4-8 Connectivity': -1, '8-4 Connectivity': -2,
+}
+
+# Relation combo values of CreateMask node
+RELATIONS = {
+    '<=': operator.le, '>=': operator.ge, '<': operator.lt,
+    '>': operator.gt, '==': operator.eq, '!=': operator.ne
+}
+
+
+def is_uint8(dip_img):
+    """
+    True if dip.Image pixels are UINT8, checked on buffer without copy
+    """
+    return np.asarray(dip_img).dtype == np.uint8
+
+
+def prior_distance(dip_img, prior):
+    """
+    Normalized elliptic distance of every pixel from object center of
+    SegmentationPrior, 1 on filled object boundary
+
+    :param dip_img: dip.Image of crop
+    :param prior: SegmentationPrior
+    :return: 2D np.ndarray
+    """
+    height, width = np.asarray(dip_img).shape[:2]
+    y, x = np.ogrid[:height, :width]
+    return np.hypot((x - prior.center[0]) / prior.radii[0],
+                    (y - prior.center[1]) / prior.radii[1])
+
+
+# Processing of flowchart nodes without Qt. Every operation takes ctrl dict
+# of node control values (CtrlNode stateGroup state, as stored in .fc file)
+# and node inputs by terminal name, and returns dict of outputs by terminal
+# name. Used by nodes in processing.nodes and by processing.compiler
+
+
+def gaussian_convolution(ctrl, dipImgIn):
+    return {'smoothOut': dip.Gauss(dipImgIn, [ctrl['sigmas']])}
+
+
+def threshold(ctrl, dipImgIn):
+    thr = dip.Threshold(
+        dipImgIn, method=ctrl['method'], parameter=ctrl['parameter'])
+    return {'thrImgOut': thr[0], 'thrValOut': thr[1]}
+
+
+def range_threshold(ctrl, dipImgIn):
+    thr = dip.RangeThreshold(
+        dipImgIn, lowerBound=ctrl['lowerBound'],
+        upperBound=ctrl['upperBound'], foreground=ctrl['foreground'],
+        background=ctrl['background']
+    )
+    return {'dipImgOut': thr}
+
+
+def opening(ctrl, dipImgIn):
+    struct_element = dip.SE(ctrl['size'], ctrl['shape'])
+    return {'dipImgOut': dip.Opening(dipImgIn, se=struct_element)}
+
+
+def closing(ctrl, dipImgIn):
+    struct_element = dip.SE(ctrl['size'], ctrl['shape'])
+    return {'dipImgOut': dip.Closing(dipImgIn, se=struct_element)}
+
+
+def dilation(ctrl, dipImgIn):
+    struct_element = dip.SE(ctrl['size'], ctrl['shape'])
+    return {'dipImgOut': dip.Dilation(dipImgIn, se=struct_element)}
+
+
+def erosion(ctrl, dipImgIn):
+    struct_element = dip.SE(ctrl['size'], ctrl['shape'])
+    return {'dipImgOut': dip.Erosion(dipImgIn, se=struct_element)}
+
+
+def edge_objects_remove(ctrl, dipImgIn):
+    img = dip.EdgeObjectsRemove(
+        dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']])
+    return {'dipImgOut': img}
+
+
+def convert(ctrl, dipImgIn):
+    return {'dipImgOut': dip.Convert(dipImgIn, ctrl['DataType'])}
+
+
+def invert(ctrl, dipImgIn):
+    return {'dipImgOut': dip.Invert(dipImgIn)}
+
+
+def canny(ctrl, dipImgIn):
+    img = dip.Canny(dipImgIn, [ctrl['sigmas']], ctrl['lower'], ctrl['upper'])
+    return {'dipImgOut': img}
+
+
+def gradient(ctrl, dipImgIn):
+    return {'dipImgOut': dip.Gradient(dipImgIn, [ctrl['sigmas']])}
+
+
+def gradient_magnitude(ctrl, dipImgIn):
+    return {'dipImgOut': dip.GradientMagnitude(dipImgIn, [ctrl['sigmas']])}
+
+
+def gradient_direction(ctrl, dipImgIn):
+    return {'dipImgOut': dip.GradientDirection(dipImgIn, [ctrl['sigmas']])}
+
+
+def watershed(ctrl, dipImgIn, dipMaskIn=None):
+    kwargs = {
+        'connectivity': CONNECTIVITY[ctrl['connectivity']],
+        'maxDepth': ctrl['maxDepth'], 'maxSize': int(ctrl['maxSize']),
+        'flags': {ctrl['outType'], ctrl['sortOrder'], ctrl['algorithm']},
+    }
+    if dipMaskIn is None:
+        img = dip.Watershed(dipImgIn, **kwargs)
+    else:
+        img = dip.Watershed(dipImgIn, mask=dipMaskIn, **kwargs)
+    return {'dipImgOut': img}
+
+
+def seeded_watershed(ctrl, dipImgIn, dipSeedsIn, dipMaskIn=None):
+    flags = {ctrl['outType'], ctrl['sortOrder']}
+    if ctrl['no gaps']:
+        flags.add('no gaps')
+    if ctrl['uphill only']:
+        flags.add('uphill only')
+    kwargs = {
+        'connectivity': CONNECTIVITY[ctrl['connectivity']],
+        'maxDepth': ctrl['maxDepth'], 'maxSize': int(ctrl['maxSize']),
+        'flags': flags,
+    }
+    if dipMaskIn is None:
+        img = dip.SeededWatershed(dipImgIn, seeds=dipSeedsIn, **kwargs)
+    else:
+        img = dip.SeededWatershed(
+            dipImgIn, seeds=dipSeedsIn, mask=dipMaskIn, **kwargs)
+    return {'dipImgOut': img}
+
+
+def minima(ctrl, dipImgIn):
+    img = dip.Minima(dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']],
+                     output=ctrl['outType'])
+    return {'dipImgOut': img}
+
+
+def maxima(ctrl, dipImgIn):
+    img = dip.Minima(dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']],
+                     output=ctrl['outType'])
+    return {'dipImgOut': img}
+
+
+def create_mask(ctrl, dipImgIn):
+    return {'dipImgOut': RELATIONS[ctrl['relation']](
+        dipImgIn, ctrl['intensity'])}
+
+
+def prior_seeds(ctrl, dipImgIn, priorIn=None):
+    if priorIn is None:
+        return {'dipSeedsOut': dip.Minima(
+            dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']],
+            output='binary')}
+    dist = prior_distance(dipImgIn, priorIn)
+    inner = priorIn.innerFraction
+    # Edges expected at inner and 1, relative gap of ring width
+    width = ctrl['gap'] * (1. - inner)
+    seeds = (dist <= inner - width) | (dist >= 1. + width) | (
+        (dist >= inner + width) & (dist <= 1. - width))
+    return {'dipSeedsOut': dip.Image(seeds)}
+
+
+def prior_mask(ctrl, dipImgIn, priorIn=None):
+    if priorIn is None:
+        return {'dipMaskOut': None}
+    mask = prior_distance(dipImgIn, priorIn) <= 1. + ctrl['margin']
+    return {'dipMaskOut': dip.Image(mask)}
+
+
+def apply_mask(ctrl, dipImgIn, dipMaskIn):
+    return {'dipImgOut': dipImgIn * dipMaskIn}
+
+
+def fill(ctrl, dipImgIn, dipMaskIn=None):
+    if dipMaskIn is None:
+        img = dipImgIn.Copy().Fill(ctrl['intensity'])
+    else:
+        img = dipImgIn.Copy()
+        img[dipMaskIn] = ctrl['intensity']
+    return {'dipImgOut': img}
+
+
+def binary_propagation(ctrl, dipImgIn, dipMaskIn=None):
+    kwargs = {
+        'connectivity': CONNECTIVITY[ctrl['connectivity']],
+        'iterations': int(ctrl['iterations']),
+        'edgeCondition': ctrl['edgeCondition'],
+    }
+    if dipMaskIn is None:
+        img = dip.BinaryPropagation(dipImgIn, **kwargs)
+    else:
+        img = dip.BinaryPropagation(dipImgIn, dipMaskIn, **kwargs)
+    return {'dipImgOut': img}
+
+
+def fill_holes(ctrl, dipImgIn):
+    img = dip.FillHoles(
+        dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']])
+    return {'dipImgOut': img}
+
+
+def label(ctrl, dipImgIn):
+    img = dip.Label(
+        dipImgIn, connectivity=CONNECTIVITY[ctrl['connectivity']],
+        minSize=int(ctrl['minSize']), maxSize=int(ctrl['maxSize'])
+    )
+    return {'dipImgOut': img}
+
+
+def measure(ctrl, dipLblIn, dipGreyIn):
+    # Checked features in control order
+    features = [name for name, val in ctrl.items()
+                if name != 'connectivity' and val]
+    msr = dip.MeasurementTool.Measure(
+        dipLblIn, grey=dipGreyIn, features=features,
+        connectivity=CONNECTIVITY[ctrl['connectivity']]
+    )
+    return {'dipMsrOut': msr}
+
+
+def working_distance_correction(ctrl, dipMsrIn):
+    if ctrl['feature'] == 'Feret Min':
+        # Measured image size
+        img_size_1, img_size_2 = (dipMsrIn['Feret'][1][1],
+                                  dipMsrIn['Feret'][2][1])
+    else:
+        # Measured image size
+        img_size_1, img_size_2 = (dipMsrIn['Feret'][1][0],
+                                  dipMsrIn['Feret'][2][0])
+    # Standard height difference
+    height_1 = ctrl['standard 1 height']
+    height_2 = ctrl['standard 2 height']
+    height_diff_12 = height_1 - height_2
+    obj_size_1 = ctrl['standard 1 measure']
+    obj_size_2 = ctrl['standard 2 measure']
+    # mm/px ratio
+    mm_px_1 = obj_size_1 / img_size_1
+    mm_px_2 = obj_size_2 / img_size_2
+    # Working distance
+    work_dist_1 = height_diff_12 / (mm_px_2 / mm_px_1 - 1.)
+    return {'CalibConstOut': {'std_height': height_1,
+                              'std_work_dist': work_dist_1,
+                              'std_mm_px': mm_px_1}}
+
+
+def segment_oring(ctrl, dipImgIn):
+    connectivity = CONNECTIVITY[ctrl['connectivity']]
+    outer = dip.FillHoles(dipImgIn, connectivity=connectivity)
+    inner = dip.EdgeObjectsRemove(
+        dip.Invert(dipImgIn), connectivity=connectivity)
+    return {'dipOuterOut': outer,
+            'dipInnerOut': inner}
+
+
+def set_pixel_size(ctrl, dipImgIn, mmPxRatioIn):
+    img = dipImgIn.Copy()
+    img.SetPixelSize(
+        dip.PixelSize(dip.PhysicalQuantity(mmPxRatioIn, ctrl['units'])))
+    return {'dipImgOut': img}
+
+
+def kuwahara(ctrl, dipImgIn):
+    kernel = dip.Kernel(ctrl['size'], ctrl['shape'])
+    img = dip.Kuwahara(dipImgIn, kernel=kernel, threshold=ctrl['threshold'])
+    return {'dipImgOut': img}
+
+
+def bilateral_filter(ctrl, dipImgIn):
+    img = dip.BilateralFilter(
+        dipImgIn, method=ctrl['method'],
+        spatialSigmas=[ctrl['spatialSigmas']],
+        tonalSigma=ctrl['tonalSigma'], truncation=ctrl['truncation'],
+    )
+    return {'dipImgOut': img}
+
+
+def _binary_area_args(ctrl):
+    return {
+        'connectivity': CONNECTIVITY[ctrl['connectivity']],
+        'filterSize': int(ctrl['filterSize']),
+        'edgeCondition': ctrl['edgeCondition'],
+    }
+
+
+def binary_area_closing(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryAreaClosing(
+        dipImgIn, **_binary_area_args(ctrl))}
+
+
+def binary_area_opening(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryAreaOpening(
+        dipImgIn, **_binary_area_args(ctrl))}
+
+
+def _binary_morphology_args(ctrl):
+    return {
+        'connectivity': CONNECTIVITY[ctrl['connectivity']],
+        'iterations': int(ctrl['iterations']),
+        'edgeCondition': ctrl['edgeCondition'],
+    }
+
+
+def binary_closing(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryClosing(
+        dipImgIn, **_binary_morphology_args(ctrl))}
+
+
+def binary_opening(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryOpening(
+        dipImgIn, **_binary_morphology_args(ctrl))}
+
+
+def binary_dilation(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryDilation(
+        dipImgIn, **_binary_morphology_args(ctrl))}
+
+
+def binary_erosion(ctrl, dipImgIn):
+    return {'dipImgOut': dip.BinaryErosion(
+        dipImgIn, **_binary_morphology_args(ctrl))}
+
+
+def operator_plus(ctrl, dipImgOneIn, dipImgTwoIn):
+    if is_uint8(dipImgOneIn) and is_uint8(dipImgTwoIn):
+        # Measured crops are UINT8, sum would saturate
+        img = dip.Convert(dipImgOneIn, 'UINT16') + \
+            dip.Convert(dipImgTwoIn, 'UINT16')
+    else:
+        img = dipImgOneIn + dipImgTwoIn
+    return {'dipImgPlusOut': img}
+
+
+def combine_measurement(ctrl, dipMsrOutIn, dipMsrInIn):
+    return {'listMsrOut': [dipMsrOutIn, dipMsrInIn]}
+
+
+# Operation of every processing node class, display nodes have none
+OPERATIONS = {
+    'GaussianConvolution': gaussian_convolution,
+    'Threshold': threshold,
+    'RangeThreshold': range_threshold,
+    'Opening': opening,
+    'Closing': closing,
+    'Dilation': dilation,
+    'Erosion': erosion,
+    'EdgeObjectsRemove': edge_objects_remove,
+    'Convert': convert,
+    'Invert': invert,
+    'Canny': canny,
+    'Gradient': gradient,
+    'GradientMagnitude': gradient_magnitude,
+    'GradientDirection': gradient_direction,
+    'Watershed': watershed,
+    'SeededWatershed': seeded_watershed,
+    'Minima': minima,
+    'Maxima': maxima,
+    'CreateMask': create_mask,
+    'PriorSeeds': prior_seeds,
+    'PriorMask': prior_mask,
+    'ApplyMask': apply_mask,
+    'Fill': fill,
+    'BinaryPropagation': binary_propagation,
+    'FillHoles': fill_holes,
+    'Label': label,
+    'Measure': measure,
+    'WorkingDistanceCorrection': working_distance_correction,
+    'SegmentORing': segment_oring,
+    'SetPixelSize': set_pixel_size,
+    'Kuwahara': kuwahara,
+    'BilateralFilter': bilateral_filter,
+    'BinaryAreaClosing': binary_area_closing,
+    'BinaryAreaOpening': binary_area_opening,
+    'BinaryClosing': binary_closing,
+    'BinaryOpening': binary_opening,
+    'BinaryDilation': binary_dilation,
+    'BinaryErosion': binary_erosion,
+    'OperatorPlus': operator_plus,
+    'CombineMeasurement': combine_measurement,
+}
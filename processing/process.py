@@ -1,65 +1,180 @@
-import PyDIP as dip
-import numpy as np
+# CPU affinity
+import os
+
+# Partial functions
+import functools
+
+# Queue statistics
+import queue
+from collections import namedtuple
 
 # Multiprocessing
 # import multiprocessing
 import multiprocess as multiprocessing
 
+# Shared memory frames
+from processing.ring import FrameRing, FrameSlot
+from processing.stage import PreprocessStage, StageFile
+
+# Measurement of single and fused frames
+from processing.fusion import measure_detection
+
+
+# Scheduling policies of detection and measurement tasks
+SCHEDULING_POLICIES = ('separate', 'priority')
+
+# Observed state of detection or measurement task queue
+QueueStats = namedtuple(
+    'QueueStats', ['workers', 'depth', 'maxDepth', 'queued', 'done',
+                   'dropped'])
+
+# Result of measurement task: Detection without crops, measurement and
+# error message (None if measured)
+MeasurementOutput = namedtuple(
+    'MeasurementOutput', ['detection', 'measurement', 'error'])
+
+
+def traced_call(frameFunc, frame, trace=None, **kwargs):
+    """
+    Call frameFunc(frame, **kwargs) and mark preprocessing stages in trace.
+    Every Detection carries own copy of trace, LatencyTrace is returned
+    instead of empty list so frames without detected object are traced too
+
+    :param frameFunc: preprocessing function returning list of Detection
+    :param frame: 2D np.ndarray
+    :param trace: LatencyTrace or None
+    :return: frameFunc result or LatencyTrace
+    """
+    if trace is None:
+        return frameFunc(frame, **kwargs)
+    trace.mark('preprocess_start')
+    res = frameFunc(frame, **kwargs)
+    trace.mark('preprocess_end')
+    if not res:
+        return trace
+    for detection in res:
+        detection.trace = trace.copy()
+    return res
+
+
+def traced_measurement(detection, measureFunc, mmPxRatio=1.):
+    """
+    Measure detection in measurement worker and mark measurement in its
+    trace. Failed measurement is reported in output, worker keeps running.
+    Crops are not sent back to main process
+
+    :param detection: Detection with crop or fused frames
+    :param measureFunc: picklable callable(crop, mmPxRatio, prior)
+    :param mmPxRatio: calibration mm/px ratio of sensor pixels
+    :return: MeasurementOutput
+    """
+    if detection.trace is not None:
+        detection.trace.mark('measure_start')
+    measurement = None
+    error = None
+    try:
+        measurement = measure_detection(detection, measureFunc, mmPxRatio)
+    except Exception as e:
+        error = str(e)
+    if detection.trace is not None:
+        detection.trace.mark('measure_end')
+    detection.crop = None
+    detection.frames = None
+    return MeasurementOutput(detection, measurement, error)
+
+
 class ProcessParallel:
-    def __init__(self, measureFlowchart, numberProc=1):
+    def __init__(self, measureFlowchart, numberProc=1, frameShape=None,
+                 sensorCenterX=None, cpus=None, stage=None,
+                 policy='separate', measureProc=1, queueDepth=1,
+                 measureQueueDepth=4, pollInterval=0.005, mmPxRatio=1.):
         """
-        Object for parallel processing and preprocessing of image frames
+        Object for parallel processing and preprocessing of image frames.
+        Detection (frame preprocessing) and measurement tasks have own
+        queues, so expensive measurement does not block incoming frames and
+        measurement of confirmed object is not starved by frames:
+
+        * 'separate' policy: numberProc detection workers and measureProc
+          measurement workers, each pool takes tasks only from own queue
+        * 'priority' policy: numberProc shared workers always take
+          measurement task first and frame only if no measurement is waiting
+
+        :param measureFlowchart: CompiledFlowchart measuring centered
+        objects in workers, no measurement workers if None
+        :param numberProc: number of detection (or shared) worker processes
+        :param frameShape: (maxHeight, maxWidth) of frames for shared-memory
+        FrameRing. If None, frames are pickled through input queue
+        :param sensorCenterX: sensor x-center for object centering, frame
+        x-center if None
+        :param cpus: CPU cores worker processes are pinned to, see
+        CoreScheduler, any core if None
+        :param stage: preprocessing stage definition, dict with parameters
+        or definition file name reloaded on change (see reloadStage),
+        STAGE_DEFAULTS if None
+        :param policy: 'separate' or 'priority' scheduling of detection and
+        measurement tasks
+        :param measureProc: number of measurement worker processes with
+        'separate' policy and measureFlowchart
+        :param queueDepth: maximal number of queued frames
+        :param measureQueueDepth: maximal number of queued measurements
+        :param pollInterval: frame queue wait of 'priority' workers in s,
+        longest delay of measurement arriving to idle worker
+        :param mmPxRatio: calibration mm/px ratio of camera sensor pixels
         """
+        if policy not in SCHEDULING_POLICIES:
+            print('\nUnknown scheduling policy {}'.format(policy))
+            raise ValueError(policy)
         # Flowchart object, queues and processes
         self.measureFlowchart = measureFlowchart
-        self.input_queue = multiprocessing.JoinableQueue(1)
+        self.policy = policy
+        self.input_queue = multiprocessing.JoinableQueue(queueDepth)
         self.output_queue = multiprocessing.Queue()
+        self.measure_queue = multiprocessing.JoinableQueue(measureQueueDepth)
+        self.measure_output_queue = multiprocessing.Queue()
         self.numberProc = numberProc
-        self.processes = [
-            ProcessQueue(self.input_queue, self.output_queue)
-            for _ in range(self.numberProc)
-        ]
-
-    @staticmethod
-    def preprocess_frame(frame):
-        """
-        Hardcoded function for real-time frame preprocessing. Returns image
-        for measurement of None
-
-        :param frame: 2D array
-        :return: np.array or None
-        """
-        img = dip.Image(frame)
-        img_center_x = img.Sizes()[0]//2
-        # Range Thresholding
-        thr = dip.RangeThreshold(
-            img, lowerBound=30, upperBound=240,
-            foreground=1.0, background=0.0
-        )
-        # Fill holes
-        fill = dip.FillHoles(thr)
-        # Label and measure
-        lbl = dip.Label(fill, connectivity=1, minSize=10000)
-        if dip.GetObjectLabels(lbl):
-            msr = dip.MeasurementTool.Measure(
-                lbl, img, ['Center', 'Minimum', 'Maximum', 'PodczeckShapes'])
-            for obj in msr.Objects():
-                # Ellipse Podczeck
-                if 0.98 <= msr['PodczeckShapes'][obj][3] <= 1.02:
-                    # Object location near x-axis center
-                    if (img_center_x-150 <= msr['Center'][obj][0] <=
-                            img_center_x+150):
-                        # Expand box around object for measurement
-                        min_x = int(msr['Minimum'][obj][0] - 50)
-                        min_y = int(msr['Minimum'][obj][1] - 50)
-                        max_x = int(msr['Maximum'][obj][0] + 50)
-                        max_y = int(msr['Maximum'][obj][1] + 50)
-                        # Only one object can be measured
-                        return np.asarray(
-                            img[min_x:max_x, min_y:max_y], np.uint32
-                        )
-        # Return None if no object is near x-axis center
-        return None
+        self.measureProc = measureProc if policy == 'separate' and \
+            measureFlowchart is not None else 0
+        self.mmPxRatio = mmPxRatio
+        self.sensorCenterX = sensorCenterX
+        # Task counters of queue statistics, updated in main process
+        self.stats = {
+            'detect': {'maxDepth': queueDepth, 'queued': 0, 'done': 0,
+                       'dropped': 0},
+            'measure': {'maxDepth': measureQueueDepth, 'queued': 0,
+                        'done': 0, 'dropped': 0},
+        }
+        # Compiled in main process, invalid definition fails here
+        self.stageFile = StageFile(stage) if isinstance(stage, str) \
+            else None
+        self.stage = PreprocessStage(stage, sensorCenterX)
+        # Slots for frames queued, processed and currently written
+        if frameShape is not None:
+            self.frameRing = FrameRing(2 * numberProc + 2, *frameShape)
+        else:
+            self.frameRing = None
+        if policy == 'priority':
+            # Shared workers serve measurement queue first
+            self.processes = [
+                ProcessQueue(
+                    self.input_queue, self.output_queue, self.frameRing,
+                    self.stage, cpus, self.measure_queue,
+                    self.measure_output_queue, pollInterval
+                )
+                for _ in range(self.numberProc)
+            ]
+        else:
+            self.processes = [
+                ProcessQueue(
+                    self.input_queue, self.output_queue, self.frameRing,
+                    self.stage, cpus
+                )
+                for _ in range(self.numberProc)
+            ] + [
+                ProcessQueue(
+                    self.measure_queue, self.measure_output_queue, cpus=cpus
+                )
+                for _ in range(self.measureProc)
+            ]
 
     def start(self):
         """
@@ -67,25 +182,168 @@ class ProcessParallel:
         """
         [proc.start() for proc in self.processes]
 
-    def addInput(self, frame):
+    def addInput(self, frame, offsetX=0, offsetY=0, timestamp=0,
+                 trace=None):
+        """
+        Add frame to input Queue. With FrameRing only slot reference is
+        queued, frame is dropped if all slots are busy
+
+        :param frame: 2D np.ndarray
+        :param offsetX: frame ROI x offset on sensor
+        :param offsetY: frame ROI y offset on sensor
+        :param timestamp: camera frame timestamp in ticks
+        :param trace: LatencyTrace of frame or None
+        :return: True if frame was queued
+        """
+        if self.frameRing is None:
+            if trace is not None:
+                trace.mark('queued')
+            self.input_queue.put((functools.partial(
+                traced_call, functools.partial(
+                    self.stage, offsetX=offsetX, offsetY=offsetY,
+                    timestamp=timestamp),
+                trace=trace), frame))
+            self.stats['detect']['queued'] += 1
+            return True
+        frameSlot = self.frameRing.write(frame, offsetX, offsetY, timestamp)
+        if frameSlot is None:
+            self.dropInput()
+            return False
+        if trace is not None:
+            # Marked before put, queue pickles trace in feeder thread
+            trace.mark('queued')
+        self.input_queue.put(frameSlot._replace(trace=trace))
+        self.stats['detect']['queued'] += 1
+        return True
+
+    def dropInput(self):
+        """
+        Count frame rejected because input queue or frame ring was full
         """
-        Add frame to input Queue
+        self.stats['detect']['dropped'] += 1
+
+    def setStage(self, stage):
         """
-        self.input_queue.put((self.preprocess_frame, frame))
+        Replace preprocessing stage of running workers. Stage is compiled
+        once and sent to every detection (or shared) worker, which switches
+        before next frame
 
-    def addMeasurementInput(self, measured_object):
+        :param stage: stage definition dict or file name
         """
-        Add image of measured object to input Queue for measuring
-        :param measured_object: np.ndarray
+        self.stage = PreprocessStage(stage, self.sensorCenterX)
+        # Measurement workers never read stage queue, undrained queue would
+        # block their exit on join
+        for proc in self.processes[:self.numberProc]:
+            proc.stage_queue.put(self.stage)
+
+    def reloadStage(self):
+        """
+        Reload stage definition file if it was modified, invalid definition
+        is reported and current stage is kept
+
+        :return: True if stage was replaced
+        """
+        if self.stageFile is None or not self.stageFile.changed():
+            return False
+        try:
+            self.setStage(self.stageFile.fn)
+        except (ValueError, SyntaxError) as e:
+            print('\nPreprocessing stage reload FAILED!')
+            print(e)
+            return False
+        print('\nPreprocessing stage reloaded: {}'.format(self.stageFile.fn))
+        return True
+
+    def ifMeasuring(self):
+        """
+        Check if centered objects are measured by workers
+
+        :return: True or False
         """
-        mes_obj = dip.Image(measured_object)
-        self.input_queue.put((self.measureFlowchart.fc_process, mes_obj))
+        if self.measureFlowchart is None:
+            return False
+        return self.policy == 'priority' or self.measureProc > 0
+
+    def addMeasurementInput(self, detection, mmPxRatio=None):
+        """
+        Add centered Detection confirmed by tracker to measurement Queue.
+        Measurement of confirmed object is never dropped, call blocks while
+        measurement queue is full. Output is MeasurementOutput
+
+        :param detection: Detection with crop or fused frames
+        :param mmPxRatio: mm/px ratio of camera, ratio of ProcessParallel
+        if None
+        """
+        if not self.ifMeasuring():
+            print('\nNo measurement workers, set measureFlowchart and '
+                  'measureProc')
+            raise ValueError(self.measureProc)
+        if mmPxRatio is None:
+            mmPxRatio = self.mmPxRatio
+        self.measure_queue.put((functools.partial(
+            traced_measurement, measureFunc=self.measureFlowchart.measure,
+            mmPxRatio=mmPxRatio), detection))
+        self.stats['measure']['queued'] += 1
 
     def getOutput(self):
         """
         Retrieve Queue output
         """
-        return self.output_queue.get()
+        res = self.output_queue.get()
+        self.stats['detect']['done'] += 1
+        return res
+
+    def getMeasurementOutput(self, timeout=None):
+        """
+        Retrieve measurement Queue output
+
+        :param timeout: wait for measurement in s, forever if None
+        :return: MeasurementOutput, None after timeout
+        """
+        try:
+            res = self.measure_output_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.stats['measure']['done'] += 1
+        return res
+
+    def pendingMeasurements(self):
+        """
+        Number of queued measurements whose output was not retrieved yet
+        """
+        return self.stats['measure']['queued'] - \
+            self.stats['measure']['done']
+
+    def queueStats(self):
+        """
+        Observed state of detection and measurement task queues. Depth is
+        None on platforms without Queue.qsize
+
+        :return: dict of QueueStats with 'detect' and 'measure' keys
+        """
+        workers = {
+            'detect': self.numberProc,
+            'measure': self.measureProc if self.policy == 'separate'
+            else self.numberProc,
+        }
+        queues = {'detect': self.input_queue, 'measure': self.measure_queue}
+        stats = {}
+        for name, counts in self.stats.items():
+            try:
+                depth = queues[name].qsize()
+            except NotImplementedError:
+                depth = None
+            stats[name] = QueueStats(workers[name], depth, **counts)
+        return stats
+
+    def print_queue_stats(self):
+        """
+        Print scheduling policy and task queue statistics
+        """
+        print("\nScheduling policy: {}".format(self.policy))
+        for name, stats in self.queueStats().items():
+            print("{}: {} workers, depth {}/{}, queued {}, done {}, "
+                  "dropped {}".format(name, *stats))
 
     def getNumProc(self):
         """
@@ -117,39 +375,116 @@ class ProcessParallel:
         """
         return self.output_queue.empty()
 
+    def ifMeasurementOutputQueueEmpty(self):
+        """
+        Check if measurement output queue is empty
+
+        :return: True or False
+        """
+        return self.measure_output_queue.empty()
+
     def join(self):
         """
         Wait for processing to finish
         """
+        self.measure_queue.join()
         self.input_queue.join()
 
     def stop(self):
         """
-        Stop parallel execution
+        Stop parallel execution. Poison pills are queued behind pending
+        tasks, 'priority' workers finish queued measurements before pills
+        are queued (pill in frame queue could be taken first)
         """
+        if self.policy == 'priority':
+            self.measure_queue.join()
         [self.input_queue.put(None) for _ in range(self.numberProc)]
+        [self.measure_queue.put(None) for _ in range(self.measureProc)]
 
 
 class ProcessQueue(multiprocessing.Process):
-    def __init__(self, input_queue, output_queue):
+    def __init__(self, input_queue, output_queue, frameRing=None,
+                 frameFunc=None, cpus=None, priority_queue=None,
+                 priority_output_queue=None, pollInterval=0.005):
         """
         Process for taking data from input_queue and writing into output_queue.
-        Exit with poison pill (None)
+        Input is (func, args) tuple or FrameSlot processed with frameFunc.
+        Exit with poison pill (None). Process is pinned to cpus if given.
+        New frameFunc can be sent through stage_queue. If priority_queue is
+        given, its tasks are taken first and results written into
+        priority_output_queue, input_queue is polled every pollInterval s
         """
         multiprocessing.Process.__init__(self)
         self.input_queue = input_queue
         self.output_queue = output_queue
+        self.frameRing = frameRing
+        self.frameFunc = frameFunc
+        self.cpus = cpus
+        self.priority_queue = priority_queue
+        self.priority_output_queue = priority_output_queue
+        self.pollInterval = pollInterval
+        self.stage_queue = multiprocessing.Queue()
+
+    def nextInput(self):
+        """
+        Next task with its queues, priority_queue is served first
+
+        :return: (input_queue, output_queue, task) or None if no task was
+        queued during pollInterval
+        """
+        if self.priority_queue is None:
+            return self.input_queue, self.output_queue, self.input_queue.get()
+        try:
+            return (self.priority_queue, self.priority_output_queue,
+                    self.priority_queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            return (self.input_queue, self.output_queue,
+                    self.input_queue.get(timeout=self.pollInterval))
+        except queue.Empty:
+            return None
 
     def run(self):
         """
         Infinite loop with poison pill exit
         """
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except (AttributeError, OSError) as e:
+                print('\nWorker CPU affinity FAILED!')
+                print(e)
         while True:
-            input_tup = self.input_queue.get()
+            task = self.nextInput()
+            if task is None:
+                continue
+            input_queue, output_queue, input_tup = task
             if input_tup is None:
-                self.input_queue.task_done()
+                input_queue.task_done()
                 break
-            func, args = input_tup
-            res = func(args)
-            self.input_queue.task_done()
-            self.output_queue.put(res)
+            if isinstance(input_tup, FrameSlot):
+                while not self.stage_queue.empty():
+                    self.frameFunc = self.stage_queue.get()
+                res = self.processFrameSlot(input_tup)
+            else:
+                func, args = input_tup
+                res = func(args)
+            # Output is queued before task is done, so it is pending
+            # after join
+            output_queue.put(res)
+            input_queue.task_done()
+
+    def processFrameSlot(self, frameSlot):
+        """
+        Process frame from shared memory slot without copying and release slot
+        """
+        try:
+            frame = self.frameRing.read(frameSlot)
+            if frame is None:
+                return None
+            return traced_call(
+                self.frameFunc, frame, frameSlot.trace,
+                **self.frameRing.metadata(frameSlot))
+        finally:
+            self.frameRing.release(frameSlot)
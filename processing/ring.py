@@ -0,0 +1,129 @@
+import numpy as np
+
+# Multiprocessing
+# import multiprocessing
+import multiprocess as multiprocessing
+
+# Named tuples
+from collections import namedtuple
+
+
+# Reference to frame inside FrameRing passed to ProcessQueue workers, with
+# optional LatencyTrace of frame
+FrameSlot = namedtuple(
+    'FrameSlot', ['slot', 'sequence', 'trace'], defaults=(None,))
+
+
+class FrameRing:
+    def __init__(self, numberSlots, maxHeight, maxWidth):
+        """
+        Fixed-size ring of Mono8 frame slots in shared memory. Grab callback
+        writes each frame once and workers receive only FrameSlot (slot index
+        and sequence number), so frames are not pickled through queues.
+
+        Single writer (grab thread), multiple readers (worker processes).
+        Slot is busy from write until reader releases it.
+
+        :param numberSlots: number of frame slots
+        :param maxHeight: maximum frame height in px
+        :param maxWidth: maximum frame width in px
+        """
+        self.numberSlots = numberSlots
+        self.slotSize = maxHeight * maxWidth
+        # Shared memory, inherited by worker processes
+        self._buffer = multiprocessing.RawArray(
+            'B', numberSlots * self.slotSize)
+        # Frame height, width and ROI offsets on sensor
+        self._shapes = multiprocessing.RawArray('i', numberSlots * 4)
+        self._sequences = multiprocessing.RawArray('q', numberSlots)
+        self._timestamps = multiprocessing.RawArray('q', numberSlots)
+        self._busy = multiprocessing.RawArray('b', numberSlots)
+        # Writer state
+        self._cursor = 0
+        self._nextSequence = 1
+        self.dropped = 0
+        # Numpy views of shared memory, created in each process
+        self._views = None
+
+    def __getstate__(self):
+        """
+        Numpy views are recreated after unpickling in worker process
+        """
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+    def _getViews(self):
+        """
+        Numpy views of frame buffer and slot metadata
+        """
+        if self._views is None:
+            frames = np.frombuffer(self._buffer, np.uint8).reshape(
+                self.numberSlots, self.slotSize)
+            shapes = np.frombuffer(self._shapes, np.int32).reshape(
+                self.numberSlots, 4)
+            self._views = (frames, shapes)
+        return self._views
+
+    def write(self, frame, offsetX=0, offsetY=0, timestamp=0):
+        """
+        Copy frame into first free slot. Called only from grab thread
+
+        :param frame: 2D np.ndarray Mono8
+        :param offsetX: frame ROI x offset on sensor
+        :param offsetY: frame ROI y offset on sensor
+        :param timestamp: camera frame timestamp in ticks
+        :return: FrameSlot or None if all slots are busy
+        """
+        frames, shapes = self._getViews()
+        height, width = frame.shape
+        if height * width > self.slotSize:
+            raise ValueError('Frame {} larger than ring slot'.format(
+                frame.shape))
+        for i in range(self.numberSlots):
+            slot = (self._cursor + i) % self.numberSlots
+            if not self._busy[slot]:
+                break
+        else:
+            self.dropped += 1
+            return None
+        frames[slot, :height * width].reshape(height, width)[...] = frame
+        shapes[slot] = (height, width, offsetX, offsetY)
+        self._timestamps[slot] = timestamp
+        sequence = self._nextSequence
+        self._nextSequence += 1
+        self._sequences[slot] = sequence
+        self._busy[slot] = 1
+        self._cursor = (slot + 1) % self.numberSlots
+        return FrameSlot(slot, sequence)
+
+    def read(self, frameSlot):
+        """
+        Zero-copy view of frame in slot. View is valid until release
+
+        :param frameSlot: FrameSlot
+        :return: 2D np.ndarray or None if slot was overwritten
+        """
+        frames, shapes = self._getViews()
+        slot = frameSlot.slot
+        if self._sequences[slot] != frameSlot.sequence:
+            return None
+        height, width = shapes[slot, :2]
+        return frames[slot, :height * width].reshape(height, width)
+
+    def metadata(self, frameSlot):
+        """
+        ROI offsets and camera timestamp of frame in slot
+
+        :return: dict with offsetX, offsetY and timestamp
+        """
+        frames, shapes = self._getViews()
+        offsetX, offsetY = shapes[frameSlot.slot, 2:]
+        return {'offsetX': int(offsetX), 'offsetY': int(offsetY),
+                'timestamp': self._timestamps[frameSlot.slot]}
+
+    def release(self, frameSlot):
+        """
+        Mark slot as free for writing
+        """
+        self._busy[frameSlot.slot] = 0
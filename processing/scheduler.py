@@ -0,0 +1,62 @@
+import os
+
+
+def available_cpus():
+    """
+    CPU cores available to this process
+    """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is not available on every platform
+        return list(range(os.cpu_count() or 1))
+
+
+class CoreScheduler:
+    def __init__(self, cpus=None, reservedPerCamera=1):
+        """
+        Distributes available CPU cores between camera pipelines. Each
+        pipeline gets worker processes pinned to its own cores, so pipelines
+        of different cameras do not compete for the same core.
+
+        One core per camera is reserved for grab, acquisition and measurement
+        threads of camera. Remaining cores are divided proportionally to
+        pipeline weight (camera frame rate), every pipeline gets at least one
+        worker. With less cores than workers, pipelines share cores.
+
+        :param cpus: list of CPU core indices, all available cores if None
+        :param reservedPerCamera: cores left for threads of each camera
+        """
+        self.cpus = list(cpus) if cpus is not None else available_cpus()
+        self.reservedPerCamera = reservedPerCamera
+
+    def allocate(self, weights):
+        """
+        Number of worker processes and CPU cores for each pipeline
+
+        :param weights: list of pipeline weights, e.g. camera frame rates
+        :return: list of (numberProc, cpus) tuples in order of weights
+        """
+        numberPipelines = len(weights)
+        if not numberPipelines:
+            return []
+        reserved = self.reservedPerCamera * numberPipelines
+        workerCpus = self.cpus[reserved:] if len(self.cpus) > reserved \
+            else self.cpus
+        # Largest remainder distribution, at least one worker per pipeline
+        total = float(sum(weights)) or 1.
+        free = max(len(workerCpus) - numberPipelines, 0)
+        shares = [free * w / total for w in weights]
+        counts = [1 + int(s) for s in shares]
+        remainders = sorted(
+            range(numberPipelines), key=lambda i: int(shares[i]) - shares[i])
+        for i in remainders[:free - sum(int(s) for s in shares)]:
+            counts[i] += 1
+        allocation = []
+        start = 0
+        for count in counts:
+            cpus = [workerCpus[(start + i) % len(workerCpus)]
+                    for i in range(count)]
+            allocation.append((count, cpus))
+            start += count
+        return allocation
@@ -0,0 +1,391 @@
+import PyDIP as dip
+import numpy as np
+
+# Stage definition file
+import ast
+import os
+
+# Crop binning
+import math
+
+# Flat-field correction, background model and detected objects
+from processing.flatfield import FlatField
+from processing.flowchart_file import flowchart_footprint
+from processing.background import BackgroundModel
+from processing.detection import Detection, SegmentationPrior, \
+    projection_detect, gradient_energy
+
+
+# Preprocessing stage parameters and defaults
+STAGE_DEFAULTS = {
+    # 'dip' for labeling, 'projection' for projection detector
+    'detector': 'dip',
+    # Decimation factor of detection image
+    'scale': 4,
+    # Object intensity range
+    'lowerBound': 30,
+    'upperBound': 240,
+    # Minimal object area in full resolution px
+    'minSize': 10000,
+    # Maximal object bounding box side in full resolution px, sizes camera
+    # ROI band
+    'maxSize': 800,
+    # Accepted Podczeck ellipse shape range
+    'ellipseMin': 0.98,
+    'ellipseMax': 1.02,
+    # Object center distance from x-center for measurement in px
+    'centerTolerance': 150,
+    # Crop margin: 'fixed' padding or 'footprint' of measurement flowchart
+    'cropPolicy': 'fixed',
+    # Crop padding around object bounding box in px
+    'padding': 50,
+    # Flowchart whose kernel footprints size crop margin, and margin in crop
+    # px kept beyond footprint ('footprint' policy)
+    'measureFlowchart': 'measure_flowchart.fc',
+    'footprintMargin': 4,
+    # Longest crop side in px, larger crops are binned by integer factor
+    # (area parameters of flowchart are in crop px), None for full resolution
+    'cropSize': None,
+    # Pixel subsampling step of crop sharpness (gradient energy)
+    'sharpnessStep': 2,
+    # Centered frames of object fused into measurement (short exposure),
+    # 'average' registered crops or fuse 'measurements' of frames
+    'fuseFrames': 1,
+    'fusion': 'average',
+    # Flat-field gain/offset maps file (calibrate_flat_field.py) or None
+    'flatField': None,
+    # Skip segmentation of frames matching running background model
+    'background': False,
+    # Running mean update rate of background pixels
+    'backgroundRate': 0.05,
+    # Intensity difference from background of object pixels
+    'backgroundThreshold': 20,
+    # Fraction of minSize differing from background for object presence
+    'backgroundArea': 0.25,
+}
+
+
+def read_stage(fn):
+    """
+    Read preprocessing stage definition. File has one 'name: value' line per
+    parameter (same syntax as flowchart .fc files), missing parameters are
+    set to STAGE_DEFAULTS
+
+    :param fn: stage definition file
+    :return: dict with stage parameters
+    """
+    definition = dict(STAGE_DEFAULTS)
+    with open(fn) as f:
+        for lineNumber, line in enumerate(f, 1):
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            name, _, value = line.partition(':')
+            name = name.strip()
+            if name not in STAGE_DEFAULTS:
+                print('\nUnknown preprocessing stage parameter {} in {}:{}'
+                      .format(name, fn, lineNumber))
+                raise ValueError(name)
+            definition[name] = ast.literal_eval(value.strip())
+    return definition
+
+
+def write_stage(fn, definition):
+    """
+    Write preprocessing stage definition
+
+    :param fn: stage definition file
+    :param definition: dict with stage parameters
+    """
+    with open(fn, 'w') as f:
+        for name in STAGE_DEFAULTS:
+            f.write('{}: {!r}\n'.format(
+                name, definition.get(name, STAGE_DEFAULTS[name])))
+
+
+def label_detect(frame, lowerBound=30, upperBound=240, minSize=10000,
+                 ellipseRange=(0.98, 1.02)):
+    """
+    Detect ellipse-shaped objects by thresholding, hole filling, labeling
+    and measurement with DIPlib
+
+    :param frame: 2D np.ndarray
+    :param lowerBound: lower object intensity
+    :param upperBound: upper object intensity
+    :param minSize: minimal object area in px
+    :param ellipseRange: (min, max) accepted Podczeck ellipse shape
+    :return: list of (center, minimum, maximum) in frame coordinates
+    """
+    img = dip.Image(frame)
+    objects = []
+    # Range Thresholding
+    thr = dip.RangeThreshold(
+        img, lowerBound=lowerBound, upperBound=upperBound,
+        foreground=1.0, background=0.0
+    )
+    # Fill holes
+    fill = dip.FillHoles(thr)
+    # Label and measure
+    lbl = dip.Label(fill, connectivity=1, minSize=minSize)
+    if dip.GetObjectLabels(lbl):
+        msr = dip.MeasurementTool.Measure(
+            lbl, img, ['Center', 'Minimum', 'Maximum', 'PodczeckShapes'])
+        for obj in msr.Objects():
+            # Ellipse Podczeck
+            if ellipseRange[0] <= msr['PodczeckShapes'][obj][3] <= \
+                    ellipseRange[1]:
+                objects.append((msr['Center'][obj], msr['Minimum'][obj],
+                                msr['Maximum'][obj]))
+    return objects
+
+
+def bin_crop(img, factor):
+    """
+    Downsample image by integer factor, mean of factor x factor pixel
+    blocks. Right and bottom pixels not filling block are dropped
+
+    :param img: 2D np.ndarray
+    :param factor: int binning factor
+    :return: 2D np.ndarray in img data type
+    """
+    height = img.shape[0] // factor
+    width = img.shape[1] // factor
+    # Sum of strided block pixels, faster than reduction of reshaped blocks
+    total = np.full((height, width), factor**2 // 2, np.uint32)
+    for i in range(factor):
+        for j in range(factor):
+            total += img[i:height * factor:factor, j:width * factor:factor]
+    # Rounded mean
+    total //= factor**2
+    return total.astype(img.dtype)
+
+
+def projection_label_detect(frame, **kwargs):
+    """
+    Projection detector with labeling fallback for ambiguous frames
+    """
+    objects = projection_detect(frame, **kwargs)
+    if objects is None:
+        objects = label_detect(frame, **kwargs)
+    return objects
+
+
+class PreprocessStage:
+    def __init__(self, definition=None, centerX=None):
+        """
+        Real-time frame preprocessing compiled from stage definition. Detector
+        and all parameters are resolved once, so per-frame call only runs
+        detection and crop. Returns Detection of every object in frame,
+        with image for measurement if object is centered
+
+        Object is detected on coarse image with every scale-th pixel in both
+        axes and bounding box is mapped back to full resolution. Full
+        resolution pixels are read only for crop of centered object.
+
+        :param definition: dict with stage parameters, file name of stage
+        definition or None for STAGE_DEFAULTS
+        :param centerX: sensor x-center, frame x-center if None
+        """
+        if definition is None:
+            definition = dict(STAGE_DEFAULTS)
+        elif isinstance(definition, str):
+            definition = read_stage(definition)
+        else:
+            definition = dict(STAGE_DEFAULTS, **definition)
+        self.definition = definition
+        self.centerX = centerX
+        detectors = {'dip': label_detect,
+                     'projection': projection_label_detect}
+        if definition['detector'] not in detectors:
+            print('\nUnknown preprocessing detector {}'.format(
+                definition['detector']))
+            raise ValueError(definition['detector'])
+        self.scale = int(definition['scale'])
+        self.detect = detectors[definition['detector']]
+        self.detectArgs = {
+            'lowerBound': definition['lowerBound'],
+            'upperBound': definition['upperBound'],
+            # Minimal size in detection image px
+            'minSize': int(definition['minSize']) // self.scale**2,
+            'ellipseRange': (definition['ellipseMin'],
+                             definition['ellipseMax']),
+        }
+        self.maxSize = int(definition['maxSize'])
+        self.centerTolerance = definition['centerTolerance']
+        self.cropPolicy = definition['cropPolicy']
+        if self.cropPolicy == 'footprint':
+            # Margin in crop px, widened with binning factor
+            self.padding = flowchart_footprint(
+                definition['measureFlowchart']) + \
+                int(definition['footprintMargin'])
+        elif self.cropPolicy == 'fixed':
+            self.padding = definition['padding']
+        else:
+            print('\nUnknown crop policy {}'.format(self.cropPolicy))
+            raise ValueError(self.cropPolicy)
+        self.cropSize = definition['cropSize']
+        if self.cropSize is not None and self.cropSize <= 2 * self.padding:
+            print('\nCrop size {} smaller than crop margin {}'.format(
+                self.cropSize, 2 * self.padding))
+            raise ValueError(self.cropSize)
+        self.sharpnessStep = int(definition['sharpnessStep'])
+        # Each worker updates own model with frames it preprocesses
+        if definition['background']:
+            self.background = BackgroundModel(
+                rate=definition['backgroundRate'],
+                threshold=definition['backgroundThreshold'],
+                minArea=definition['backgroundArea'] *
+                self.detectArgs['minSize']
+            )
+        else:
+            self.background = None
+        if definition['flatField']:
+            self.flatField = FlatField(definition['flatField'])
+        else:
+            self.flatField = None
+
+    def __call__(self, frame, offsetX=0, offsetY=0, timestamp=None):
+        """
+        Preprocess frame
+
+        :param frame: 2D array
+        :param offsetX: frame ROI x offset on sensor
+        :param offsetY: frame ROI y offset on sensor
+        :param timestamp: camera frame timestamp in ticks
+        :return: list of Detection, empty if there is no object
+        """
+        scale = self.scale
+        # Coarse detection image with 1/scale**2 pixels
+        small = np.ascontiguousarray(frame[::scale, ::scale])
+        if self.flatField is not None:
+            # Only detection image and crops are corrected
+            small = self.flatField.apply(small, offsetX, offsetY, scale)
+        if self.background is not None and \
+                not self.background.present(small, offsetX, offsetY):
+            # Empty frame, no segmentation
+            return []
+        if self.centerX is None:
+            img_center_x = frame.shape[1]//2
+        else:
+            img_center_x = self.centerX - offsetX
+        detections = []
+        for smallCenter, smallMin, smallMax in self.detect(
+                small, **self.detectArgs):
+            # Full resolution frame coordinates
+            center = [c * scale for c in smallCenter]
+            minimum = [m * scale for m in smallMin]
+            maximum = [m * scale + scale - 1 for m in smallMax]
+            detection = Detection(
+                (center[0] + offsetX, center[1] + offsetY),
+                (minimum[0] + offsetX, minimum[1] + offsetY),
+                (maximum[0] + offsetX, maximum[1] + offsetY),
+                timestamp=timestamp
+            )
+            # Object location near x-axis center
+            centerDistance = abs(center[0] - img_center_x)
+            if centerDistance <= self.centerTolerance:
+                binning = self.binning(max(maximum[0] - minimum[0],
+                                           maximum[1] - minimum[1]) + 1)
+                padding = self.cropPadding(binning)
+                # Expand box around object for measurement, limited to frame
+                min_x = max(int(minimum[0] - padding), 0)
+                min_y = max(int(minimum[1] - padding), 0)
+                max_x = min(int(maximum[0] + padding), frame.shape[1])
+                max_y = min(int(maximum[1] + padding), frame.shape[0])
+                crop = frame[min_y:max_y, min_x:max_x]
+                # Single compact copy in frame data type, frame slot is
+                # reused after preprocessing
+                if self.flatField is not None:
+                    crop = self.flatField.apply(
+                        crop, offsetX + min_x, offsetY + min_y)
+                if binning > 1:
+                    crop = bin_crop(crop, binning)
+                elif self.flatField is None:
+                    crop = np.array(crop)
+                detection.crop = crop
+                detection.cropScale = 1. / binning
+                # Scores for best frame selection
+                detection.sharpness = gradient_energy(
+                    detection.crop, self.sharpnessStep)
+                detection.centerDistance = centerDistance
+                detection.prior = self.prior(
+                    small, smallMin, smallMax,
+                    ((center[0] - min_x) / binning,
+                     (center[1] - min_y) / binning),
+                    ((maximum[0] - minimum[0] + 1) / 2. / binning,
+                     (maximum[1] - minimum[1] + 1) / 2. / binning))
+            detections.append(detection)
+        return detections
+
+    def binning(self, size):
+        """
+        Crop binning factor bounding longest crop side by cropSize
+
+        :param size: longest object bounding box side in px
+        :return: int factor, 1 for full resolution crop
+        """
+        if self.cropSize is None:
+            return 1
+        if self.cropPolicy == 'footprint':
+            # Margin is given in crop px
+            return max(1, int(math.ceil(
+                size / (self.cropSize - 2 * self.padding))))
+        return max(1, int(math.ceil(
+            (size + 2 * self.padding) / self.cropSize)))
+
+    def cropPadding(self, binning=1):
+        """
+        Crop margin around object bounding box in full resolution px
+
+        :param binning: crop binning factor of object, see binning
+        """
+        if self.cropPolicy == 'footprint':
+            return self.padding * binning
+        return self.padding
+
+    def prior(self, small, smallMin, smallMax, center, radii):
+        """
+        Segmentation prior of centered object. Ring inner/outer radius ratio
+        is estimated from object pixels in bounding box of detection image
+        and filled ellipse area
+
+        :param small: detection image
+        :param smallMin: object bounding box minimum in detection image
+        :param smallMax: object bounding box maximum in detection image
+        :param center: object center in crop coordinates
+        :param radii: object ellipse radii in crop px (full resolution px
+        divided by crop binning factor)
+        :return: SegmentationPrior
+        """
+        box = small[int(smallMin[1]):int(smallMax[1]) + 1,
+                    int(smallMin[0]):int(smallMax[0]) + 1]
+        ringArea = np.count_nonzero(
+            (box >= self.detectArgs['lowerBound']) &
+            (box <= self.detectArgs['upperBound']))
+        filledArea = np.pi / 4. * box.shape[0] * box.shape[1]
+        innerFraction = np.sqrt(max(0., 1. - ringArea / filledArea))
+        return SegmentationPrior(center, radii, float(innerFraction))
+
+
+class StageFile:
+    def __init__(self, fn):
+        """
+        Stage definition file watched for changes
+
+        :param fn: stage definition file
+        """
+        self.fn = fn
+        self.mtime = os.path.getmtime(fn)
+
+    def changed(self):
+        """
+        True once after file was modified
+        """
+        try:
+            mtime = os.path.getmtime(self.fn)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return True
@@ -0,0 +1,294 @@
+# Math
+import math
+
+# Timing
+import time
+
+# Multi-frame fusion
+from processing.fusion import average_crops, group_frames
+
+
+# Fusion of centered frames of one object
+FUSION_MODES = ('average', 'measurements')
+
+
+class Track:
+    def __init__(self, objectId, detection, t):
+        """
+        Tracked physical object
+
+        :param objectId: unique object ID
+        :param detection: first Detection of object
+        :param t: detection time in s
+        """
+        self.objectId = objectId
+        self.center = detection.center
+        self.size = detection.size()
+        self.t = t
+        self.velocity = (0., 0.)
+        self.hits = 1
+        self.measured = False
+        # Best centered candidates, best first, number of centered
+        # candidates and latest centered candidate
+        self.frames = []
+        self.candidates = 0
+        self.latest = None
+
+    def predict(self, t):
+        """
+        Predicted object center at time t
+        """
+        dt = t - self.t
+        return (self.center[0] + self.velocity[0] * dt,
+                self.center[1] + self.velocity[1] * dt)
+
+    def update(self, detection, t, smoothing=0.5):
+        """
+        Update track with matched detection
+        """
+        dt = t - self.t
+        if dt > 0:
+            velocity = ((detection.center[0] - self.center[0]) / dt,
+                        (detection.center[1] - self.center[1]) / dt)
+            if self.hits == 1:
+                self.velocity = velocity
+            else:
+                self.velocity = tuple(
+                    smoothing * v + (1. - smoothing) * v_old
+                    for v, v_old in zip(velocity, self.velocity))
+            self.center = detection.center
+            self.t = t
+        self.size = detection.size()
+        self.hits += 1
+
+
+class ObjectTracker:
+    def __init__(self, gateFactor=0.75, sizeTolerance=0.2, maxAge=2.,
+                 tickFrequency=1e9, maxCandidates=5, centerWeight=0.5,
+                 fuseFrames=1, fusion='average'):
+        """
+        Lightweight multi-frame tracker assigning IDs to detected objects by
+        predicted center position and bounding box size, so exactly one
+        measurement is emitted per physical part.
+
+        Centered detections of object are candidates for measurement, best
+        scored candidate (sharp and near center) is selected when object
+        leaves center window, its track expires or after maxCandidates
+        candidates. maxCandidates=1 measures first centered detection.
+
+        With fuseFrames > 1, fuseFrames best candidates (e.g. short exposure
+        frames) are fused into one measurement: crops registered by detected
+        center are averaged ('average') or each frame is measured and
+        measurements are fused with standard deviation ('measurements', see
+        processing.fusion.measure_detection).
+
+        :param gateFactor: maximum distance between predicted and detected
+        center as fraction of object size
+        :param sizeTolerance: maximum relative bounding box size difference
+        :param maxAge: time in s after which unseen track is removed
+        :param tickFrequency: camera timestamp tick frequency in Hz
+        :param maxCandidates: maximum number of centered detections scored
+        before best one is selected
+        :param centerWeight: score penalty of center distance equal to
+        object size, relative to sharpness
+        :param fuseFrames: number of centered frames fused into measurement,
+        at least fuseFrames candidates are scored
+        :param fusion: 'average' or 'measurements'
+        """
+        if fusion not in FUSION_MODES:
+            print('\nUnknown fusion mode {}'.format(fusion))
+            raise ValueError(fusion)
+        self.gateFactor = gateFactor
+        self.sizeTolerance = sizeTolerance
+        self.maxAge = maxAge
+        self.tickFrequency = tickFrequency
+        self.maxCandidates = max(maxCandidates, fuseFrames)
+        self.centerWeight = centerWeight
+        self.fuseFrames = fuseFrames
+        self.fusion = fusion
+        self.tracks = []
+        self.nextId = 1
+        # Measured and discarded candidates of expired tracks
+        self.pending = []
+        self.discarded = []
+
+    def _time(self, timestamp):
+        """
+        Time in s from camera timestamp or host time if timestamp is None
+        """
+        if timestamp is None:
+            return time.perf_counter()
+        return timestamp / self.tickFrequency
+
+    def _expire(self, t):
+        """
+        Remove tracks not seen for maxAge before time t, their candidates
+        are pending for measurement
+        """
+        for tr in self.tracks:
+            if abs(t - tr.t) > self.maxAge:
+                measure, discard = self.release(tr)
+                self.pending.extend(measure)
+                self.discarded.extend(discard)
+        self.tracks = [
+            tr for tr in self.tracks if abs(t - tr.t) <= self.maxAge]
+
+    def expire(self, timestamp=None):
+        """
+        Release candidates of tracks not seen for maxAge. Called for every
+        frame, also without detections, so last object before conveyor
+        stops is measured without waiting for next object
+
+        :param timestamp: camera timestamp of frame in ticks, host time if
+        None
+        :return: (measure, discard) lists of Detection
+        """
+        self._expire(self._time(timestamp))
+        measure, self.pending = self.pending, []
+        discard, self.discarded = self.discarded, []
+        return measure, discard
+
+    def _sizeMatches(self, track, size):
+        return all(
+            abs(s - ts) <= self.sizeTolerance * ts
+            for s, ts in zip(size, track.size))
+
+    def update(self, detection):
+        """
+        Assign detection to existing or new track. Sets detection.objectId
+
+        :param detection: Detection
+        :return: Track
+        """
+        t = self._time(detection.timestamp)
+        # Remove tracks not seen for maxAge
+        self._expire(t)
+        size = detection.size()
+        best, bestDist = None, None
+        for track in self.tracks:
+            if not self._sizeMatches(track, size):
+                continue
+            px, py = track.predict(t)
+            dist = math.hypot(detection.center[0] - px,
+                              detection.center[1] - py)
+            if dist <= self.gateFactor * max(track.size) and (
+                    best is None or dist < bestDist):
+                best, bestDist = track, dist
+        if best is None:
+            best = Track(self.nextId, detection, t)
+            self.nextId += 1
+            self.tracks.append(best)
+        else:
+            best.update(detection, t)
+        detection.objectId = best.objectId
+        return best
+
+    def score(self, detection):
+        """
+        Measurement quality of centered detection, crop sharpness reduced
+        by distance from center relative to object size
+        """
+        if detection.sharpness is None:
+            return 0.
+        distance = detection.centerDistance or 0.
+        return detection.sharpness * max(
+            0., 1. - self.centerWeight * distance / max(detection.size()))
+
+    def release(self, track):
+        """
+        Release candidates of track for measurement, fused if fuseFrames > 1
+
+        :param track: Track
+        :return: (measure, discard) lists of Detection
+        """
+        frames, track.frames = track.frames, []
+        if not frames:
+            return [], []
+        track.measured = True
+        if len(frames) == 1:
+            return frames, []
+        if self.fusion == 'average':
+            fused = average_crops(frames)
+        else:
+            fused = group_frames(frames)
+        # Fused detection carries trace of best frame
+        return [fused], frames[1:]
+
+    def leftCenter(self, track, detection):
+        """
+        Check if non-centered detection was taken after object passed center
+        window. Workers return frames out of order, so frame taken before
+        object reached center can arrive after centered candidates
+
+        :param track: Track of detection
+        :param detection: Detection without crop
+        :return: True if detection is later than latest centered candidate
+        (by camera timestamp, or downstream in travel direction without
+        timestamps)
+        """
+        latest = track.latest
+        if latest is None:
+            return True
+        if detection.timestamp is not None and latest.timestamp is not None:
+            return detection.timestamp > latest.timestamp
+        direction = track.velocity[0]
+        if direction == 0:
+            return True
+        return (detection.center[0] - latest.center[0]) * direction > 0
+
+    def select(self, detection):
+        """
+        Update tracker with detection and select best centered detections
+        for measurement. Every detection is returned exactly once, either
+        for measurement or as discarded
+
+        :param detection: Detection
+        :return: (measure, discard) lists of Detection
+        """
+        track = self.update(detection)
+        measure, self.pending = self.pending, []
+        discard, self.discarded = self.discarded, []
+        if track.measured:
+            discard.append(detection)
+            return measure, discard
+        if detection.crop is None:
+            if self.leftCenter(track, detection):
+                # Object left center window, measure best candidates
+                released, dropped = self.release(track)
+                measure.extend(released)
+                discard.extend(dropped)
+            discard.append(detection)
+            return measure, discard
+        track.candidates += 1
+        if track.latest is None or self._later(detection, track.latest):
+            track.latest = detection
+        track.frames.append(detection)
+        track.frames.sort(key=self.score, reverse=True)
+        if len(track.frames) > self.fuseFrames:
+            discard.append(track.frames.pop())
+        if track.candidates >= self.maxCandidates:
+            released, dropped = self.release(track)
+            measure.extend(released)
+            discard.extend(dropped)
+        return measure, discard
+
+    def _later(self, detection, other):
+        """
+        True if detection was taken after other (camera or host time)
+        """
+        if detection.timestamp is None or other.timestamp is None:
+            return True
+        return detection.timestamp > other.timestamp
+
+    def flush(self):
+        """
+        Best candidates of all tracks not measured yet, e.g. when measurement
+        is stopped
+
+        :return: list of Detection
+        """
+        measure, self.pending = self.pending, []
+        self.discarded = []
+        for track in self.tracks:
+            measure.extend(self.release(track)[0])
+        return measure
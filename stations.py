@@ -0,0 +1,108 @@
+"""
+Headless real-time measurement with several cameras on one workstation.
+
+Usage:
+    python stations.py [--devices <serial> ...] [--emulate <number>]
+                       [--mm-px <ratio> ...] [--flowchart <file>]
+                       [--policy separate] [--measure-proc 1]
+                       [--queue-depth 1] [--measure-queue-depth 4]
+                       [--stage <file>] [--exposure <us>]
+                       [--seconds 60]
+"""
+import argparse
+import time
+
+# PyQtGraph
+from pyqtgraph import QtCore
+
+# Camera stations and emulator
+from cam.cam import list_devices
+from cam.emulator import SyntheticORingSource
+from cam.station import CameraStation, StationGroup
+
+# Compiled measurement flowchart and scheduling policies
+from processing.compiler import compile_flowchart
+from processing.process import SCHEDULING_POLICIES
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--devices', nargs='+', default=None,
+                        help='Camera serial numbers, all connected if not set')
+    parser.add_argument('--emulate', type=int, default=0,
+                        help='Number of emulated cameras instead of devices')
+    parser.add_argument('--mm-px', type=float, nargs='+', default=[1.],
+                        help='Calibration mm/px ratio of each camera')
+    parser.add_argument('--flowchart', default=None,
+                        help='Measurement flowchart, only detections are '
+                             'reported if not set')
+    parser.add_argument('--overlap-exposure', action='store_true',
+                        help='Trigger next frame on ExposureEnd event')
+    parser.add_argument('--policy', choices=SCHEDULING_POLICIES,
+                        default='separate',
+                        help='Scheduling of detection and measurement '
+                             'tasks, separate worker pools or shared '
+                             'workers preferring measurement')
+    parser.add_argument('--measure-proc', type=int, default=1,
+                        help='Measurement workers per camera with separate '
+                             'policy')
+    parser.add_argument('--queue-depth', type=int, default=1,
+                        help='Queued frames per camera')
+    parser.add_argument('--measure-queue-depth', type=int, default=4,
+                        help='Queued measurements per camera')
+    parser.add_argument('--stage', default=None,
+                        help='Preprocessing stage definition file, reloaded '
+                             'on change')
+    parser.add_argument('--exposure', type=float, default=None,
+                        help='Exposure time in us, shorter exposure with '
+                             'stage fuseFrames > 1 fuses several frames')
+    parser.add_argument('--seconds', type=float, default=60.)
+    args = parser.parse_args()
+
+    # Qt signals of acquisition threads need application instance, core
+    # application runs without display
+    app = QtCore.QCoreApplication([])
+    if args.emulate:
+        devices = list(range(args.emulate))
+    elif args.devices:
+        devices = args.devices
+    else:
+        devices = list_devices()
+    if len(args.mm_px) not in (1, len(devices)):
+        parser.error('--mm-px requires one ratio or one ratio per camera')
+    ratios = args.mm_px * len(devices) if len(args.mm_px) == 1 \
+        else args.mm_px
+    # Plan without Qt, sent to measurement workers of every station
+    plan = compile_flowchart(args.flowchart) if args.flowchart else None
+
+    stations = [
+        CameraStation(
+            device, mmPxRatio=ratio,
+            measureFlowchart=plan,
+            emulator_source=SyntheticORingSource(seed=i) if args.emulate
+            else None,
+            overlap_exposure=args.overlap_exposure, stage=args.stage,
+            policy=args.policy, measureProc=args.measure_proc,
+            queueDepth=args.queue_depth,
+            measureQueueDepth=args.measure_queue_depth
+        )
+        for i, (device, ratio) in enumerate(zip(devices, ratios))
+    ]
+    with StationGroup(stations) as group:
+        group.open()
+        if args.exposure is not None:
+            for station in group.stations:
+                station.set_exposure_time(args.exposure)
+        group.start()
+        end = time.perf_counter() + args.seconds
+        while time.perf_counter() < end:
+            group.reloadStage()
+            result = group.getResult(timeout=0.5)
+            if result is not None:
+                print('Camera {} object {}: {}'.format(
+                    result.cameraId, result.objectId, result.measurement))
+        for station in group.stations:
+            print('\nCamera {}'.format(station.camera_id()))
+            station.latency.print_summary()
+            if station.procParallel is not None:
+                station.procParallel.print_queue_stats()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from processing.background import BackgroundModel
+
+
+def model():
+    return BackgroundModel(rate=0.5, threshold=20, minArea=16, warmup=2,
+                           absorbFrames=3, step=1)
+
+
+def test_present_after_warmup():
+    background = model()
+    empty = np.full((16, 16), 10, np.uint8)
+    # Presence is reported while model is built
+    assert background.present(empty)
+    assert background.present(empty)
+    assert not background.present(empty)
+    obj = empty.copy()
+    obj[4:12, 4:12] = 150
+    assert background.present(obj)
+    # Small object is not presence
+    obj = empty.copy()
+    obj[4:6, 4:6] = 150
+    assert not background.present(obj)
+
+
+def test_drift_is_followed():
+    background = model()
+    for _ in range(2):
+        background.present(np.full((16, 16), 10, np.uint8))
+    # Slow illumination change stays within threshold of running mean
+    for value in (20, 30, 40, 50):
+        assert not background.present(np.full((16, 16), value, np.uint8))
+
+
+def test_lasting_change_is_absorbed():
+    background = model()
+    empty = np.full((16, 16), 10, np.uint8)
+    background.present(empty)
+    background.present(empty)
+    still = empty.copy()
+    still[:8] = 200
+    assert [background.present(still) for _ in range(4)] == \
+        [True, True, True, False]
+
+
+def test_roi_change_resets_model():
+    background = model()
+    empty = np.full((16, 16), 10, np.uint8)
+    for _ in range(3):
+        background.present(empty)
+    # New warmup on other ROI
+    assert background.present(empty, offsetX=32)
+    assert background.frames == 1
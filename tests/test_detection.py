@@ -0,0 +1,75 @@
+import numpy as np
+
+from processing.detection import projection_detect
+
+
+MIN_SIZE = 5000
+
+
+def disc(img, cx, cy, r, value=150):
+    yy, xx = np.mgrid[:img.shape[0], :img.shape[1]]
+    img[(xx - cx)**2 + (yy - cy)**2 <= r * r] = value
+    return img
+
+
+def frame(height=300, width=400):
+    return np.zeros((height, width), np.uint8)
+
+
+def test_single_disc():
+    result = projection_detect(disc(frame(), 200, 150, 80),
+                               minSize=MIN_SIZE)
+    assert result == [((200., 150.), (120, 70), (280, 230))]
+
+
+def test_ring_hole_is_filled():
+    ring = disc(disc(frame(), 200, 150, 80), 200, 150, 50, 0)
+    assert projection_detect(ring, minSize=MIN_SIZE) == \
+        [((200., 150.), (120, 70), (280, 230))]
+
+
+def test_no_object():
+    assert projection_detect(frame(), minSize=MIN_SIZE) == []
+    # Object too small
+    assert projection_detect(disc(frame(), 200, 150, 20),
+                             minSize=MIN_SIZE) == []
+
+
+def test_small_noise_is_ignored():
+    img = disc(frame(), 200, 150, 80)
+    img[10:14, 10:14] = 150
+    assert len(projection_detect(img, minSize=MIN_SIZE)) == 1
+
+
+def test_shape_outside_ellipse_range():
+    img = frame()
+    img[50:250, 100:300] = 150
+    assert projection_detect(img, minSize=MIN_SIZE) == []
+
+
+def test_ambiguous_several_objects():
+    apart = disc(disc(frame(width=600), 150, 150, 80), 450, 150, 80)
+    assert projection_detect(apart, minSize=MIN_SIZE) is None
+    stacked = disc(disc(frame(400, 300), 150, 100, 80), 150, 300, 80)
+    assert projection_detect(stacked, minSize=MIN_SIZE) is None
+    # Overlapping in column projection, separated in rows
+    diagonal = disc(disc(frame(400, 400), 150, 100, 80), 250, 300, 80)
+    assert projection_detect(diagonal, minSize=MIN_SIZE) is None
+
+
+def test_ambiguous_sparse_region():
+    # Few pixels with bounding box of object size, filled could be object
+    img = disc(frame(width=600), 200, 150, 80)
+    for i in range(100):
+        img[100 + i, 400 + i] = 150
+    assert projection_detect(img, minSize=MIN_SIZE) is None
+
+
+def test_ambiguous_near_ellipse_limit():
+    img = disc(frame(), 200, 150, 80)
+    # Flattened side lowers ellipse fit just below ellipseRange
+    img[:, 270:] = 0
+    assert projection_detect(img, minSize=MIN_SIZE) is None
+    img = disc(frame(), 200, 150, 80)
+    img[:, 278:] = 0
+    assert len(projection_detect(img, minSize=MIN_SIZE)) == 1
@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+from pypylon import pylon
+
+from cam.emulator import EmulatedCamera, SyntheticORingSource
+
+
+class Collector(pylon.ImageEventHandler):
+    def __init__(self, count):
+        super().__init__()
+        self.count = count
+        self.results = []
+        self.done = threading.Event()
+
+    def OnImageGrabbed(self, camera, grabResult):
+        with grabResult.GetArrayZeroCopy() as img:
+            self.results.append((
+                img.copy(), grabResult.GetTimeStamp(),
+                grabResult.GetOffsetX(), grabResult.GetOffsetY()))
+        if len(self.results) >= self.count:
+            self.done.set()
+
+
+def small_camera(**kwargs):
+    source = SyntheticORingSource(
+        width=256, height=128, outer_radius=40, inner_radius=25, **kwargs)
+    return EmulatedCamera(source, frame_rate=500.)
+
+
+def grab(cam, count):
+    handler = Collector(count)
+    cam.RegisterImageEventHandler(
+        handler, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+    cam.StartGrabbing()
+    try:
+        assert handler.done.wait(5.)
+    finally:
+        cam.StopGrabbing()
+    return handler.results
+
+
+def test_object_moves_with_timestamp():
+    source = SyntheticORingSource(speed=100.)
+    assert source.object_center_x(1.) - source.object_center_x(0.5) == 50.
+    frame = source.next_frame(10.)
+    centerX = int(round(source.object_center_x(10.)))
+    assert frame[source.height // 2, centerX - 300] == source.intensity
+    assert frame[source.height // 2, centerX] != source.intensity
+
+
+def test_grab_delivers_roi_frames_with_increasing_timestamps():
+    cam = small_camera()
+    cam.Open()
+    cam.Width = 128
+    cam.Height = 64
+    cam.OffsetX = 64
+    cam.OffsetY = 32
+    cam.ExposureTime = 100.
+    results = grab(cam, 3)
+    cam.Close()
+    timestamps = [r[1] for r in results]
+    assert timestamps == sorted(timestamps)
+    for img, _, offsetX, offsetY in results:
+        assert img.shape == (64, 128)
+        assert (offsetX, offsetY) == (64, 32)
+
+
+def test_roi_size_is_locked_while_grabbing():
+    cam = small_camera()
+    cam.Open()
+    assert cam.OffsetX.Max == 0
+    cam.Width = 128
+    assert cam.OffsetX.Max == 128
+    cam.StartGrabbing()
+    assert not cam.Width.IsWritable()
+    cam.StopGrabbing()
+    assert cam.Width.IsWritable()
+    cam.Close()
@@ -0,0 +1,51 @@
+import pickle
+
+import numpy as np
+
+from processing.flatfield import FlatField
+
+
+def reference(tmp_path):
+    dark = np.full((8, 12), 10., np.float32)
+    bright = np.full((8, 12), 110., np.float32)
+    # Vignetted corner
+    bright[:4, :6] = 60.
+    fn = str(tmp_path / 'flat.npy')
+    FlatField.save(fn, FlatField.compute(dark, bright, target=100.))
+    return FlatField(fn)
+
+
+def test_bright_reference_is_flat(tmp_path):
+    flatField = reference(tmp_path)
+    bright = np.full((8, 12), 110, np.uint8)
+    bright[:4, :6] = 60
+    assert (flatField.apply(bright) == 100).all()
+    assert (flatField.apply(np.full((8, 12), 10, np.uint8)) == 0).all()
+
+
+def test_region_and_subsampled_frame(tmp_path):
+    flatField = reference(tmp_path)
+    # Frame region over vignetted corner border
+    img = np.full((2, 4), 35, np.uint8)
+    assert flatField.apply(img, offsetX=4, offsetY=3).tolist() == \
+        [[50, 50, 25, 25], [25, 25, 25, 25]]
+    # Every second sensor pixel
+    img = np.full((4, 6), 60, np.uint8)
+    corrected = flatField.apply(img, step=2)
+    assert corrected[0, 0] == 100 and corrected[3, 5] == 50
+
+
+def test_output_is_clipped(tmp_path):
+    flatField = reference(tmp_path)
+    corrected = flatField.apply(np.full((8, 12), 255, np.uint8))
+    assert (corrected[:4, :6] == 255).all() and corrected[4, 6] == 245
+    # Below dark level
+    assert (flatField.apply(np.zeros((8, 12), np.uint8)) == 0).all()
+
+
+def test_maps_are_not_pickled(tmp_path):
+    flatField = reference(tmp_path)
+    flatField.maps()
+    copy = pickle.loads(pickle.dumps(flatField))
+    assert copy._maps is None
+    assert copy.apply(np.full((8, 12), 10, np.uint8)).max() == 0
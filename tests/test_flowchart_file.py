@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from processing.flowchart_file import read_flowchart, node_footprint, \
+    flowchart_footprint
+
+
+FLOWCHART = """\
+pos: (0.0, 0.0)
+bypass: False
+terminals:
+    dipImgIn:
+        io: 'in'
+        multi: False
+nodes: [{nodes}]
+connects: [{connects}]
+"""
+
+
+def node(name, cls, bypass=False, **ctrl):
+    return {'class': cls, 'name': name,
+            'state': {'bypass': bypass, 'ctrl': ctrl}}
+
+
+def write(tmp_path, nodes, connects):
+    fn = str(tmp_path / 'test.fc')
+    with open(fn, 'w') as f:
+        f.write(FLOWCHART.format(
+            nodes=', '.join(repr(n) for n in nodes),
+            connects=', '.join(repr(c) for c in connects)))
+    return fn
+
+
+def test_read_nested_blocks(tmp_path):
+    fn = write(tmp_path, [node('Erosion.0', 'Erosion', size=5.)], [])
+    flowchart = read_flowchart(fn)
+    assert flowchart['terminals']['dipImgIn'] == {'io': 'in', 'multi': False}
+    assert flowchart['bypass'] is False
+    assert flowchart['nodes'][0]['state']['ctrl'] == {'size': 5.}
+
+
+def test_node_footprint():
+    assert node_footprint(node('G', 'GaussianConvolution', sigmas=2.)) == 6.
+    assert node_footprint(node('C', 'Closing', size=7.)) == 7.
+    assert node_footprint(node('C', 'Closing', bypass=True, size=7.)) == 0
+    assert node_footprint(node('T', 'Threshold')) == 0
+
+
+def test_footprint_is_longest_path(tmp_path):
+    nodes = [node('Gauss.0', 'GaussianConvolution', sigmas=1.),
+             node('Dilation.0', 'Dilation', size=5.),
+             node('Closing.0', 'Closing', size=4.),
+             node('Measure.0', 'Measure')]
+    connects = [
+        ('Input', 'dipImgIn', 'Gauss.0', 'dipImgIn'),
+        ('Gauss.0', 'dipImgOut', 'Dilation.0', 'dipImgIn'),
+        ('Input', 'dipImgIn', 'Closing.0', 'dipImgIn'),
+        ('Dilation.0', 'dipImgOut', 'Measure.0', 'dipLblIn'),
+        ('Closing.0', 'dipImgOut', 'Measure.0', 'dipGreyIn'),
+    ]
+    # Gaussian 3 + dilation 2.5 rounded up
+    assert flowchart_footprint(write(tmp_path, nodes, connects)) == 6
+
+
+def test_cycle(tmp_path):
+    nodes = [node('A', 'Erosion'), node('B', 'Dilation')]
+    connects = [('A', 'out', 'B', 'in'), ('B', 'out', 'A', 'in')]
+    with pytest.raises(ValueError):
+        flowchart_footprint(write(tmp_path, nodes, connects))
+
+
+def test_stored_measure_flowchart():
+    # Kuwahara 1.5 + gradient magnitude 3.9
+    assert flowchart_footprint(os.path.join(
+        os.path.dirname(__file__), '..', 'measure_flowchart.fc')) == 6
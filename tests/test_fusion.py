@@ -0,0 +1,76 @@
+import numpy as np
+
+from processing.detection import Detection, SegmentationPrior
+from processing.fusion import average_crops, group_frames, \
+    measurement_values, fuse_measurements, measure_detection
+
+
+def centered(value, centerX, centerY=10, shape=(20, 30)):
+    """
+    Centered detection with constant crop and bright pixel at prior center
+    """
+    crop = np.full(shape, value, np.uint8)
+    crop[centerY, centerX] = 200
+    d = Detection((1000, 500), (900, 400), (1100, 600), crop=crop)
+    d.prior = SegmentationPrior((centerX, centerY), (5, 5), 0.5)
+    return d
+
+
+def test_average_crops_registers_by_center():
+    detections = [centered(10, 12), centered(20, 15), centered(30, 14)]
+    fused = average_crops(detections)
+    assert fused.fusedFrames == 3
+    # Region around center present in all crops
+    assert fused.crop.shape == (20, 12 + 30 - 15)
+    cx, cy = fused.prior.center
+    assert fused.crop[cy, cx] == 200
+    assert fused.crop[0, 0] == 20
+    # Best detection is not modified
+    assert detections[0].crop.shape == (20, 30)
+
+
+def test_crops_with_other_binning_are_not_averaged():
+    detections = [centered(10, 12), centered(20, 12)]
+    detections[1].cropScale = 0.5
+    fused = average_crops(detections)
+    assert fused.fusedFrames == 1
+    assert (fused.crop == detections[0].crop).all()
+
+
+def test_measurement_values():
+    assert measurement_values([1., 2.]).tolist() == [1., 2.]
+    assert measurement_values(np.ones((2, 2))).shape == (4,)
+    assert measurement_values([]).shape == (0,)
+
+
+def test_fuse_measurements():
+    fused = fuse_measurements([[1., 10.], [3., 14.], [2.], [2., 12.]])
+    # Frame with missing value is left out
+    assert fused.count == 3
+    assert fused.mean.tolist() == [2., 12.]
+    assert fused.std.tolist() == [1., 2.]
+    assert fused.measurements == [[1., 10.], [3., 14.], [2., 12.]]
+
+
+def test_fuse_skips_frames_without_measurement():
+    fused = fuse_measurements([[], [1., 2.], [3., 4.]])
+    assert fused.count == 2
+    assert fused.mean.tolist() == [2., 3.]
+    fused = fuse_measurements([[], []])
+    assert fused.count == 0
+    assert fused.mean.shape == (0,)
+
+
+def test_measure_detection_fuses_grouped_frames():
+    detections = [centered(10, 12), centered(20, 12)]
+    calls = []
+
+    def measure(crop, mmPxRatio, prior):
+        calls.append(mmPxRatio)
+        return [float(crop[0, 0])]
+
+    assert measure_detection(detections[0], measure, 0.1) == [10.]
+    fused = measure_detection(group_frames(detections), measure, 0.1)
+    assert fused.count == 2
+    assert fused.mean.tolist() == [15.]
+    assert calls == [0.1] * 3
@@ -0,0 +1,36 @@
+import time
+
+from cam.emulator import EmulatedCamera, EmulatedCommand, \
+    EmulatedParameter, SyntheticORingSource
+from processing.latency import LatencyMonitor, tick_frequency
+
+
+class GigECamera:
+    """
+    Camera with GigE timestamp latch counting ticks of 125 MHz clock
+    """
+    def __init__(self, cameraTime=10.):
+        self.GevTimestampTickFrequency = EmulatedParameter(
+            125000000, writable=False)
+        self.GevTimestampValue = EmulatedParameter(0, writable=False)
+        self.GevTimestampControlLatch = EmulatedCommand(self._latch)
+        self.cameraTime = cameraTime
+
+    def _latch(self):
+        self.GevTimestampValue.value = int(self.cameraTime * 125000000)
+
+
+def test_tick_frequency():
+    cam = EmulatedCamera(SyntheticORingSource(width=64, height=32))
+    assert tick_frequency(cam) == 1e9
+    assert tick_frequency(GigECamera()) == 125e6
+
+
+def test_sync_clock_with_gige_latch():
+    latency = LatencyMonitor()
+    assert latency.syncClock(GigECamera(cameraTime=10.))
+    assert latency.tickFrequency == 125e6
+    assert abs(latency.clockOffset - (time.perf_counter() - 10.)) < 0.1
+    # Exposure of frame 1 s after latch
+    trace = latency.newTrace(0, 11 * 125000000)
+    assert abs(trace.stamps['exposure'] - latency.clockOffset - 11.) < 1e-6
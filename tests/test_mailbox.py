@@ -0,0 +1,33 @@
+import queue
+import threading
+
+import pytest
+
+from cam.mailbox import FrameMailbox
+
+
+def test_latest_frame_is_read_once():
+    mailbox = FrameMailbox()
+    assert mailbox.empty() and mailbox.poll() is None
+    mailbox.put(1)
+    mailbox.put(2)
+    assert mailbox.qsize() == 1
+    assert mailbox.get() == 2
+    assert mailbox.poll() is None
+    assert (mailbox.written, mailbox.read, mailbox.dropped) == (2, 1, 1)
+
+
+def test_get_timeout():
+    mailbox = FrameMailbox()
+    with pytest.raises(queue.Empty):
+        mailbox.get(timeout=0.01)
+    with pytest.raises(queue.Empty):
+        mailbox.get(block=False)
+
+
+def test_get_waits_for_writer():
+    mailbox = FrameMailbox()
+    timer = threading.Timer(0.05, mailbox.put, (3,))
+    timer.start()
+    assert mailbox.get(timeout=5.) == 3
+    timer.join()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from cam.recorder import FrameRecorder, RecordingReader, \
+    RecordingFrameSource
+
+
+SENSOR = {'SensorWidth': 64, 'SensorHeight': 32, 'PixelFormat': 'Mono8'}
+
+
+def record(path, frames, params, t0=0):
+    """
+    Record (frame, offsetX, offsetY) list at 100 FPS camera timestamps
+    """
+    with FrameRecorder(path, params) as recorder:
+        for i, (frame, offsetX, offsetY) in enumerate(frames):
+            assert recorder.record(
+                frame, t0 + i * 10000000, offsetX, offsetY)
+    return recorder
+
+
+def test_round_trip(tmp_path):
+    frames = [(np.full((16, 32), i, np.uint8), 32, 2 * i) for i in range(5)]
+    recorder = record(str(tmp_path), frames, dict(SENSOR, Gain=1.))
+    assert (recorder.written, recorder.dropped) == (5, 0)
+    reader = RecordingReader(str(tmp_path))
+    assert len(reader) == 5
+    for i, img in enumerate(reader):
+        assert img.shape == (16, 32) and (img == i).all()
+        assert reader.metadata(i) == {
+            'sequence': i, 'timestamp': i * 10000000, 'offsetX': 32,
+            'offsetY': 2 * i}
+    assert reader.params['Gain'] == 1.
+    assert reader.sensorShape() == (32, 64)
+    assert reader.frameRate() == pytest.approx(100.)
+
+
+def test_appended_segments_keep_params(tmp_path):
+    path = str(tmp_path)
+    frame = np.zeros((32, 64), np.uint8)
+    record(path, [(frame, 0, 0)] * 3, dict(SENSOR, ExposureTime=1000.))
+    # Second session starts after pause
+    recorder = record(path, [(frame + 1, 0, 0)] * 2,
+                      dict(SENSOR, ExposureTime=500.), t0=10 ** 10)
+    assert recorder.firstRecord == 3
+    reader = RecordingReader(path)
+    assert len(reader) == 5
+    assert reader.segmentRanges() == [(0, 3), (3, 5)]
+    assert [reader.frameParams(i)['ExposureTime'] for i in range(5)] == \
+        [1000.] * 3 + [500.] * 2
+    # Sequence continues in appended segment
+    assert reader.metadata(3)['sequence'] == 3
+    # Pause between segments is not part of frame rate
+    assert reader.frameRate() == pytest.approx(100.)
+
+
+def test_append_with_other_sensor_fails(tmp_path):
+    path = str(tmp_path)
+    record(path, [(np.zeros((32, 64), np.uint8), 0, 0)], SENSOR)
+    with pytest.raises(ValueError):
+        FrameRecorder(path, dict(SENSOR, SensorWidth=128))
+
+
+def test_frame_source_places_roi_on_sensor(tmp_path):
+    path = str(tmp_path)
+    record(path, [(np.full((16, 32), 9, np.uint8), 32, 8)], SENSOR)
+    source = RecordingFrameSource(RecordingReader(path))
+    frame = source.next_frame(0.)
+    assert frame.shape == (32, 64)
+    assert (frame[8:24, 32:] == 9).all()
+    assert frame.sum() == 9 * 16 * 32
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from processing.ring import FrameRing
+
+
+def frame(value, height=4, width=6):
+    return np.full((height, width), value, np.uint8)
+
+
+def test_write_read_metadata():
+    ring = FrameRing(2, 8, 8)
+    frameSlot = ring.write(frame(7), offsetX=32, offsetY=2, timestamp=123)
+    img = ring.read(frameSlot)
+    assert img.shape == (4, 6)
+    assert (img == 7).all()
+    assert ring.metadata(frameSlot) == {
+        'offsetX': 32, 'offsetY': 2, 'timestamp': 123}
+
+
+def test_write_copies_frame():
+    ring = FrameRing(1, 8, 8)
+    img = frame(1)
+    frameSlot = ring.write(img)
+    img[...] = 2
+    assert (ring.read(frameSlot) == 1).all()
+
+
+def test_drop_when_all_slots_busy():
+    ring = FrameRing(2, 8, 8)
+    first = ring.write(frame(1))
+    second = ring.write(frame(2))
+    assert ring.write(frame(3)) is None
+    assert ring.dropped == 1
+    # Busy slots are not overwritten
+    assert (ring.read(first) == 1).all()
+    assert (ring.read(second) == 2).all()
+
+
+def test_released_slot_is_reused():
+    ring = FrameRing(2, 8, 8)
+    first = ring.write(frame(1))
+    second = ring.write(frame(2))
+    ring.release(first)
+    third = ring.write(frame(3, height=8, width=8))
+    assert third.slot == first.slot
+    assert third.sequence > second.sequence
+    # Stale reference to overwritten slot
+    assert ring.read(first) is None
+    assert ring.read(third).shape == (8, 8)
+    assert ring.dropped == 0
+
+
+def test_frame_larger_than_slot():
+    ring = FrameRing(1, 4, 4)
+    with pytest.raises(ValueError):
+        ring.write(frame(1, height=4, width=6))
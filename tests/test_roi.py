@@ -0,0 +1,84 @@
+import numpy as np
+
+from cam.emulator import EmulatedCamera, SyntheticORingSource
+from cam.idle import IdleMode
+from cam.roi import AdaptiveROI, get_roi, update_roi
+
+
+class Stage:
+    """
+    Preprocessing stage parameters used by AdaptiveROI
+    """
+    def __init__(self, maxSize=400, centerTolerance=100, padding=20):
+        self.maxSize = maxSize
+        self.centerTolerance = centerTolerance
+        self.padding = padding
+
+    def binning(self, size):
+        return 1
+
+    def cropPadding(self, binning=1):
+        return self.padding
+
+
+def grabbing_camera():
+    cam = EmulatedCamera(
+        SyntheticORingSource(width=1024, height=512, outer_radius=40,
+                             inner_radius=25), frame_rate=500.)
+    cam.Open()
+    cam.ExposureTime = 100.
+    cam.Width = 512
+    cam.Height = 256
+    cam.StartGrabbing()
+    return cam
+
+
+def test_offsets_change_without_restart():
+    cam = grabbing_camera()
+    try:
+        assert not update_roi(cam, 256, 512, 128, 256)
+        assert cam.IsGrabbing()
+        assert get_roi(cam) == (256, 512, 128, 256)
+    finally:
+        cam.Close()
+
+
+def test_size_change_restarts_grabbing():
+    cam = grabbing_camera()
+    try:
+        assert update_roi(cam, 0, 256, 0, 128)
+        assert cam.IsGrabbing()
+        assert get_roi(cam) == (0, 256, 0, 128)
+    finally:
+        cam.Close()
+
+
+def test_band_sized_from_stage():
+    roi = AdaptiveROI(2048, 1024, objectSize=800, incX=32, stage=Stage())
+    assert roi.objectSize == 400
+    half = 100 + 400 // 2 + 20
+    assert roi.offsetX <= 1024 - half
+    assert roi.offsetX + roi.width >= 1024 + half
+    assert roi.width < 2 * half + 2 * 32
+    # Reloaded stage with larger objects widens band
+    width = roi.width
+    roi.changed = False
+    roi.fitStage(Stage(maxSize=800))
+    assert roi.objectSize == 800
+    assert roi.changed and roi.width > width
+
+
+def test_idle_band_and_restore():
+    cam = grabbing_camera()
+    try:
+        idle = IdleMode(1024, 512, bandHeight=64, idleTimeout=0.)
+        assert idle.apply(cam)
+        assert idle.idle and cam.IsGrabbing()
+        assert get_roi(cam) == (0, 1024, 224, 64)
+        assert not idle.apply(cam)
+        idle.observe(np.full((64, 1024), 100, np.uint8))
+        assert idle.apply(cam)
+        assert not idle.idle and cam.IsGrabbing()
+        assert get_roi(cam) == (0, 512, 0, 256)
+    finally:
+        cam.Close()
@@ -0,0 +1,29 @@
+from processing.scheduler import CoreScheduler
+
+
+def test_no_pipelines():
+    assert CoreScheduler(range(8)).allocate([]) == []
+
+
+def test_cores_divided_by_weight():
+    allocation = CoreScheduler(range(10)).allocate([100., 50.])
+    # Two cores reserved for camera threads, 8 worker cores
+    assert [count for count, _ in allocation] == [5, 3]
+    assert allocation[0][1] == [2, 3, 4, 5, 6]
+    assert allocation[1][1] == [7, 8, 9]
+
+
+def test_every_pipeline_gets_worker():
+    allocation = CoreScheduler(range(6)).allocate([1000., 1., 1.])
+    counts = [count for count, _ in allocation]
+    assert min(counts) == 1
+    assert sum(counts) == 3
+    # Pipelines do not share cores while there are enough of them
+    cpus = [cpu for _, pipelineCpus in allocation for cpu in pipelineCpus]
+    assert sorted(cpus) == [3, 4, 5]
+
+
+def test_shared_cores_when_cores_are_missing():
+    allocation = CoreScheduler([0, 1]).allocate([1., 1., 1.])
+    assert [count for count, _ in allocation] == [1, 1, 1]
+    assert [cpus for _, cpus in allocation] == [[0], [1], [0]]
@@ -0,0 +1,135 @@
+import numpy as np
+
+from processing.detection import Detection
+from processing.tracking import ObjectTracker
+
+
+# Sensor x-center and centerTolerance of detections
+CENTER_X = 1000
+TOLERANCE = 150
+
+
+def detection(x, timestamp, sharpness=1., y=500, size=200):
+    """
+    Detection of object at x, centered (with crop) within TOLERANCE of
+    CENTER_X. Timestamp in ticks of 1 ns
+    """
+    centerDistance = abs(x - CENTER_X)
+    centered = centerDistance <= TOLERANCE
+    d = Detection((x, y), (x - size // 2, y - size // 2),
+                  (x + size // 2, y + size // 2),
+                  crop=np.full((8, 8), 100, np.uint8) if centered else None,
+                  timestamp=int(timestamp * 1e9))
+    if centered:
+        d.sharpness = sharpness
+        d.centerDistance = centerDistance
+    return d
+
+
+def feed(tracker, detections):
+    measured, discarded = [], []
+    for d in detections:
+        measure, discard = tracker.select(d)
+        measured.extend(measure)
+        discarded.extend(discard)
+    return measured, discarded
+
+
+def passing_object(x0=600, step=50, frames=16, t0=0., dt=0.05):
+    """
+    Detections of one object moving in +x through center window
+    """
+    return [detection(x0 + i * step, t0 + i * dt) for i in range(frames)]
+
+
+def test_one_measurement_per_object():
+    tracker = ObjectTracker()
+    first = passing_object()
+    second = passing_object(t0=1.)
+    measured, discarded = feed(tracker, first + second)
+    assert len(measured) == 2
+    assert measured[0].objectId != measured[1].objectId
+    # Every detection is returned exactly once
+    assert len(measured) + len(discarded) == len(first) + len(second)
+
+
+def test_best_centered_frame_is_measured():
+    tracker = ObjectTracker(maxCandidates=10)
+    detections = passing_object()
+    sharpest = [d for d in detections if d.crop is not None][2]
+    sharpest.sharpness = 10.
+    measured, _ = feed(tracker, detections)
+    assert measured == [sharpest]
+
+
+def test_late_frame_before_center_does_not_release_track():
+    tracker = ObjectTracker(maxCandidates=10)
+    detections = passing_object()
+    centered = [d for d in detections if d.crop is not None]
+    before = [d for d in detections if d.crop is None and
+              d.center[0] < CENTER_X]
+    after = [d for d in detections if d.crop is None and
+             d.center[0] > CENTER_X]
+    centered[-1].sharpness = 10.
+    # Last frame before center window arrives after two centered frames
+    order = centered[:2] + before[-1:] + centered[2:] + after
+    measured, discarded = feed(tracker, order)
+    assert measured == [centered[-1]]
+    assert len(measured) + len(discarded) == len(order)
+
+
+def test_left_center_without_timestamps_uses_travel_direction():
+    tracker = ObjectTracker()
+    candidate = detection(CENTER_X, 0.)
+    track = tracker.update(candidate)
+    track.latest = candidate
+    track.velocity = (1000., 0.)
+    upstream = detection(CENTER_X - 200, 0.)
+    downstream = detection(CENTER_X + 200, 0.)
+    for d in (candidate, upstream, downstream):
+        d.timestamp = None
+    assert not tracker.leftCenter(track, upstream)
+    assert tracker.leftCenter(track, downstream)
+    # Object moving in -x
+    track.velocity = (-1000., 0.)
+    assert tracker.leftCenter(track, upstream)
+
+
+def test_best_frames_are_fused():
+    tracker = ObjectTracker(maxCandidates=10, fuseFrames=3,
+                            fusion='measurements')
+    detections = passing_object()
+    centered = [d for d in detections if d.crop is not None]
+    for i, d in enumerate(centered):
+        d.sharpness = 10. ** i
+    measured, discarded = feed(tracker, detections)
+    assert len(measured) == 1
+    fused = measured[0]
+    assert fused.fusedFrames == 3
+    # Sharpest frames, best first
+    assert fused.frames == centered[::-1][:3]
+    assert len(measured) + len(discarded) == len(detections)
+
+
+def test_expired_track_is_measured_without_new_detections():
+    tracker = ObjectTracker(maxCandidates=10, maxAge=0.5)
+    detections = passing_object(frames=8)
+    centered = [d for d in detections if d.crop is not None]
+    # Object stops in center window, no frame after center
+    measured, discarded = feed(tracker, detections[:6])
+    assert measured == []
+    # Empty frames before maxAge keep track
+    assert tracker.expire(int(0.6 * 1e9)) == ([], [])
+    measure, discard = tracker.expire(int(1.0 * 1e9))
+    assert len(measure) == 1 and measure[0] in centered
+    assert len(discard) + len(discarded) == 5
+    assert tracker.tracks == []
+
+
+def test_flush_measures_tracks_in_center():
+    tracker = ObjectTracker(maxCandidates=10)
+    measured, _ = feed(tracker, passing_object(frames=7))
+    assert measured == []
+    flushed = tracker.flush()
+    assert len(flushed) == 1 and flushed[0].crop is not None
+    assert tracker.flush() == []